@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Add updated_at (with index) to products, clients, sales, loans and
+loan_payments, used by /sync delta queries, ETags and incremental backups,
+and index notifications.recipient_user_id.
+
+Create_all never adds columns to existing tables and the startup
+auto-migration only handles the SQLite file, so run this on PostgreSQL
+before deploying code that maps these columns.
+
+Safe for both SQLite (legacy) and PostgreSQL (dev/prod).
+Idempotent — skips columns and indexes that already exist.
+"""
+import sys
+from sqlalchemy import create_engine, inspect, text
+from app.core.config import settings
+
+UPDATED_AT_TABLES = ("products", "clients", "sales", "loans", "loan_payments")
+
+
+def has_column(engine, table_name: str, column_name: str) -> bool:
+    inspector = inspect(engine)
+    columns = [c["name"] for c in inspector.get_columns(table_name)]
+    return column_name in columns
+
+
+def create_index(engine, name: str, table_name: str, column_name: str) -> None:
+    if engine.dialect.name == "postgresql":
+        # CONCURRENTLY keeps the table writable while the index builds; it cannot run in a transaction
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table_name} ({column_name})"))
+    else:
+        with engine.begin() as conn:
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table_name} ({column_name})"))
+
+
+def main() -> int:
+    engine = create_engine(settings.DATABASE_URL)
+    dialect = engine.dialect.name
+    print(f"Connected to {dialect} database")
+    tables = set(inspect(engine).get_table_names())
+
+    for table in UPDATED_AT_TABLES:
+        if table not in tables:
+            print(f"Table '{table}' does not exist — skipping")
+            continue
+
+        if has_column(engine, table, "updated_at"):
+            print(f"Column '{table}.updated_at' already exists — skipping")
+        else:
+            print(f"Adding 'updated_at' column to {table} table...")
+            with engine.begin() as conn:
+                if dialect == "postgresql":
+                    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN updated_at TIMESTAMPTZ DEFAULT now()"))
+                else:
+                    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN updated_at DATETIME"))
+
+        with engine.begin() as conn:
+            backfilled = conn.execute(text(
+                f"UPDATE {table} SET updated_at = CURRENT_TIMESTAMP WHERE updated_at IS NULL"
+            )).rowcount
+        if backfilled:
+            print(f"Backfilled updated_at for {backfilled} {table} rows")
+
+        create_index(engine, f"ix_{table}_updated_at", table, "updated_at")
+        print(f"Index 'ix_{table}_updated_at' ready")
+
+    if "notifications" in tables:
+        create_index(engine, "ix_notifications_recipient_user_id", "notifications", "recipient_user_id")
+        print("Index 'ix_notifications_recipient_user_id' ready")
+
+    missing = [t for t in UPDATED_AT_TABLES if t in tables and not has_column(engine, t, "updated_at")]
+    if missing:
+        print(f"❌ Column updated_at not found after migration: {', '.join(missing)}")
+        return 1
+    print("✅ Migration completed successfully")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
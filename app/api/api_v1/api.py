@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.api_v1.endpoints import auth, users, products, auto_products, sales, auto_sales, loans, auto_loans, clients, files, transactions, magazines, reports, notifications, health, currency
+from app.api.api_v1.endpoints import auth, users, products, auto_products, sales, auto_sales, loans, auto_loans, clients, files, transactions, magazines, reports, notifications, health, currency, diagnostics, sync, dashboard, batch, live
 
 api_router = APIRouter()
 
@@ -18,4 +18,9 @@ api_router.include_router(files.router, prefix="/files", tags=["files"])
 api_router.include_router(transactions.router, prefix="/transactions", tags=["transactions"])
 api_router.include_router(reports.router, prefix="/reports", tags=["reports"])
 api_router.include_router(notifications.router, prefix="/notifications", tags=["notifications"])
-api_router.include_router(currency.router, prefix="/currency", tags=["currency"])
\ No newline at end of file
+api_router.include_router(currency.router, prefix="/currency", tags=["currency"])
+api_router.include_router(diagnostics.router, prefix="/diagnostics", tags=["diagnostics"])
+api_router.include_router(sync.router, prefix="/sync", tags=["sync"])
+api_router.include_router(dashboard.router, prefix="/dashboard", tags=["dashboard"])
+api_router.include_router(batch.router, prefix="/batch", tags=["batch"])
+api_router.include_router(live.router, prefix="/live", tags=["live"])
\ No newline at end of file
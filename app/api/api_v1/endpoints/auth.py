@@ -1,3 +1,4 @@
+import logging
 from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
@@ -10,6 +11,8 @@ from app.api.deps import get_current_user
 from app.services.notification_service import NotificationService
 from app.models.notification import PushToken, Notification, NotificationStatus, NotificationType
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/auth/login")
 
@@ -121,10 +124,10 @@ async def register_manager(
                 )
         
         db.commit()
-        print(f"✅ Admin notifications queued for new user registration: {new_user.name}")
+        logger.info(f"Admin notifications queued for new user registration: {new_user.id}")
         
     except Exception as e:
-        print(f"⚠️  Failed to send admin notifications: {str(e)}")
+        logger.warning(f"Failed to send admin notifications: {e}")
         # Don't fail the registration if notification fails
     
     return {
@@ -307,7 +310,7 @@ def delete_account(
         return {"message": "Account successfully deleted"}
     except Exception as e:
         db.rollback()
-        print(f"Error deactivating account: {e}")
+        logger.exception(f"Error deactivating account: {e}")
         raise HTTPException(
             status_code=500,
             detail="Failed to delete account"
@@ -356,7 +359,7 @@ def update_user_type(
         }
     except Exception as e:
         db.rollback()
-        print(f"Error updating user type: {e}")
+        logger.exception(f"Error updating user type: {e}")
         raise HTTPException(
             status_code=500,
             detail="Failed to update user type"
@@ -458,7 +461,7 @@ def update_profile(
         raise
     except Exception as e:
         db.rollback()
-        print(f"Error updating profile: {e}")
+        logger.exception(f"Error updating profile: {e}")
         raise HTTPException(
             status_code=500,
             detail="Failed to update profile"
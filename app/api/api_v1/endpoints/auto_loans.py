@@ -4,16 +4,21 @@ from typing import List, Optional
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
 import json
-from app.db.database import get_db
+import logging
+from app.db.database import get_db, unit_of_work
 from app.models.user import User, UserType
 from app.models.auto_product import AutoProduct
 from app.models.auto_transaction import AutoLoan, AutoLoanPayment
 from app.models.user import Client
 from app.api.deps import get_current_user
+from app.core.fieldsets import projected_response, projection_query, requested_fields
+from app.services.inventory_service import take_unit
 from pydantic import BaseModel
 from app.models.transaction import PaymentStatus
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 class AutoLoanCreate(BaseModel):
@@ -63,7 +68,7 @@ class AutoLoanResponse(BaseModel):
     yearly_interest_rate: float
     monthly_payment: float
     loan_start_date: datetime
-    video_url: str = None
+    video_url: Optional[str] = None
     agreement_images: Optional[List[str]] = None
     is_completed: bool
     seller_id: int
@@ -135,35 +140,19 @@ def create_auto_loan(
         )
     
     # Verify auto product exists and belongs to user
-    print(f"DEBUG auto_loan: Querying product_id={loan_data.auto_product_id}, user_id={current_user.id}")
-    
-    # Direct database query to check actual values
-    from sqlalchemy import text
-    result = db.execute(text("SELECT id, car_name, count FROM auto_products WHERE id = :id"), {"id": loan_data.auto_product_id})
-    direct_result = result.fetchone()
-    print(f"DEBUG auto_loan: Direct DB query result: {direct_result}")
-    
-    # Force fresh query to avoid stale session data
-    db.expire_all()
     auto_product = db.query(AutoProduct).filter(
         AutoProduct.id == loan_data.auto_product_id,
         AutoProduct.manager_id == current_user.id
     ).first()
     
     if not auto_product:
-        print(f"DEBUG auto_loan: Product not found - product_id={loan_data.auto_product_id}")
+        logger.debug(f"Auto loan: product {loan_data.auto_product_id} not found for user {current_user.id}")
         raise HTTPException(
             status_code=404,
             detail="Auto product not found"
         )
     
-    # Check if there's enough stock
-    print(f"DEBUG auto_loan: Found product - id={auto_product.id}, car_name={auto_product.car_name}, count={auto_product.count}")
-    if auto_product.count <= 0:
-        raise HTTPException(
-            status_code=400,
-            detail=f"No stock available for this car. Current count: {auto_product.count}"
-        )
+    logger.debug(f"Auto loan: product {auto_product.id} has {auto_product.count} in stock")
     
     # Verify client exists
     client = db.query(Client).filter(Client.id == loan_data.client_id).first()
@@ -173,6 +162,13 @@ def create_auto_loan(
             detail="Client not found"
         )
     
+    # Take one unit from stock in a single conditional UPDATE
+    if take_unit(db, AutoProduct, auto_product.id) is None:
+        raise HTTPException(
+            status_code=400,
+            detail="No stock available for this car. Current count: 0"
+        )
+    
     # Calculate remaining amount and monthly payment
     remaining_amount = loan_data.loan_price - loan_data.initial_payment
     
@@ -203,24 +199,21 @@ def create_auto_loan(
         seller_id=current_user.id
     )
     
-    db.add(new_loan)
-    db.flush()  # Get the loan ID
-    
-    # Create payment schedule
-    for month in range(1, loan_data.loan_months + 1):
-        due_date = new_loan.loan_start_date + relativedelta(months=month)
-        payment = AutoLoanPayment(
-            auto_loan_id=new_loan.id,
-            amount=monthly_payment,
-            due_date=due_date,
-            status=PaymentStatus.PENDING
-        )
-        db.add(payment)
-    
-    # Reduce auto product stock
-    auto_product.count -= 1
-    
-    db.commit()
+    # Loan, stock change and payment schedule commit together
+    with unit_of_work(db):
+        db.add(new_loan)
+        db.flush()  # Get the loan ID
+        
+        # Create payment schedule
+        for month in range(1, loan_data.loan_months + 1):
+            due_date = new_loan.loan_start_date + relativedelta(months=month)
+            payment = AutoLoanPayment(
+                auto_loan_id=new_loan.id,
+                amount=monthly_payment,
+                due_date=due_date,
+                status=PaymentStatus.PENDING
+            )
+            db.add(payment)
     db.refresh(new_loan)
     
     # Return proper response with all required fields
@@ -254,67 +247,65 @@ def create_auto_loan(
         client_name=client.name
     )
 
+# The list representation as plain columns, labelled like the AutoLoanResponse fields
+AUTO_LOAN_COLUMNS = {column.key: column for column in (
+    AutoLoan.id, AutoLoan.auto_product_id, AutoLoan.client_id, AutoLoan.loan_price, AutoLoan.initial_payment,
+    AutoLoan.remaining_amount, AutoLoan.loan_months, AutoLoan.yearly_interest_rate, AutoLoan.monthly_payment,
+    AutoLoan.loan_start_date, AutoLoan.video_url, AutoLoan.agreement_images, AutoLoan.is_completed,
+    AutoLoan.seller_id, AutoProduct.car_name, AutoProduct.model, AutoProduct.color, AutoProduct.year,
+    User.name.label("seller_name"), Client.name.label("client_name"),
+)}
+AUTO_LOAN_JOINS = {
+    **{name: (AutoProduct, AutoLoan.auto_product_id == AutoProduct.id)
+       for name in ("car_name", "model", "color", "year")},
+    "seller_name": (User, AutoLoan.seller_id == User.id),
+    "client_name": (Client, AutoLoan.client_id == Client.id),
+}
+# Named projections for ?view=
+AUTO_LOAN_VIEWS = {
+    "list": ("id", "car_name", "model", "client_name", "remaining_amount", "monthly_payment",
+             "loan_start_date", "is_completed"),
+}
+
+def _auto_loan_row_values(row) -> dict:
+    values = row._asdict()
+    if values.get("agreement_images"):
+        # Safely parse JSON agreement_images
+        try:
+            values["agreement_images"] = json.loads(values["agreement_images"])
+        except json.JSONDecodeError:
+            values["agreement_images"] = []
+    elif "agreement_images" in values:
+        values["agreement_images"] = None
+    return values
+
 @router.get("/", response_model=List[AutoLoanResponse])
 def get_auto_loans(
+    fields: Optional[str] = None,
+    view: Optional[str] = None,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get all auto loans for the current user"""
+    """Get all auto loans for the current user
+
+    ``fields`` (comma-separated AutoLoanResponse fields) or ``view=list``
+    return only those fields; car, seller and client tables are joined
+    only when one of their fields is requested.
+    """
     if current_user.user_type != UserType.AUTO:
         raise HTTPException(
             status_code=403,
             detail="Only auto users can access auto loans"
         )
     
-    results = db.query(
-        AutoLoan,
-        AutoProduct.car_name,
-        AutoProduct.model,
-        AutoProduct.color,
-        AutoProduct.year,
-        User.name.label('seller_name'),
-        Client.name.label('client_name')
-    ).join(AutoProduct, AutoLoan.auto_product_id == AutoProduct.id
-    ).join(User, AutoLoan.seller_id == User.id
-    ).join(Client, AutoLoan.client_id == Client.id
-    ).filter(
+    selected = requested_fields(AutoLoanResponse, AUTO_LOAN_VIEWS, fields, view)
+    rows = projection_query(db, AutoLoan, AUTO_LOAN_COLUMNS, AUTO_LOAN_JOINS, selected).filter(
         AutoLoan.seller_id == current_user.id
     ).all()
     
-    response = []
-    for loan, car_name, model, color, year, seller_name, client_name in results:
-        # Safely parse JSON agreement_images
-        agreement_images = None
-        if loan.agreement_images:
-            try:
-                agreement_images = json.loads(loan.agreement_images)
-            except json.JSONDecodeError:
-                agreement_images = []
-        
-        response.append(AutoLoanResponse(
-            id=loan.id,
-            auto_product_id=loan.auto_product_id,
-            client_id=loan.client_id,
-            loan_price=loan.loan_price,
-            initial_payment=loan.initial_payment,
-            remaining_amount=loan.remaining_amount,
-            loan_months=loan.loan_months,
-            yearly_interest_rate=loan.yearly_interest_rate,
-            monthly_payment=loan.monthly_payment,
-            loan_start_date=loan.loan_start_date,
-            video_url=loan.video_url,
-            agreement_images=agreement_images,
-            is_completed=loan.is_completed,
-            seller_id=loan.seller_id,
-            car_name=car_name,
-            model=model,
-            color=color,
-            year=year,
-            seller_name=seller_name,
-            client_name=client_name
-        ))
-    
-    return response
+    if selected is None:
+        return [AutoLoanResponse(**_auto_loan_row_values(row)) for row in rows]
+    return projected_response(AutoLoanResponse, selected, [_auto_loan_row_values(row) for row in rows])
 
 @router.get("/my-upcoming-payments", response_model=List[dict])
 def get_my_upcoming_auto_payments(
@@ -3,12 +3,14 @@ from sqlalchemy.orm import Session
 from sqlalchemy import or_
 from typing import List, Optional
 from datetime import datetime
-from app.db.database import get_db
+from app.db.database import get_db, unit_of_work
 from app.models.auto_transaction import AutoSale
 from app.models.auto_product import AutoProduct
 from app.models.user import User, UserRole
 from app.api.deps import get_current_user
 from app.core.timezone import to_uzbekistan_time
+from app.services.search_service import matching_ids
+from app.services.inventory_service import take_unit
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -71,10 +73,8 @@ def get_auto_sales(
     if search:
         query = query.filter(
             or_(
-                AutoProduct.car_name.ilike(f"%{search}%"),
-                AutoProduct.model.ilike(f"%{search}%"),
-                AutoProduct.color.ilike(f"%{search}%"),
-                User.name.ilike(f"%{search}%")
+                AutoProduct.id.in_(matching_ids("auto_product", search)),
+                User.id.in_(matching_ids("user", search))
             )
         )
     
@@ -125,8 +125,8 @@ def create_auto_sale(
         if auto_product.magazine_id != current_user.magazine_id:
             raise HTTPException(status_code=403, detail="Not authorized to sell this auto product")
     
-    # Check if auto product is in stock
-    if auto_product.count <= 0:
+    # Take one unit from stock in a single conditional UPDATE
+    if take_unit(db, AutoProduct, auto_product.id) is None:
         raise HTTPException(status_code=400, detail="Auto product is out of stock")
     
     # Create the auto sale
@@ -136,12 +136,9 @@ def create_auto_sale(
         seller_id=current_user.id
     )
     
-    db.add(db_auto_sale)
-    
-    # Decrease auto product count
-    auto_product.count -= 1
-    
-    db.commit()
+    # Sale and stock change commit together
+    with unit_of_work(db):
+        db.add(db_auto_sale)
     db.refresh(db_auto_sale)
     
     return AutoSaleResponse(
@@ -0,0 +1,128 @@
+import logging
+from typing import Any, List, Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, Field, ValidationError
+from sqlalchemy.orm import Session
+
+from app.api.deps import get_current_user
+from app.api.api_v1.endpoints import auto_loans, clients, loans, sales
+from app.db.database import get_db, savepoint_session
+from app.models.user import User
+from app.services import live_events, report_cache
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+MAX_BATCH_OPERATIONS = 100
+
+
+class BatchOperation(BaseModel):
+    op: Literal["record_payment", "mark_paid", "mark_auto_paid", "create_client", "create_sale"]
+    # Echoed back so the client can match results to its queued calls
+    id: Optional[str] = None
+    loan_id: Optional[int] = None
+    payment_id: Optional[int] = None
+    data: dict = {}
+
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation] = Field(..., min_length=1, max_length=MAX_BATCH_OPERATIONS)
+    atomic: bool = False
+
+
+class BatchResult(BaseModel):
+    id: Optional[str] = None
+    op: str
+    status: int
+    result: Optional[Any] = None
+    error: Optional[Any] = None
+
+
+class BatchResponse(BaseModel):
+    committed: bool
+    results: List[BatchResult]
+
+
+def _loan_ids(operation: BatchOperation) -> dict:
+    if operation.loan_id is None or operation.payment_id is None:
+        raise HTTPException(status_code=422, detail="loan_id and payment_id are required")
+    return {"loan_id": operation.loan_id, "payment_id": operation.payment_id}
+
+
+def _run(operation: BatchOperation, db: Session, user: User):
+    """Call the endpoint function behind ``operation`` with the batch session."""
+    if operation.op == "record_payment":
+        return loans.record_payment(**_loan_ids(operation), payment_data=loans.PaymentCreate(**operation.data),
+                                    db=db, current_user=user)
+    if operation.op == "mark_paid":
+        return loans.mark_payment_paid(**_loan_ids(operation),
+                                       payment_request=loans.QuickPaymentRequest(**operation.data),
+                                       db=db, current_user=user)
+    if operation.op == "mark_auto_paid":
+        return auto_loans.mark_auto_payment_paid(**_loan_ids(operation),
+                                                 payment_request=auto_loans.QuickPaymentRequest(**operation.data),
+                                                 db=db, current_user=user)
+    if operation.op == "create_client":
+        return clients.create_client(client_data=clients.ClientCreate(**operation.data), db=db, current_user=user)
+    return sales.create_sale(sale_data=sales.SaleCreate(**operation.data), db=db, current_user=user)
+
+
+@router.post("/", response_model=BatchResponse)
+def run_batch(
+    batch: BatchRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Run queued write operations in order, in one request and one commit
+
+    Each operation behaves like its endpoint (same checks, same status
+    codes; unexpected errors report 500) and gets its own result. A failed
+    operation is undone on its own and the rest continue; with ``atomic``
+    the batch stops at the first failure, nothing is saved and the
+    remaining operations report 424. ``committed`` tells whether the
+    batch's writes were saved.
+    """
+    results = []
+    failed = False
+    with savepoint_session(db) as batch_db:
+        for operation in batch.operations:
+            if failed and batch.atomic:
+                results.append(BatchResult(id=operation.id, op=operation.op, status=424,
+                                           error="Not run: an earlier operation failed"))
+                continue
+            try:
+                result = _run(operation, batch_db, current_user)
+                results.append(BatchResult(id=operation.id, op=operation.op, status=200,
+                                           result=jsonable_encoder(result)))
+            except HTTPException as e:
+                batch_db.rollback()
+                failed = True
+                results.append(BatchResult(id=operation.id, op=operation.op, status=e.status_code, error=e.detail))
+            except ValidationError as e:
+                batch_db.rollback()
+                failed = True
+                results.append(BatchResult(id=operation.id, op=operation.op, status=422,
+                                           error=jsonable_encoder(e.errors(include_url=False))))
+            except Exception:
+                batch_db.rollback()
+                failed = True
+                logger.exception(f"Batch operation {operation.op} by user {current_user.id} failed")
+                results.append(BatchResult(id=operation.id, op=operation.op, status=500,
+                                           error="Internal server error"))
+        tenants = batch_db.info.pop("deferred_report_tenants", set())
+        events = batch_db.info.pop("deferred_live_events", [])
+
+    committed = not (failed and batch.atomic)
+    if committed:
+        db.commit()
+        if tenants:
+            report_cache.invalidate(tenants)
+        live_events.publish(events)
+    else:
+        db.rollback()
+    logger.info(f"Batch of {len(batch.operations)} operations by user {current_user.id}: "
+                f"{sum(r.status == 200 for r in results)} succeeded, committed={committed}")
+    return BatchResponse(committed=committed, results=results)
@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import json
 from app.db.database import get_db
 from app.models.user import User, UserRole, UserType, Client
 from app.api.deps import get_current_user
+from app.core.etag import make_etag, not_modified, user_scope
+from app.services import sync_service
+from app.services.search_service import matching_ids
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -48,45 +51,103 @@ class ClientResponse(BaseModel):
             manager_id=client.manager_id
         )
 
+MAX_CLIENTS_PAGE_SIZE = 200
+DEFAULT_CLIENTS_PAGE_SIZE = 50
+
 @router.get("/", response_model=List[ClientResponse])
 def get_clients(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = None,
+    cursor: Optional[int] = None,
+    search: Optional[str] = None,
+    include_images: Optional[bool] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Get all clients for the current user's scope based on business type"""
+    """Get clients for the current user's scope based on business type
+
+    Clients are ordered newest first. Paging starts with ``limit`` (at most
+    MAX_CLIENTS_PAGE_SIZE) or ``cursor``: pass the ``X-Next-Cursor``
+    response header back as ``cursor`` to fetch the next page; the header
+    is absent on the last page. Without either the whole list is returned,
+    as older app builds expect. Passport image fields are only loaded when
+    ``include_images`` is set (default: only for the unpaged list).
+    Supports ``If-None-Match``: 304 while no client in scope changed.
+    """
+    paged = limit is not None or cursor is not None
+    if paged:
+        limit = max(1, min(limit or DEFAULT_CLIENTS_PAGE_SIZE, MAX_CLIENTS_PAGE_SIZE))
+    if include_images is None:
+        include_images = not paged
+    
+    etag = make_etag("clients", *user_scope(current_user), limit, cursor, search, include_images,
+                     *sync_service.version(db, current_user, "clients"))
+    cached = not_modified(request, response, etag)
+    if cached is not None:
+        return cached
+    
+    if include_images:
+        query = db.query(Client)
+    else:
+        # Compact list projection: skip the image columns entirely
+        query = db.query(
+            Client.id, Client.name, Client.phone, Client.passport_series, Client.manager_id
+        )
     
     if current_user.user_type == UserType.GADGETS:
-        # GADGETS: Clients belong to magazine - filter by magazine_id
-        query = db.query(Client).join(User, Client.manager_id == User.id)
-        
-        if current_user.role == UserRole.ADMIN:
-            # Admin can see all clients from their magazine
-            clients = query.filter(User.magazine_id == current_user.magazine_id).all()
-        elif current_user.role == UserRole.MANAGER:
-            # Manager can see all clients from their magazine
-            clients = query.filter(User.magazine_id == current_user.magazine_id).all()
-        else:
-            # Seller can see all clients from their magazine
-            clients = query.filter(User.magazine_id == current_user.magazine_id).all()
+        # GADGETS: Clients belong to magazine - admin, manager and seller
+        # all see every client from their magazine
+        query = query.join(User, Client.manager_id == User.id).filter(
+            User.magazine_id == current_user.magazine_id
+        )
     
     elif current_user.user_type == UserType.AUTO:
         # AUTO: Clients belong to specific user - filter by manager_id
         if current_user.role == UserRole.ADMIN:
             # Admin can see all AUTO clients
-            query = db.query(Client).join(User, Client.manager_id == User.id)
-            clients = query.filter(User.user_type == UserType.AUTO).all()
+            query = query.join(User, Client.manager_id == User.id).filter(
+                User.user_type == UserType.AUTO
+            )
         elif current_user.role == UserRole.MANAGER:
             # Manager can see their own clients
-            clients = db.query(Client).filter(Client.manager_id == current_user.id).all()
+            query = query.filter(Client.manager_id == current_user.id)
         else:
             # Seller can see their manager's clients
-            clients = db.query(Client).filter(Client.manager_id == current_user.manager_id).all()
+            query = query.filter(Client.manager_id == current_user.manager_id)
     
     else:
         # Fallback: no user_type specified, use old logic
-        clients = []
+        return []
+    
+    if search:
+        query = query.filter(Client.id.in_(matching_ids("client", search)))
     
-    return [ClientResponse.from_orm_with_json(client) for client in clients]
+    if cursor is not None:
+        query = query.filter(Client.id < cursor)
+    
+    query = query.order_by(Client.id.desc())
+    if paged:
+        # Fetch one extra row to know whether another page exists
+        rows = query.limit(limit + 1).all()
+        if len(rows) > limit:
+            rows = rows[:limit]
+            response.headers["X-Next-Cursor"] = str(rows[-1].id)
+    else:
+        rows = query.all()
+    
+    if include_images:
+        return [ClientResponse.from_orm_with_json(client) for client in rows]
+    return [
+        ClientResponse(
+            id=row.id,
+            name=row.name,
+            phone=row.phone,
+            passport_series=row.passport_series,
+            manager_id=row.manager_id
+        )
+        for row in rows
+    ]
 
 @router.post("/", response_model=ClientResponse)
 def create_client(
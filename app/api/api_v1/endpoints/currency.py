@@ -4,9 +4,11 @@ from typing import List, Optional
 from datetime import datetime, timezone, timedelta
 import httpx
 
+from app.core.config import settings
+
 router = APIRouter()
 
-CBU_URL = "https://cbu.uz/oz/arkhiv-kursov-valyut/json/"
+CBU_URL = settings.CBU_RATES_URL
 CACHE_TTL_SECONDS = 60 * 60  # 1 hour
 CODES = ("USD", "EUR", "RUB")
 
@@ -0,0 +1,110 @@
+import asyncio
+import logging
+from datetime import date
+from typing import Dict, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.api.deps import get_current_user
+from app.api.api_v1.endpoints import auth, currency, loans, products, reports, transactions
+from app.api.api_v1.endpoints.currency import CurrencyRates
+from app.api.api_v1.endpoints.products import HasProductsResponse
+from app.api.api_v1.endpoints.reports import ReportsSummary
+from app.api.api_v1.endpoints.transactions import TransactionResponse
+from app.db.database import get_read_db
+from app.models.user import User
+from app.schemas.user import UserResponse
+from app.services.report_cache import get_or_compute
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+SECTIONS = ("me", "active_payments", "recent_transactions", "summary", "has_products", "currency")
+
+
+class DashboardResponse(BaseModel):
+    me: Optional[UserResponse] = None
+    active_payments: Optional[List[dict]] = None
+    recent_transactions: Optional[List[TransactionResponse]] = None
+    summary: Optional[ReportsSummary] = None
+    has_products: Optional[HasProductsResponse] = None
+    currency: Optional[CurrencyRates] = None
+    # Sections that failed, with the reason; the others are still returned
+    errors: Dict[str, str] = {}
+
+
+def _active_payments(db: Session, user: User):
+    # Days until due change at midnight, so the day is part of the cache key
+    return get_or_compute(
+        user, "loans.active_payments", {"day": date.today().isoformat()},
+        lambda: loans.get_active_loans_with_payments(db=db, current_user=user)
+    )
+
+
+_DB_SECTIONS = {
+    "me": lambda db, user: auth.get_current_user_info(current_user=user),
+    "active_payments": _active_payments,
+    "recent_transactions": lambda db, user: transactions.get_recent_transactions(db=db, current_user=user, limit=10),
+    "summary": lambda db, user: reports.get_reports_summary(db=db, current_user=user),
+    "has_products": lambda db, user: products.check_has_products(db=db, current_user=user),
+}
+
+
+def _error_detail(e: Exception) -> str:
+    return str(e.detail) if isinstance(e, HTTPException) else "Section failed"
+
+
+def _load_db_sections(db: Session, user: User, wanted: List[str]) -> tuple:
+    """Run the database sections one after another on the request's session."""
+    data, errors = {}, {}
+    for name in wanted:
+        if name not in _DB_SECTIONS:
+            continue
+        try:
+            data[name] = _DB_SECTIONS[name](db, user)
+        except Exception as e:
+            logger.exception(f"Dashboard section {name} failed for user {user.id}")
+            errors[name] = _error_detail(e)
+            db.rollback()
+    return data, errors
+
+
+@router.get("/", response_model=DashboardResponse)
+async def get_dashboard(
+    sections: Optional[str] = None,
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Everything the home screen needs in one request
+
+    Same data as /auth/me, /loans/active-payments, /transactions/recent,
+    /reports/summary, /products/has-products and /currency/rates, behind a
+    single authentication and session. Report sections and active
+    payments come from the tenant report cache. The currency fetch (an
+    outside HTTP call) runs concurrently with the database sections.
+
+    ``sections`` limits the response to a comma-separated subset. A failing
+    section is reported in ``errors`` instead of failing the whole request.
+    """
+    if sections:
+        wanted = [name.strip() for name in sections.split(",") if name.strip()]
+        unknown = [name for name in wanted if name not in SECTIONS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown sections: {', '.join(unknown)}")
+    else:
+        wanted = list(SECTIONS)
+
+    rates = asyncio.ensure_future(currency.get_rates()) if "currency" in wanted else None
+    data, errors = await run_in_threadpool(_load_db_sections, db, current_user, wanted)
+    if rates is not None:
+        try:
+            data["currency"] = await rates
+        except Exception as e:
+            logger.warning(f"Dashboard currency section failed: {e}")
+            errors["currency"] = _error_detail(e)
+
+    return DashboardResponse(**data, errors=errors)
@@ -0,0 +1,128 @@
+import json
+import time
+import uuid
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse, PlainTextResponse
+from pydantic import BaseModel, Field
+
+from app.api.deps import get_current_admin_user
+from app.core import profiling
+from app.core.config import settings
+from app.db import slow_query_log
+from app.models.user import User
+
+router = APIRouter()
+
+
+class ProfileSummary(BaseModel):
+    id: str
+    created_at: str
+    method: str
+    path: str
+    route: Optional[str] = None
+    status: Optional[int] = None
+    duration_ms: Optional[float] = None
+    trigger: Optional[str] = None
+    user_id: Optional[int] = None
+    magazine_id: Optional[int] = None
+    sample_count: Optional[int] = None
+    sql_count: Optional[int] = None
+    size_bytes: int
+
+
+class ProfilingRuleCreate(BaseModel):
+    route_prefix: str = Field(..., min_length=1, description="e.g. /api/v1/reports/revenue")
+    magazine_id: Optional[int] = Field(None, description="Only keep profiles of this shop")
+    sample_rate: float = Field(0.1, gt=0, le=1)
+    duration_minutes: int = Field(15, ge=1, le=24 * 60)
+
+
+class ProfilingRule(BaseModel):
+    id: str
+    route_prefix: str
+    magazine_id: Optional[int] = None
+    sample_rate: float
+    expires_at: float
+
+
+@router.get("/profiles", response_model=List[ProfileSummary])
+def list_profiles(current_user: User = Depends(get_current_admin_user)):
+    """Stored request profiles, newest first."""
+    return profiling.list_profiles()
+
+
+@router.get("/profiles/{profile_id}")
+def download_profile(profile_id: str, current_user: User = Depends(get_current_admin_user)):
+    """Full profile: stack samples, top functions and the SQL timeline."""
+    path = profiling.profile_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(str(path), media_type="application/json", filename=path.name)
+
+
+@router.get("/profiles/{profile_id}/collapsed", response_class=PlainTextResponse)
+def download_collapsed_stacks(profile_id: str, current_user: User = Depends(get_current_admin_user)):
+    """Stack samples in collapsed format, for flamegraph.pl or speedscope."""
+    path = profiling.profile_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profiling.collapsed_stacks(json.loads(path.read_text()))
+
+
+@router.get("/profiling/rules", response_model=List[ProfilingRule])
+def list_profiling_rules(current_user: User = Depends(get_current_admin_user)):
+    return profiling.load_rules()
+
+
+@router.post("/profiling/rules", response_model=ProfilingRule)
+def create_profiling_rule(rule: ProfilingRuleCreate, current_user: User = Depends(get_current_admin_user)):
+    """Profile a sample of live requests to a route (optionally one shop) for a while."""
+    created = {
+        "id": uuid.uuid4().hex[:8],
+        "route_prefix": rule.route_prefix,
+        "magazine_id": rule.magazine_id,
+        "sample_rate": rule.sample_rate,
+        "expires_at": time.time() + rule.duration_minutes * 60,
+    }
+    profiling.save_rules(profiling.load_rules() + [created])
+    return created
+
+
+@router.delete("/profiling/rules/{rule_id}")
+def delete_profiling_rule(rule_id: str, current_user: User = Depends(get_current_admin_user)):
+    rules = profiling.load_rules()
+    remaining = [r for r in rules if r["id"] != rule_id]
+    if len(remaining) == len(rules):
+        raise HTTPException(status_code=404, detail="Rule not found")
+    profiling.save_rules(remaining)
+    return {"message": "Rule deleted"}
+
+
+@router.get("/slow-queries")
+def get_slow_queries(
+    limit: int = Query(50, ge=1, le=500),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Slow statements of this worker grouped by fingerprint, most total time first."""
+    return {
+        "enabled": settings.SLOW_QUERY_MS > 0,
+        "threshold_ms": settings.SLOW_QUERY_MS,
+        "fingerprints": slow_query_log.aggregates(limit),
+    }
+
+
+@router.get("/slow-queries/recent")
+def get_recent_slow_queries(
+    limit: int = Query(50, ge=1, le=slow_query_log.RECENT_ENTRIES),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Latest individual slow statements with parameters and plan, newest first."""
+    return slow_query_log.recent(limit)
+
+
+@router.delete("/slow-queries")
+def reset_slow_queries(current_user: User = Depends(get_current_admin_user)):
+    slow_query_log.reset()
+    return {"message": "Slow-query statistics reset"}
@@ -0,0 +1,83 @@
+import asyncio
+import logging
+from typing import List, Optional
+
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, status
+from starlette.concurrency import run_in_threadpool
+
+from app.api.deps import user_id_from_token
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models.user import User
+from app.services import live_events
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+def _channels(token: Optional[str]) -> Optional[List[str]]:
+    """Channels of the token's user, or None if the token is not valid"""
+    user_id = user_id_from_token(token) if token else None
+    if user_id is None:
+        return None
+    # Short-lived session: the connection must not hold a database connection while open
+    db = SessionLocal()
+    try:
+        user = db.get(User, user_id)
+        return live_events.channels_for(user) if user is not None else None
+    finally:
+        db.close()
+
+
+async def _forward(websocket: WebSocket, subscription: live_events.Subscription) -> None:
+    try:
+        while True:
+            payload = await subscription.next(settings.LIVE_KEEPALIVE_SECONDS)
+            await websocket.send_json(payload if payload is not None else {"type": "ping"})
+    except (WebSocketDisconnect, RuntimeError):
+        # Closed while sending; the receive loop sees the disconnect
+        pass
+
+
+@router.websocket("/ws")
+async def live_updates(websocket: WebSocket, token: Optional[str] = None):
+    """Push channel replacing polling of approval status, notifications and active payments
+
+    Authenticate with the access token as ``?token=`` or an
+    ``Authorization: Bearer`` header; pending accounts may connect and
+    wait for "account_approved". The server sends ``{"type": "ready"}``,
+    then events such as ``{"type": "payment_recorded", "data": {...},
+    "at": ...}``; ids in ``data`` tell what to refetch. "resync" means
+    events were dropped and everything should be refetched; "ping" is a
+    keepalive. Messages from the client are ignored.
+    """
+    if token is None:
+        authorization = websocket.headers.get("authorization", "")
+        if authorization.lower().startswith("bearer "):
+            token = authorization[7:]
+    channels = await run_in_threadpool(_channels, token)
+    if channels is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Could not validate credentials")
+        return
+    if live_events.get_backend() is None:
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER, reason="Live events are disabled")
+        return
+
+    await websocket.accept()
+    subscription = live_events.subscribe(channels)
+    forwarder = None
+    try:
+        await websocket.send_json({"type": "ready", "channels": channels})
+        forwarder = asyncio.ensure_future(_forward(websocket, subscription))
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if forwarder is not None:
+            forwarder.cancel()
+        live_events.unsubscribe(subscription)
+        logger.debug(f"Live connection closed for {channels[0]}")
@@ -1,17 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
+from sqlalchemy.orm import Session, contains_eager, joinedload
+from sqlalchemy import or_, func, select, update
 from typing import List, Optional
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
 import json
-from app.db.database import get_db
+from app.db.database import get_db, unit_of_work
 from app.models.transaction import Loan, LoanPayment, TransactionType, PaymentStatus
 from app.models.product import Product
 from app.models.user import User, UserRole, Client
 from app.api.deps import get_current_user
+from app.core.etag import make_etag, not_modified, user_scope
+from app.core.fieldsets import projected_response, projection_query, requested_fields
 from app.api.api_v1.endpoints.transactions import create_transaction
 from app.core.timezone import to_uzbekistan_time
+from app.services.search_service import matching_ids
+from app.services.inventory_service import take_unit
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -114,8 +118,145 @@ def calculate_overdue_amount(db: Session, loan: Loan) -> float:
     total_overdue = sum(payment.amount for payment in overdue_payments)
     return total_overdue
 
+def calculate_overdue_amounts(db: Session, loans: list) -> dict:
+    """Overdue amount per loan id for a page of loans (objects or rows with id and is_completed), in one query"""
+    open_ids = [loan.id for loan in loans if not loan.is_completed]
+    if not open_ids:
+        return {}
+    today = datetime.now().date()
+    rows = db.query(LoanPayment.loan_id, func.sum(LoanPayment.amount)).filter(
+        LoanPayment.loan_id.in_(open_ids),
+        LoanPayment.status == PaymentStatus.PENDING,
+        LoanPayment.due_date < today
+    ).group_by(LoanPayment.loan_id).all()
+    return {loan_id: total or 0.0 for loan_id, total in rows}
+
+def parse_agreement_images(raw: Optional[str]) -> Optional[List[str]]:
+    """Stored JSON list of agreement image URLs; malformed JSON reads as no images"""
+    if not raw:
+        return None
+    try:
+        return json.loads(raw)
+    except json.JSONDecodeError:
+        return []
+
+def loan_to_response(loan: Loan, overdue_amount: float) -> LoanResponse:
+    """List representation of a loan; product, client and seller must be loaded"""
+    agreement_images = parse_agreement_images(loan.agreement_images)
+    
+    return LoanResponse(
+        id=loan.id,
+        loan_price=loan.loan_price,
+        initial_payment=loan.initial_payment,
+        remaining_amount=loan.remaining_amount,
+        loan_months=loan.loan_months,
+        interest_rate=loan.interest_rate,
+        monthly_payment=loan.monthly_payment,
+        loan_start_date=to_uzbekistan_time(loan.loan_start_date),
+        created_at=to_uzbekistan_time(loan.created_at),
+        is_completed=loan.is_completed,
+        track_payments=bool(loan.track_payments),
+        product_id=loan.product_id,
+        client_id=loan.client_id,
+        seller_id=loan.seller_id,
+        product_name=loan.product.name,
+        product_model=loan.product.model,
+        client_name=loan.client.name,
+        client_phone=loan.client.phone,
+        seller_name=loan.seller.name,
+        video_url=loan.video_url,
+        agreement_images=agreement_images,
+        imei=loan.imei,
+        overdue_amount=overdue_amount
+    )
+
+# The list representation as plain columns, labelled like the LoanResponse fields:
+# list pages read rows of these instead of Loan/Product/Client/User objects
+LOAN_LIST_COLUMNS = (
+    Loan.id, Loan.loan_price, Loan.initial_payment, Loan.remaining_amount, Loan.loan_months,
+    Loan.interest_rate, Loan.monthly_payment, Loan.loan_start_date, Loan.created_at, Loan.is_completed,
+    Loan.track_payments, Loan.product_id, Loan.client_id, Loan.seller_id,
+    Product.name.label("product_name"), Product.model.label("product_model"),
+    Client.name.label("client_name"), Client.phone.label("client_phone"), User.name.label("seller_name"),
+    Loan.video_url, Loan.agreement_images, Loan.imei,
+)
+
+LOAN_COLUMNS = {column.key: column for column in LOAN_LIST_COLUMNS}
+# Tables the joined fields come from; sparse fieldsets join only what they read
+LOAN_JOINS = {
+    "product_name": (Product, Loan.product_id == Product.id),
+    "product_model": (Product, Loan.product_id == Product.id),
+    "client_name": (Client, Loan.client_id == Client.id),
+    "client_phone": (Client, Loan.client_id == Client.id),
+    "seller_name": (User, Loan.seller_id == User.id),
+}
+# Named projections for ?view=
+LOAN_VIEWS = {
+    "list": ("id", "client_name", "product_name", "remaining_amount", "monthly_payment",
+             "loan_start_date", "is_completed", "overdue_amount"),
+}
+
+def _loan_row_values(row) -> dict:
+    """Response values of a row of (some of) LOAN_LIST_COLUMNS"""
+    values = row._asdict()
+    for name in ("loan_start_date", "created_at"):
+        if name in values:
+            values[name] = to_uzbekistan_time(values[name])
+    if "track_payments" in values:
+        values["track_payments"] = bool(values["track_payments"])
+    if "agreement_images" in values:
+        values["agreement_images"] = parse_agreement_images(values["agreement_images"])
+    return values
+
+def loan_row_to_response(row, overdue_amount: float) -> LoanResponse:
+    """List representation from a row of LOAN_LIST_COLUMNS"""
+    return LoanResponse(**_loan_row_values(row), overdue_amount=overdue_amount)
+
+def payment_to_response(payment: LoanPayment) -> PaymentResponse:
+    return PaymentResponse(
+        id=payment.id,
+        amount=payment.amount,
+        payment_date=payment.payment_date,
+        due_date=payment.due_date,
+        status=payment.status.value,
+        is_late=payment.is_late,
+        is_full_payment=payment.is_full_payment,
+        loan_id=payment.loan_id
+    )
+
+def loan_validator(db: Session, loan_id: int):
+    """Magazine and change markers of a loan and everything its responses show, in one query
+
+    None when the loan does not exist. Payments contribute their count and
+    latest update, so adding, recording or deleting one changes the row.
+    """
+    payment_count = select(func.count(LoanPayment.id)).where(LoanPayment.loan_id == Loan.id)
+    last_payment_update = select(func.max(LoanPayment.updated_at)).where(LoanPayment.loan_id == Loan.id)
+    return db.query(
+        Loan.magazine_id,
+        Loan.updated_at,
+        Product.updated_at,
+        Client.updated_at,
+        User.updated_at,
+        payment_count.scalar_subquery(),
+        last_payment_update.scalar_subquery()
+    ).outerjoin(Product, Loan.product_id == Product.id).outerjoin(
+        Client, Loan.client_id == Client.id
+    ).outerjoin(User, Loan.seller_id == User.id).filter(Loan.id == loan_id).first()
+
+def loan_not_modified(request: Request, response: Response, db: Session, current_user: User,
+                      loan_id: int, *extra) -> Optional[Response]:
+    """304 for a loan the user may see and already has; sets the ETag otherwise"""
+    validator = loan_validator(db, loan_id)
+    if validator is None:
+        return None
+    if current_user.role != UserRole.ADMIN and validator[0] != current_user.magazine_id:
+        return None
+    etag = make_etag(*user_scope(current_user), request.url.path, *extra, *validator)
+    return not_modified(request, response, etag)
+
 def generate_payment_schedule(db: Session, loan: Loan) -> None:
-    """Generate payment schedule for a loan"""
+    """Generate payment schedule for a loan (flushed; committed by the caller)"""
     
     # Calculate due dates for each month using proper month addition
     base_due_date = loan.loan_start_date.date() + relativedelta(months=1)
@@ -136,7 +277,7 @@ def generate_payment_schedule(db: Session, loan: Loan) -> None:
         
         db.add(payment)
     
-    db.commit()
+    db.flush()
 
 @router.post("/calculate", response_model=LoanCalculation)
 def calculate_loan(
@@ -180,10 +321,21 @@ def get_loans(
     offset: int = 0,
     date_from: Optional[str] = None,
     date_to: Optional[str] = None,
-    search: Optional[str] = None
+    search: Optional[str] = None,
+    fields: Optional[str] = None,
+    view: Optional[str] = None
 ):
-    """Get all loans for the current user's scope with filtering support"""
-    query = db.query(Loan).join(Product).join(Client).join(User)
+    """Get all loans for the current user's scope with filtering support
+
+    ``fields`` (comma-separated LoanResponse fields) or ``view=list`` return
+    only those fields of each loan; only their columns are read and only
+    the tables they come from are joined.
+    """
+    selected = requested_fields(LoanResponse, LOAN_VIEWS, fields, view)
+    with_overdue = selected is None or "overdue_amount" in selected
+    # Overdue amounts are computed from the loan's id and completion
+    query = projection_query(db, Loan, LOAN_COLUMNS, LOAN_JOINS, selected,
+                             extra=("id", "is_completed") if with_overdue else ())
     
     # Apply user scope filtering
     if current_user.role == UserRole.ADMIN:
@@ -216,60 +368,27 @@ def get_loans(
     
     # Apply search filtering
     if search:
-        search_term = f"%{search}%"
         query = query.filter(
             or_(
-                Product.name.ilike(search_term),
-                Product.model.ilike(search_term),
-                Client.name.ilike(search_term),
-                User.name.ilike(search_term)
+                Loan.product_id.in_(matching_ids("product", search)),
+                Loan.client_id.in_(matching_ids("client", search)),
+                Loan.seller_id.in_(matching_ids("user", search))
             )
         )
     
     # Apply pagination and ordering
-    loans = query.order_by(Loan.created_at.desc()).offset(offset).limit(limit).all()
-    
-    # Format response with related info
-    response = []
-    for loan in loans:
-        # Safely parse JSON agreement_images
-        agreement_images = None
-        if loan.agreement_images:
-            try:
-                agreement_images = json.loads(loan.agreement_images)
-            except json.JSONDecodeError:
-                # Handle malformed JSON gracefully
-                agreement_images = []
-        
-        overdue_amount = calculate_overdue_amount(db, loan)
-        
-        response.append(LoanResponse(
-            id=loan.id,
-            loan_price=loan.loan_price,
-            initial_payment=loan.initial_payment,
-            remaining_amount=loan.remaining_amount,
-            loan_months=loan.loan_months,
-            interest_rate=loan.interest_rate,
-            monthly_payment=loan.monthly_payment,
-            loan_start_date=to_uzbekistan_time(loan.loan_start_date),
-            created_at=to_uzbekistan_time(loan.created_at),
-            is_completed=loan.is_completed,
-            track_payments=bool(loan.track_payments),
-            product_id=loan.product_id,
-            client_id=loan.client_id,
-            seller_id=loan.seller_id,
-            product_name=loan.product.name,
-            product_model=loan.product.model,
-            client_name=loan.client.name,
-            client_phone=loan.client.phone,
-            seller_name=loan.seller.name,
-            video_url=loan.video_url,
-            agreement_images=agreement_images,
-            imei=loan.imei,
-            overdue_amount=overdue_amount
-        ))
-    
-    return response
+    rows = query.order_by(Loan.created_at.desc()).offset(offset).limit(limit).all()
+    overdue_amounts = calculate_overdue_amounts(db, rows) if with_overdue else {}
+    
+    if selected is None:
+        return [loan_row_to_response(row, overdue_amounts.get(row.id, 0.0)) for row in rows]
+    items = []
+    for row in rows:
+        values = _loan_row_values(row)
+        if with_overdue:
+            values["overdue_amount"] = overdue_amounts.get(row.id, 0.0)
+        items.append(values)
+    return projected_response(LoanResponse, selected, items)
 
 @router.post("/", response_model=LoanResponse)
 def create_loan(
@@ -312,13 +431,6 @@ def create_loan(
             )
     # Admin can create loans for any product
     
-    # Check if product is in stock
-    if product.count <= 0:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Product is out of stock"
-        )
-    
     # Enhanced loan data validation
     if loan_data.loan_price <= 0:
         raise HTTPException(
@@ -350,6 +462,13 @@ def create_loan(
     # FIXED: remaining_amount should be the total loan amount (financed + interest)
     remaining_amount = total_loan_amount
     
+    # Take one unit from stock in a single conditional UPDATE
+    if take_unit(db, Product, product.id) is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Product is out of stock"
+        )
+    
     try:
         # Use the current user's magazine_id
         if not current_user.magazine_id:
@@ -358,48 +477,43 @@ def create_loan(
                 detail="User must be assigned to a magazine to create loans"
             )
         
-        # Begin transaction for atomic operation
-        # Create the loan
-        new_loan = Loan(
-            product_id=loan_data.product_id,
-            client_id=loan_data.client_id,
-            seller_id=current_user.id,
-            magazine_id=current_user.magazine_id,
-            loan_price=loan_data.loan_price,
-            initial_payment=loan_data.initial_payment,
-            remaining_amount=remaining_amount,
-            loan_months=loan_data.loan_months,
-            interest_rate=loan_data.interest_rate,
-            monthly_payment=monthly_payment,
-            loan_start_date=loan_data.loan_start_date,
-            video_url=loan_data.video_url,
-            agreement_images=json.dumps(loan_data.agreement_images) if loan_data.agreement_images else None,
-            imei=loan_data.imei,
-            track_payments=bool(loan_data.track_payments),
-        )
-        
-        # Update product inventory atomically
-        product.count -= 1
-        
-        db.add(new_loan)
-        db.commit()
-        db.refresh(new_loan)
-        
-        # Generate payment schedule for the loan
-        generate_payment_schedule(db, new_loan)
-        
-        # Create transaction record for loan creation
-        create_transaction(
-            db=db,
-            transaction_type=TransactionType.LOAN,
-            amount=new_loan.loan_price,
-            description=f"Loan created for {client.name} - {product.name} {product.model or ''}".strip(),
-            seller_id=current_user.id,
-            magazine_id=current_user.magazine_id,
-            loan_id=new_loan.id,
-            product_id=product.id,
-            client_id=client.id
-        )
+        # Loan, stock change, payment schedule and ledger row commit together
+        with unit_of_work(db):
+            new_loan = Loan(
+                product_id=loan_data.product_id,
+                client_id=loan_data.client_id,
+                seller_id=current_user.id,
+                magazine_id=current_user.magazine_id,
+                loan_price=loan_data.loan_price,
+                initial_payment=loan_data.initial_payment,
+                remaining_amount=remaining_amount,
+                loan_months=loan_data.loan_months,
+                interest_rate=loan_data.interest_rate,
+                monthly_payment=monthly_payment,
+                loan_start_date=loan_data.loan_start_date,
+                video_url=loan_data.video_url,
+                agreement_images=json.dumps(loan_data.agreement_images) if loan_data.agreement_images else None,
+                imei=loan_data.imei,
+                track_payments=bool(loan_data.track_payments),
+            )
+            db.add(new_loan)
+            db.flush()
+            
+            # Generate payment schedule for the loan
+            generate_payment_schedule(db, new_loan)
+            
+            # Create transaction record for loan creation
+            create_transaction(
+                db=db,
+                transaction_type=TransactionType.LOAN,
+                amount=new_loan.loan_price,
+                description=f"Loan created for {client.name} - {product.name} {product.model or ''}".strip(),
+                seller_id=current_user.id,
+                magazine_id=current_user.magazine_id,
+                loan_id=new_loan.id,
+                product_id=product.id,
+                client_id=client.id
+            )
         
     except Exception as e:
         db.rollback()
@@ -462,14 +576,78 @@ def get_my_upcoming_payments(
     ]
 
 
+@router.get("/active-payments", response_model=List[dict])
+def get_active_loans_with_payments(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Get all loans with pending payments (for homepage display)"""
+    from datetime import date
+    
+    # Build base query for loans with pending payments
+    query = db.query(LoanPayment).join(Loan).filter(
+        LoanPayment.status.in_([PaymentStatus.PENDING, PaymentStatus.OVERDUE]),
+        Loan.is_completed == False
+    ).options(
+        contains_eager(LoanPayment.loan).joinedload(Loan.client),
+        contains_eager(LoanPayment.loan).joinedload(Loan.product)
+    )
+    
+    # Filter by magazine for non-admin users
+    if current_user.role != UserRole.ADMIN:
+        query = query.filter(Loan.magazine_id == current_user.magazine_id)
+    
+    # Get next payment for each loan (order by due date)
+    payments = query.order_by(LoanPayment.due_date).all()
+    
+    # Group by loan and get first (next) payment for each loan
+    loans_data = {}
+    today = date.today()
+    
+    for payment in payments:
+        if payment.loan_id not in loans_data:
+            payment_date = payment.due_date.date() if hasattr(payment.due_date, 'date') else payment.due_date
+            days_until_due = (payment_date - today).days
+            is_overdue = days_until_due < 0
+            
+            loans_data[payment.loan_id] = {
+                "loan_id": payment.loan_id,
+                "client_name": payment.loan.client.name,
+                "client_phone": payment.loan.client.phone,
+                "product_name": payment.loan.product.name,
+                "next_payment_amount": payment.amount,
+                "next_payment_date": payment.due_date.isoformat(),
+                "days_until_due": abs(days_until_due) if is_overdue else days_until_due,
+                "is_overdue": is_overdue,
+                "total_remaining": payment.loan.remaining_amount
+            }
+    
+    # Convert to list and sort by urgency (overdue first, then by due date)
+    result = list(loans_data.values())
+    result.sort(key=lambda x: (not x["is_overdue"], x["days_until_due"]))
+    
+    return result
+
 @router.get("/{loan_id}", response_model=LoanResponse)
 def get_loan(
     loan_id: int,
     request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Get a specific loan by ID"""
+    """Get a specific loan by ID
+
+    Supports ``If-None-Match``: 304 while the loan, its payments, product,
+    client and seller are unchanged (and on the same day, since the
+    overdue amount depends on it).
+    """
+    # File URLs embed the host the request came through
+    cached = loan_not_modified(request, response, db, current_user, loan_id,
+                               request.url.netloc, datetime.now().date())
+    if cached is not None:
+        return cached
+    
     loan = db.query(Loan).filter(Loan.id == loan_id).first()
     
     if not loan:
@@ -581,10 +759,19 @@ def update_loan_tracking(
 @router.get("/{loan_id}/payments", response_model=List[PaymentResponse])
 def get_loan_payments(
     loan_id: int,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Get all payments for a specific loan"""
+    """Get all payments for a specific loan
+
+    Supports ``If-None-Match``: 304 while the loan and its payments are unchanged.
+    """
+    cached = loan_not_modified(request, response, db, current_user, loan_id)
+    if cached is not None:
+        return cached
+    
     # Check if loan exists and user has access
     loan = db.query(Loan).filter(Loan.id == loan_id).first()
     if not loan:
@@ -597,19 +784,7 @@ def get_loan_payments(
     
     payments = db.query(LoanPayment).filter(LoanPayment.loan_id == loan_id).order_by(LoanPayment.due_date).all()
     
-    return [
-        PaymentResponse(
-            id=payment.id,
-            amount=payment.amount,
-            payment_date=payment.payment_date,
-            due_date=payment.due_date,
-            status=payment.status.value,
-            is_late=payment.is_late,
-            is_full_payment=payment.is_full_payment,
-            loan_id=payment.loan_id
-        )
-        for payment in payments
-    ]
+    return [payment_to_response(payment) for payment in payments]
 
 @router.post("/{loan_id}/payments/{payment_id}/record", response_model=PaymentResponse)
 def record_payment(
@@ -647,50 +822,38 @@ def record_payment(
         raise HTTPException(status_code=400, detail="Payment amount must be greater than 0")
     
     try:
-        # Update payment record
-        payment.payment_date = payment_data.payment_date
-        payment.amount = payment_data.amount  # Allow partial payments
-        payment.status = PaymentStatus.PAID
-        
-        # Update loan remaining balance
-        loan.remaining_amount -= payment_data.amount
-        
-        # Check if loan is completed
-        if loan.remaining_amount <= 0:
-            loan.is_completed = True
-            loan.remaining_amount = 0  # Ensure it doesn't go negative
-        
-        db.commit()
-        
-        # Create transaction record for payment
-        create_transaction(
-            db=db,
-            transaction_type=TransactionType.LOAN_PAYMENT,
-            amount=payment_data.amount,
-            description=f"Payment received for loan #{loan.id} - {loan.client.name}",
-            seller_id=current_user.id,
-            magazine_id=current_user.magazine_id,
-            loan_id=loan.id,
-            loan_payment_id=payment.id,
-            client_id=loan.client_id
-        )
-        
-        db.refresh(payment)
+        with unit_of_work(db):
+            # Update payment record
+            payment.payment_date = payment_data.payment_date
+            payment.amount = payment_data.amount  # Allow partial payments
+            payment.status = PaymentStatus.PAID
+            
+            # Update loan remaining balance
+            loan.remaining_amount -= payment_data.amount
+            
+            # Check if loan is completed
+            if loan.remaining_amount <= 0:
+                loan.is_completed = True
+                loan.remaining_amount = 0  # Ensure it doesn't go negative
+            
+            # Create transaction record for payment
+            create_transaction(
+                db=db,
+                transaction_type=TransactionType.LOAN_PAYMENT,
+                amount=payment_data.amount,
+                description=f"Payment received for loan #{loan.id} - {loan.client.name}",
+                seller_id=current_user.id,
+                magazine_id=current_user.magazine_id,
+                loan_id=loan.id,
+                loan_payment_id=payment.id,
+                client_id=loan.client_id
+            )
         
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to record payment: {str(e)}")
     
-    return PaymentResponse(
-        id=payment.id,
-        amount=payment.amount,
-        payment_date=payment.payment_date,
-        due_date=payment.due_date,
-        status=payment.status.value,
-        is_late=payment.is_late,
-        is_full_payment=payment.is_full_payment,
-        loan_id=payment.loan_id
-    )
+    return payment_to_response(payment)
 
 @router.get("/payments/overdue", response_model=List[dict])
 def get_overdue_payments(
@@ -705,6 +868,9 @@ def get_overdue_payments(
         LoanPayment.status == PaymentStatus.PENDING,
         LoanPayment.due_date < datetime.now(),
         Loan.is_completed == False
+    ).options(
+        contains_eager(LoanPayment.loan).joinedload(Loan.client),
+        contains_eager(LoanPayment.loan).joinedload(Loan.product)
     )
     
     # Filter by magazine for non-admin users
@@ -713,15 +879,7 @@ def get_overdue_payments(
     
     overdue_payments = query.all()
     
-    # Update overdue status
-    for payment in overdue_payments:
-        if not payment.is_late:
-            payment.is_late = True
-            payment.status = PaymentStatus.OVERDUE
-    
-    db.commit()
-    
-    # Return detailed information
+    # Return detailed information (built before the commit expires the rows)
     result = []
     for payment in overdue_payments:
         result.append({
@@ -736,6 +894,17 @@ def get_overdue_payments(
             "remaining_balance": payment.loan.remaining_amount
         })
     
+    # Update overdue status in one statement
+    newly_late = [payment.id for payment in overdue_payments if not payment.is_late]
+    if newly_late:
+        db.execute(
+            update(LoanPayment)
+            .where(LoanPayment.id.in_(newly_late))
+            .values(is_late=True, status=PaymentStatus.OVERDUE)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+    
     return result
 
 @router.get("/payments/upcoming", response_model=List[dict])
@@ -755,6 +924,9 @@ def get_upcoming_payments(
         LoanPayment.due_date <= end_date,
         LoanPayment.due_date >= datetime.now(),
         Loan.is_completed == False
+    ).options(
+        contains_eager(LoanPayment.loan).joinedload(Loan.client),
+        contains_eager(LoanPayment.loan).joinedload(Loan.product)
     )
     
     # Filter by magazine for non-admin users
@@ -780,55 +952,6 @@ def get_upcoming_payments(
     
     return result
 
-@router.get("/active-payments", response_model=List[dict])
-def get_active_loans_with_payments(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-):
-    """Get all loans with pending payments (for homepage display)"""
-    from datetime import date
-    
-    # Build base query for loans with pending payments
-    query = db.query(LoanPayment).join(Loan).filter(
-        LoanPayment.status.in_([PaymentStatus.PENDING, PaymentStatus.OVERDUE]),
-        Loan.is_completed == False
-    )
-    
-    # Filter by magazine for non-admin users
-    if current_user.role != UserRole.ADMIN:
-        query = query.filter(Loan.magazine_id == current_user.magazine_id)
-    
-    # Get next payment for each loan (order by due date)
-    payments = query.order_by(LoanPayment.due_date).all()
-    
-    # Group by loan and get first (next) payment for each loan
-    loans_data = {}
-    today = date.today()
-    
-    for payment in payments:
-        if payment.loan_id not in loans_data:
-            payment_date = payment.due_date.date() if hasattr(payment.due_date, 'date') else payment.due_date
-            days_until_due = (payment_date - today).days
-            is_overdue = days_until_due < 0
-            
-            loans_data[payment.loan_id] = {
-                "loan_id": payment.loan_id,
-                "client_name": payment.loan.client.name,
-                "client_phone": payment.loan.client.phone,
-                "product_name": payment.loan.product.name,
-                "next_payment_amount": payment.amount,
-                "next_payment_date": payment.due_date.isoformat(),
-                "days_until_due": abs(days_until_due) if is_overdue else days_until_due,
-                "is_overdue": is_overdue,
-                "total_remaining": payment.loan.remaining_amount
-            }
-    
-    # Convert to list and sort by urgency (overdue first, then by due date)
-    result = list(loans_data.values())
-    result.sort(key=lambda x: (not x["is_overdue"], x["days_until_due"]))
-    
-    return result
-
 @router.post("/{loan_id}/payments/{payment_id}/mark-paid", response_model=PaymentResponse)
 def mark_payment_paid(
     loan_id: int,
@@ -871,50 +994,38 @@ def mark_payment_paid(
         else:
             payment_datetime = datetime.now()
         
-        # Update payment record
-        payment.payment_date = payment_datetime
-        payment.amount = payment_request.amount
-        payment.status = PaymentStatus.PAID
-        
-        # Update loan remaining balance
-        loan.remaining_amount -= payment_request.amount
-        
-        # Check if loan is completed
-        if loan.remaining_amount <= 0:
-            loan.is_completed = True
-            loan.remaining_amount = 0
-        
-        db.commit()
-        
-        # Create transaction record for payment
-        create_transaction(
-            db=db,
-            transaction_type=TransactionType.LOAN_PAYMENT,
-            amount=payment_request.amount,
-            description=f"Payment received for loan #{loan.id} - {loan.client.name}",
-            seller_id=current_user.id,
-            magazine_id=current_user.magazine_id,
-            loan_id=loan.id,
-            loan_payment_id=payment.id,
-            client_id=loan.client_id
-        )
-        
-        db.refresh(payment)
+        with unit_of_work(db):
+            # Update payment record
+            payment.payment_date = payment_datetime
+            payment.amount = payment_request.amount
+            payment.status = PaymentStatus.PAID
+            
+            # Update loan remaining balance
+            loan.remaining_amount -= payment_request.amount
+            
+            # Check if loan is completed
+            if loan.remaining_amount <= 0:
+                loan.is_completed = True
+                loan.remaining_amount = 0
+            
+            # Create transaction record for payment
+            create_transaction(
+                db=db,
+                transaction_type=TransactionType.LOAN_PAYMENT,
+                amount=payment_request.amount,
+                description=f"Payment received for loan #{loan.id} - {loan.client.name}",
+                seller_id=current_user.id,
+                magazine_id=current_user.magazine_id,
+                loan_id=loan.id,
+                loan_payment_id=payment.id,
+                client_id=loan.client_id
+            )
         
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to mark payment as paid: {str(e)}")
     
-    return PaymentResponse(
-        id=payment.id,
-        amount=payment.amount,
-        payment_date=payment.payment_date,
-        due_date=payment.due_date,
-        status=payment.status.value,
-        is_late=payment.is_late,
-        is_full_payment=payment.is_full_payment,
-        loan_id=payment.loan_id
-    )
+    return payment_to_response(payment)
 
 @router.post("/{loan_id}/pay-full", response_model=dict)
 def pay_full_loan(
@@ -956,50 +1067,49 @@ def pay_full_loan(
         else:
             payment_datetime = datetime.now()
         
-        # Delete all pending scheduled payments since this is a full payment
-        pending_payments = db.query(LoanPayment).filter(
-            LoanPayment.loan_id == loan_id,
-            LoanPayment.status.in_([PaymentStatus.PENDING, PaymentStatus.OVERDUE])
-        ).all()
-        
-        # Count for response
-        payments_count = len(pending_payments)
-        
-        # Delete pending payments
-        for payment in pending_payments:
-            db.delete(payment)
-        
-        # Create a single payment record for the full amount
-        full_payment = LoanPayment(
-            loan_id=loan_id,
-            amount=payment_request.amount,
-            due_date=payment_datetime,  # Due date same as payment date for full payments
-            payment_date=payment_datetime,
-            status=PaymentStatus.PAID,
-            is_late=False,
-            is_full_payment=True,  # Mark as one-time full payment
-            notes="Full loan payment - loan completed in one payment"
-        )
-        
-        db.add(full_payment)
-        
-        # Complete the loan
-        loan.remaining_amount = 0
-        loan.is_completed = True
-        
-        db.commit()
-        
-        # Create transaction record for full payment
-        create_transaction(
-            db=db,
-            transaction_type=TransactionType.LOAN_PAYMENT,
-            amount=payment_request.amount,
-            description=f"Full loan payment for loan #{loan.id} - {loan.client.name} (Loan completed)",
-            seller_id=current_user.id,
-            magazine_id=current_user.magazine_id,
-            loan_id=loan.id,
-            client_id=loan.client_id
-        )
+        with unit_of_work(db):
+            # Delete all pending scheduled payments since this is a full payment
+            pending_payments = db.query(LoanPayment).filter(
+                LoanPayment.loan_id == loan_id,
+                LoanPayment.status.in_([PaymentStatus.PENDING, PaymentStatus.OVERDUE])
+            ).all()
+            
+            # Count for response
+            payments_count = len(pending_payments)
+            
+            # Delete pending payments
+            for payment in pending_payments:
+                db.delete(payment)
+            
+            # Create a single payment record for the full amount
+            full_payment = LoanPayment(
+                loan_id=loan_id,
+                amount=payment_request.amount,
+                due_date=payment_datetime,  # Due date same as payment date for full payments
+                payment_date=payment_datetime,
+                status=PaymentStatus.PAID,
+                is_late=False,
+                is_full_payment=True,  # Mark as one-time full payment
+                notes="Full loan payment - loan completed in one payment"
+            )
+            
+            db.add(full_payment)
+            
+            # Complete the loan
+            loan.remaining_amount = 0
+            loan.is_completed = True
+            
+            # Create transaction record for full payment
+            create_transaction(
+                db=db,
+                transaction_type=TransactionType.LOAN_PAYMENT,
+                amount=payment_request.amount,
+                description=f"Full loan payment for loan #{loan.id} - {loan.client.name} (Loan completed)",
+                seller_id=current_user.id,
+                magazine_id=current_user.magazine_id,
+                loan_id=loan.id,
+                client_id=loan.client_id
+            )
         
     except Exception as e:
         db.rollback()
@@ -1,7 +1,6 @@
-from typing import List
+from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
 from datetime import date, timedelta
 from pydantic import BaseModel
 
@@ -9,6 +8,7 @@ from app.api import deps
 from app.models.user import User, UserRole, UserStatus
 from app.models.magazine import Magazine, MagazineStatus
 from app.db.database import get_db
+from app.services.magazine_service import list_magazines_with_managers, get_magazine_status_counts
 
 class SubscriptionRequest(BaseModel):
     subscription_months: int
@@ -17,6 +17,8 @@ router = APIRouter()
 
 @router.get("/", response_model=List[dict])
 def get_all_magazines(
+    limit: Optional[int] = None,
+    offset: int = 0,
     current_user: User = Depends(deps.get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -24,34 +26,23 @@ def get_all_magazines(
     if current_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    magazines = db.query(Magazine).all()
-    
-    result = []
-    for mag in magazines:
-        # Get the manager for this magazine
-        manager = db.query(User).filter(
-            User.magazine_id == mag.id,
-            User.role == UserRole.MANAGER
-        ).first()
-        
-        result.append({
-            "id": mag.id,
-            "name": mag.name,
-            "status": mag.status.value,
-            "subscription_end_date": mag.subscription_end_date,
-            "created_at": mag.created_at,
-            "manager": {
-                "id": manager.id if manager else None,
-                "name": manager.name if manager else "No Manager",
-                "phone": manager.phone if manager else "",
-                "status": manager.status.value if manager else "inactive"
-            } if manager else None
-        })
-    
-    return result
+    return list_magazines_with_managers(db, limit=limit, offset=offset)
+
+@router.get("/counts")
+def get_magazine_counts(
+    current_user: User = Depends(deps.get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get the number of magazines per status (admin only)"""
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    return get_magazine_status_counts(db)
 
 @router.get("/pending")
 def get_pending_magazines(
+    limit: Optional[int] = None,
+    offset: int = 0,
     current_user: User = Depends(deps.get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -59,36 +50,15 @@ def get_pending_magazines(
     if current_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    magazines = db.query(Magazine).filter(
-        Magazine.status == MagazineStatus.PENDING
-    ).all()
-    
-    result = []
-    for mag in magazines:
-        manager = db.query(User).filter(
-            User.magazine_id == mag.id,
-            User.role == UserRole.MANAGER
-        ).first()
-        
-        result.append({
-            "id": mag.id,
-            "name": mag.name,
-            "status": mag.status.value,
-            "subscription_end_date": mag.subscription_end_date,
-            "created_at": mag.created_at,
-            "manager": {
-                "id": manager.id if manager else None,
-                "name": manager.name if manager else "No Manager",
-                "phone": manager.phone if manager else "",
-                "status": manager.status.value if manager else "inactive"
-            } if manager else None
-        })
-    
-    return result
+    return list_magazines_with_managers(
+        db, status=MagazineStatus.PENDING, limit=limit, offset=offset
+    )
 
 @router.get("/expiring-soon")
 def get_expiring_magazines(
     days: int = 30,
+    limit: Optional[int] = None,
+    offset: int = 0,
     current_user: User = Depends(deps.get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -96,42 +66,19 @@ def get_expiring_magazines(
     if current_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    cutoff_date = date.today() + timedelta(days=days)
-    
-    magazines = db.query(Magazine).filter(
-        and_(
-            Magazine.status == MagazineStatus.ACTIVE,
-            Magazine.subscription_end_date <= cutoff_date,
-            Magazine.subscription_end_date >= date.today()
-        )
-    ).all()
-    
-    result = []
-    for mag in magazines:
-        manager = db.query(User).filter(
-            User.magazine_id == mag.id,
-            User.role == UserRole.MANAGER
-        ).first()
-        
-        result.append({
-            "id": mag.id,
-            "name": mag.name,
-            "status": mag.status.value,
-            "subscription_end_date": mag.subscription_end_date,
-            "created_at": mag.created_at,
-            "manager": {
-                "id": manager.id if manager else None,
-                "name": manager.name if manager else "No Manager",
-                "phone": manager.phone if manager else "",
-                "status": manager.status.value if manager else "inactive"
-            } if manager else None
-        })
-    
-    return result
+    return list_magazines_with_managers(
+        db,
+        status=MagazineStatus.ACTIVE,
+        expiring_within_days=days,
+        limit=limit,
+        offset=offset
+    )
 
 
 @router.get("/inactive")
 def get_inactive_magazines(
+    limit: Optional[int] = None,
+    offset: int = 0,
     current_user: User = Depends(deps.get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -139,32 +86,9 @@ def get_inactive_magazines(
     if current_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    magazines = db.query(Magazine).filter(
-        Magazine.status == MagazineStatus.INACTIVE
-    ).all()
-    
-    result = []
-    for mag in magazines:
-        manager = db.query(User).filter(
-            User.magazine_id == mag.id,
-            User.role == UserRole.MANAGER
-        ).first()
-        
-        result.append({
-            "id": mag.id,
-            "name": mag.name,
-            "status": mag.status.value,
-            "subscription_end_date": mag.subscription_end_date,
-            "created_at": mag.created_at,
-            "manager": {
-                "id": manager.id if manager else None,
-                "name": manager.name if manager else "No Manager",
-                "phone": manager.phone if manager else "",
-                "status": manager.status.value if manager else "inactive"
-            } if manager else None
-        })
-    
-    return result
+    return list_magazines_with_managers(
+        db, status=MagazineStatus.INACTIVE, limit=limit, offset=offset
+    )
 
 
 @router.put("/{magazine_id}/approve")
@@ -1,11 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, Request, Response
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, or_, func
 from typing import List, Optional
 from datetime import datetime
 
 from app.db.database import get_db
 from app.api.deps import get_current_user
+from app.core.etag import make_etag, not_modified
 from app.models.user import User, UserRole
 from app.models.notification import PushToken, Notification, NotificationPreference, NotificationType, NotificationStatus, DeviceType
 from app.schemas.notification import (
@@ -204,12 +205,24 @@ async def send_admin_alert(
 
 @router.get("/my-notifications", response_model=List[NotificationResponse])
 async def get_my_notifications(
+    request: Request,
+    response: Response,
     limit: int = 50,
     offset: int = 0,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get notifications for current user"""
+    """Get notifications for current user
+
+    Supports ``If-None-Match``: 304 while none of the user's notifications changed.
+    """
+    validator = db.query(
+        func.count(Notification.id), func.max(Notification.id), func.max(Notification.updated_at)
+    ).filter(Notification.recipient_user_id == current_user.id).one()
+    cached = not_modified(request, response, make_etag("notifications", current_user.id, limit, offset, *validator))
+    if cached is not None:
+        return cached
+    
     notifications = db.query(Notification).filter(
         Notification.recipient_user_id == current_user.id
     ).order_by(Notification.created_at.desc()).offset(offset).limit(limit).all()
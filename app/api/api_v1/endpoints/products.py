@@ -1,12 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, UploadFile, File, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import Iterable, List, Set
+import csv
+import json
+import logging
 from app.db.database import get_db
 from app.models.product import Product
 from app.models.auto_product import AutoProduct
 from app.models.user import User, UserRole, UserType
-from app.api.deps import get_current_user
-from pydantic import BaseModel
+from app.api.deps import get_current_manager_user, get_current_user
+from app.core.etag import make_etag, not_modified, user_scope
+from app.services import report_cache, sync_service
+from app.services.product_import import MAX_ROWS, adjust_stock, import_products, parse_csv, resolve_prices
+from pydantic import BaseModel, Field
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -43,14 +52,38 @@ class ProductResponse(BaseModel):
     class Config:
         from_attributes = True
 
+def warehouse_manager_id(current_user: User) -> int:
+    """Manager whose warehouse new products go to"""
+    if current_user.role in (UserRole.ADMIN, UserRole.MANAGER):
+        # Admins and managers stock their own warehouse
+        return current_user.id
+    # Sellers stock their manager's warehouse
+    if not current_user.manager_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Seller account is not properly configured with a manager"
+        )
+    return current_user.manager_id
+
 @router.get("/", response_model=List[ProductResponse])
 def get_products(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Get all products for the current manager with pagination"""
+    """Get all products for the current manager with pagination
+
+    Supports ``If-None-Match``: 304 while no product in scope changed.
+    """
+    etag = make_etag("products", *user_scope(current_user), skip, limit,
+                     *sync_service.version(db, current_user, "products"))
+    cached = not_modified(request, response, etag)
+    if cached is not None:
+        return cached
+    
     if current_user.role == UserRole.ADMIN:
         # Admin can see all products
         products = db.query(Product).offset(skip).limit(limit).all()
@@ -68,46 +101,18 @@ def create_product(
     current_user: User = Depends(get_current_user)
 ):
     """Create a new product"""
-    print(f"Product creation request from user: {current_user.name}, role: {current_user.role}, manager_id: {current_user.manager_id}")
+    manager_id = warehouse_manager_id(current_user)
     
-    # Determine the manager ID
-    if current_user.role == UserRole.ADMIN:
-        # For admin, use their own ID as manager_id
-        manager_id = current_user.id
-    elif current_user.role == UserRole.MANAGER:
-        # For managers, use their own ID
-        manager_id = current_user.id
-    else:
-        # For sellers, use their manager's ID
-        if not current_user.manager_id:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Seller account is not properly configured with a manager"
-            )
-        manager_id = current_user.manager_id
-    
-    print(f"Using manager_id: {manager_id} for product creation")
+    logger.debug(f"Creating product for manager {manager_id} (requested by user {current_user.id})")
     
     # Handle both old and new price fields for backward compatibility
-    purchase_price = getattr(product_data, 'purchase_price', None)
-    sale_price = getattr(product_data, 'sale_price', None)
-    legacy_price = getattr(product_data, 'price', None)
-    
-    # If new fields are provided, use them; otherwise fall back to legacy price
-    if purchase_price is not None and sale_price is not None:
-        final_purchase_price = purchase_price
-        final_sale_price = sale_price
-        final_price = sale_price  # Use sale_price as the legacy price
-    elif legacy_price is not None:
-        # Backward compatibility: estimate purchase and sale prices from legacy price
-        final_purchase_price = legacy_price * 0.8  # Assume 20% margin
-        final_sale_price = legacy_price
-        final_price = legacy_price
-    else:
+    prices = resolve_prices(product_data.purchase_price, product_data.sale_price, product_data.price)
+    if prices is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Either provide purchase_price and sale_price, or legacy price field"
         )
+    final_price, final_purchase_price, final_sale_price = prices
     
     new_product = Product(
         name=product_data.name,
@@ -125,6 +130,91 @@ def create_product(
     
     return new_product
 
+class ProductImportRequest(BaseModel):
+    rows: List[dict] = Field(..., max_length=MAX_ROWS)
+
+class StockAdjustRequest(BaseModel):
+    items: List[dict] = Field(..., max_length=MAX_ROWS)
+
+def _result_stream(results: List[dict]) -> StreamingResponse:
+    """Per-row results as NDJSON, then one summary line"""
+    def lines() -> Iterable[str]:
+        summary = {}
+        for result in results:
+            summary[result["status"]] = summary.get(result["status"], 0) + 1
+            yield json.dumps(result) + "\n"
+        yield json.dumps({"summary": summary}) + "\n"
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+def _invalidate_reports(db: Session, manager_ids: Set[int]) -> None:
+    """Bulk imports and stock changes are Core writes, which the report cache's session events do not see"""
+    shops = db.query(User.magazine_id).filter(User.id.in_(manager_ids), User.magazine_id.isnot(None)).distinct()
+    report_cache.invalidate({f"magazine:{magazine_id}" for (magazine_id,) in shops})
+
+def _import(raw_rows: List[dict], db: Session, current_user: User) -> StreamingResponse:
+    manager_id = warehouse_manager_id(current_user)
+    results = import_products(db, manager_id, raw_rows)
+    db.commit()
+    if any(result["status"] != "error" for result in results):
+        _invalidate_reports(db, {manager_id})
+    return _result_stream(results)
+
+@router.post("/import")
+def import_products_json(
+    payload: ProductImportRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_manager_user)
+):
+    """Create or update many products at once
+
+    Rows have the ProductCreate fields and are matched to existing
+    products by name and model: matches get the row's prices and count,
+    the rest are created. Invalid rows are skipped. Admins and managers
+    only, since it sets prices (sellers may only change stock). The response is
+    NDJSON: one result per row in input order, then a summary line.
+    """
+    return _import(payload.rows, db, current_user)
+
+@router.post("/import/csv")
+def import_products_csv(
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_manager_user)
+):
+    """Same as /import, from a CSV file with a header row (name, model, purchase_price, sale_price, price, count)"""
+    try:
+        rows = parse_csv(file.file.read().decode("utf-8"))
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise HTTPException(status_code=400, detail=f"Could not read CSV: {e}")
+    if len(rows) > MAX_ROWS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_ROWS} rows per import")
+    return _import(rows, db, current_user)
+
+@router.post("/adjust-stock")
+def adjust_products_stock(
+    payload: StockAdjustRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Set counted stock (``count``) or apply changes (``delta``) for many products
+
+    Items are ``{"product_id", "count"}`` or ``{"product_id", "delta"}``.
+    Managers and sellers adjust their warehouse, admins any product. The
+    response is NDJSON like /import.
+    """
+    manager_id = None if current_user.role == UserRole.ADMIN else warehouse_manager_id(current_user)
+    results = adjust_stock(db, manager_id, payload.items)
+    db.commit()
+    updated = {result["product_id"] for result in results if result["status"] == "updated"}
+    if updated:
+        if manager_id is not None:
+            manager_ids = {manager_id}
+        else:
+            # Admins may adjust any shop's products
+            manager_ids = {m for (m,) in db.query(Product.manager_id).filter(Product.id.in_(updated)).distinct()}
+        _invalidate_reports(db, manager_ids)
+    return _result_stream(results)
+
 @router.put("/{product_id}", response_model=ProductResponse)
 def update_product(
     product_id: int,
@@ -3,13 +3,15 @@ from sqlalchemy.orm import Session
 from sqlalchemy import or_, func
 from typing import List, Optional
 from datetime import datetime
-from app.db.database import get_db
+from app.db.database import get_read_db
 from app.models.transaction import Sale, Loan
 from app.models.auto_transaction import AutoSale, AutoLoan
 from app.models.product import Product
 from app.models.auto_product import AutoProduct
 from app.models.user import User, UserRole, UserType, Client
 from app.api.deps import get_current_user
+from app.services.search_service import matching_ids
+from app.services.report_cache import cached_report, coalesced_report
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -53,12 +55,13 @@ class RevenueAnalytics(BaseModel):
     active_loans_count: int
 
 @router.get("/summary", response_model=ReportsSummary)
+@cached_report("reports.summary")
 def get_reports_summary(
     date_from: Optional[str] = None,
     date_to: Optional[str] = None,
     search: Optional[str] = None,
     transaction_type: Optional[str] = None,  # 'sales', 'loans', or 'all'
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get aggregated summary statistics for reports without pagination"""
@@ -120,39 +123,32 @@ def get_reports_summary(
     
     # Apply search filtering
     if search:
-        search_term = f"%{search}%"
         if is_auto_user:
             sales_query = sales_query.filter(
                 or_(
-                    AutoProduct.car_name.ilike(search_term),
-                    AutoProduct.model.ilike(search_term),
-                    AutoProduct.color.ilike(search_term),
-                    User.name.ilike(search_term)
+                    AutoProduct.id.in_(matching_ids("auto_product", search)),
+                    User.id.in_(matching_ids("user", search))
                 )
             )
             loans_query = loans_query.filter(
                 or_(
-                    AutoProduct.car_name.ilike(search_term),
-                    AutoProduct.model.ilike(search_term),
-                    AutoProduct.color.ilike(search_term),
-                    Client.name.ilike(search_term),
-                    User.name.ilike(search_term)
+                    AutoProduct.id.in_(matching_ids("auto_product", search)),
+                    Client.id.in_(matching_ids("client", search)),
+                    User.id.in_(matching_ids("user", search))
                 )
             )
         else:
             sales_query = sales_query.filter(
                 or_(
-                    Product.name.ilike(search_term),
-                    Product.model.ilike(search_term),
-                    User.name.ilike(search_term)
+                    Product.id.in_(matching_ids("product", search)),
+                    User.id.in_(matching_ids("user", search))
                 )
             )
             loans_query = loans_query.filter(
                 or_(
-                    Product.name.ilike(search_term),
-                    Product.model.ilike(search_term),
-                    Client.name.ilike(search_term),
-                    User.name.ilike(search_term)
+                    Product.id.in_(matching_ids("product", search)),
+                    Client.id.in_(matching_ids("client", search)),
+                    User.id.in_(matching_ids("user", search))
                 )
             )
     
@@ -234,13 +230,14 @@ def get_reports_summary(
     )
 
 @router.get("/export", response_model=List[TransactionExport])
+@coalesced_report("reports.export")
 def export_transactions(
     date_from: Optional[str] = None,
     date_to: Optional[str] = None,
     search: Optional[str] = None,
     transaction_type: Optional[str] = None,
     limit: int = 10000,  # Large limit for exports
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """Export all filtered transactions for Excel/CSV generation"""
@@ -292,7 +289,12 @@ def export_transactions(
         #     search_term = f"%{search}%"
         
         if is_auto_user:
-            sales = sales_query.order_by(AutoSale.created_at.desc()).limit(limit).all()
+            sales = sales_query.with_entities(
+                AutoSale.id, AutoSale.sale_date, AutoSale.sale_price, AutoProduct.car_name, AutoProduct.model,
+                AutoProduct.color, AutoProduct.year, User.name.label("seller_name")
+            ).join(AutoProduct, AutoSale.auto_product_id == AutoProduct.id).join(
+                User, AutoSale.seller_id == User.id
+            ).order_by(AutoSale.created_at.desc()).limit(limit).all()
             
             for sale in sales:
                 all_transactions.append(TransactionExport(
@@ -300,15 +302,20 @@ def export_transactions(
                     type="sale",
                     date=sale.sale_date.strftime("%Y-%m-%d %H:%M:%S"),
                     amount=sale.sale_price,
-                    product_name=sale.auto_product.car_name,
-                    product_model=f"{sale.auto_product.model} • {sale.auto_product.color} • {sale.auto_product.year}",
+                    product_name=sale.car_name,
+                    product_model=f"{sale.model} • {sale.color} • {sale.year}",
                     client_name=None,
-                    seller_name=sale.seller.name,
+                    seller_name=sale.seller_name,
                     monthly_payment=None,
                     loan_months=None
                 ))
         else:
-            sales = sales_query.order_by(Sale.created_at.desc()).limit(limit).all()
+            sales = sales_query.with_entities(
+                Sale.id, Sale.sale_date, Sale.sale_price, Product.name.label("product_name"),
+                Product.model.label("product_model"), User.name.label("seller_name")
+            ).join(Product, Sale.product_id == Product.id).join(
+                User, Sale.seller_id == User.id
+            ).order_by(Sale.created_at.desc()).limit(limit).all()
             
             for sale in sales:
                 all_transactions.append(TransactionExport(
@@ -316,10 +323,10 @@ def export_transactions(
                     type="sale",
                     date=sale.sale_date.strftime("%Y-%m-%d %H:%M:%S"),
                     amount=sale.sale_price,
-                    product_name=sale.product.name,
-                    product_model=sale.product.model,
+                    product_name=sale.product_name,
+                    product_model=sale.product_model,
                     client_name=None,
-                    seller_name=sale.seller.name,
+                    seller_name=sale.seller_name,
                     monthly_payment=None,
                     loan_months=None
                 ))
@@ -368,7 +375,13 @@ def export_transactions(
         #     search_term = f"%{search}%"
         
         if is_auto_user:
-            loans = loans_query.order_by(AutoLoan.created_at.desc()).limit(limit).all()
+            loans = loans_query.with_entities(
+                AutoLoan.id, AutoLoan.loan_start_date, AutoLoan.initial_payment, AutoLoan.monthly_payment,
+                AutoLoan.loan_months, AutoProduct.car_name, AutoProduct.model, AutoProduct.color, AutoProduct.year,
+                Client.name.label("client_name"), User.name.label("seller_name")
+            ).join(AutoProduct, AutoLoan.auto_product_id == AutoProduct.id).join(
+                Client, AutoLoan.client_id == Client.id
+            ).join(User, AutoLoan.seller_id == User.id).order_by(AutoLoan.created_at.desc()).limit(limit).all()
             
             for loan in loans:
                 # Calculate total loan amount
@@ -379,15 +392,21 @@ def export_transactions(
                     type="loan",
                     date=loan.loan_start_date.strftime("%Y-%m-%d %H:%M:%S"),
                     amount=total_amount,
-                    product_name=loan.auto_product.car_name,
-                    product_model=f"{loan.auto_product.model} • {loan.auto_product.color} • {loan.auto_product.year}",
-                    client_name=loan.client.name,
-                    seller_name=loan.seller.name,
+                    product_name=loan.car_name,
+                    product_model=f"{loan.model} • {loan.color} • {loan.year}",
+                    client_name=loan.client_name,
+                    seller_name=loan.seller_name,
                     monthly_payment=loan.monthly_payment,
                     loan_months=loan.loan_months
                 ))
         else:
-            loans = loans_query.order_by(Loan.created_at.desc()).limit(limit).all()
+            loans = loans_query.with_entities(
+                Loan.id, Loan.loan_start_date, Loan.initial_payment, Loan.monthly_payment, Loan.loan_months,
+                Product.name.label("product_name"), Product.model.label("product_model"),
+                Client.name.label("client_name"), User.name.label("seller_name")
+            ).join(Product, Loan.product_id == Product.id).join(
+                Client, Loan.client_id == Client.id
+            ).join(User, Loan.seller_id == User.id).order_by(Loan.created_at.desc()).limit(limit).all()
             
             for loan in loans:
                 # Calculate total loan amount
@@ -398,10 +417,10 @@ def export_transactions(
                     type="loan",
                     date=loan.loan_start_date.strftime("%Y-%m-%d %H:%M:%S"),
                     amount=total_amount,
-                    product_name=loan.product.name,
-                    product_model=loan.product.model,
-                    client_name=loan.client.name,
-                    seller_name=loan.seller.name,
+                    product_name=loan.product_name,
+                    product_model=loan.product_model,
+                    client_name=loan.client_name,
+                    seller_name=loan.seller_name,
                     monthly_payment=loan.monthly_payment,
                     loan_months=loan.loan_months
                 ))
@@ -412,12 +431,13 @@ def export_transactions(
     return all_transactions
 
 @router.get("/revenue", response_model=RevenueAnalytics)
+@cached_report("reports.revenue")
 def get_revenue_analytics(
     date_from: Optional[str] = None,
     date_to: Optional[str] = None,
     search: Optional[str] = None,
     transaction_type: Optional[str] = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get detailed revenue and profit analytics"""
@@ -483,39 +503,32 @@ def get_revenue_analytics(
     
     # Apply search filtering
     if search:
-        search_term = f"%{search}%"
         if is_auto_user:
             sales_query = sales_query.filter(
                 or_(
-                    AutoProduct.car_name.ilike(search_term),
-                    AutoProduct.model.ilike(search_term),
-                    AutoProduct.color.ilike(search_term),
-                    User.name.ilike(search_term)
+                    AutoProduct.id.in_(matching_ids("auto_product", search)),
+                    User.id.in_(matching_ids("user", search))
                 )
             )
             loans_query = loans_query.filter(
                 or_(
-                    AutoProduct.car_name.ilike(search_term),
-                    AutoProduct.model.ilike(search_term),
-                    AutoProduct.color.ilike(search_term),
-                    Client.name.ilike(search_term),
-                    User.name.ilike(search_term)
+                    AutoProduct.id.in_(matching_ids("auto_product", search)),
+                    Client.id.in_(matching_ids("client", search)),
+                    User.id.in_(matching_ids("user", search))
                 )
             )
         else:
             sales_query = sales_query.filter(
                 or_(
-                    Product.name.ilike(search_term),
-                    Product.model.ilike(search_term),
-                    User.name.ilike(search_term)
+                    Product.id.in_(matching_ids("product", search)),
+                    User.id.in_(matching_ids("user", search))
                 )
             )
             loans_query = loans_query.filter(
                 or_(
-                    Product.name.ilike(search_term),
-                    Product.model.ilike(search_term),
-                    Client.name.ilike(search_term),
-                    User.name.ilike(search_term)
+                    Product.id.in_(matching_ids("product", search)),
+                    Client.id.in_(matching_ids("client", search)),
+                    User.id.in_(matching_ids("user", search))
                 )
             )
     
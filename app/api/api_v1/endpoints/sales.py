@@ -3,13 +3,15 @@ from sqlalchemy.orm import Session
 from sqlalchemy import or_
 from typing import List, Optional
 from datetime import datetime
-from app.db.database import get_db
+from app.db.database import get_db, unit_of_work
 from app.models.transaction import Sale, TransactionType
 from app.models.product import Product
 from app.models.user import User, UserRole
 from app.api.deps import get_current_user
 from app.api.api_v1.endpoints.transactions import create_transaction
 from app.core.timezone import to_uzbekistan_time
+from app.services.search_service import matching_ids
+from app.services.inventory_service import take_unit, release_unit
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -34,6 +36,34 @@ class SaleResponse(BaseModel):
     class Config:
         from_attributes = True
 
+def sale_to_response(sale: Sale) -> SaleResponse:
+    """List representation of a sale; product and seller must be loaded"""
+    return SaleResponse(
+        id=sale.id,
+        sale_price=sale.sale_price,
+        sale_date=to_uzbekistan_time(sale.sale_date),
+        created_at=to_uzbekistan_time(sale.created_at),
+        product_id=sale.product_id,
+        seller_id=sale.seller_id,
+        product_name=sale.product.name,
+        product_model=sale.product.model,
+        seller_name=sale.seller.name,
+        imei=sale.imei
+    )
+
+# The list representation as plain columns, labelled like the SaleResponse fields
+SALE_LIST_COLUMNS = (
+    Sale.id, Sale.sale_price, Sale.sale_date, Sale.created_at, Sale.product_id, Sale.seller_id,
+    Product.name.label("product_name"), Product.model.label("product_model"), User.name.label("seller_name"),
+    Sale.imei,
+)
+
+def sale_row_to_response(row) -> SaleResponse:
+    """List representation from a row of SALE_LIST_COLUMNS"""
+    values = row._asdict()
+    values.update(sale_date=to_uzbekistan_time(row.sale_date), created_at=to_uzbekistan_time(row.created_at))
+    return SaleResponse(**values)
+
 @router.get("/", response_model=List[SaleResponse])
 def get_sales(
     limit: int = 10,
@@ -45,7 +75,9 @@ def get_sales(
     current_user: User = Depends(get_current_user)
 ):
     """Get all sales for the current user's scope with filtering support"""
-    query = db.query(Sale).join(Product).join(User)
+    query = db.query(*SALE_LIST_COLUMNS).select_from(Sale).join(Product, Sale.product_id == Product.id).join(
+        User, Sale.seller_id == User.id
+    )
     
     # Apply user scope filtering
     if current_user.role == UserRole.ADMIN:
@@ -78,35 +110,17 @@ def get_sales(
     
     # Apply search filtering
     if search:
-        search_term = f"%{search}%"
         query = query.filter(
             or_(
-                Product.name.ilike(search_term),
-                Product.model.ilike(search_term),
-                User.name.ilike(search_term)
+                Product.id.in_(matching_ids("product", search)),
+                User.id.in_(matching_ids("user", search))
             )
         )
     
     # Apply pagination and ordering
-    sales = query.order_by(Sale.created_at.desc()).offset(offset).limit(limit).all()
-    
-    # Format response with product and seller info
-    response = []
-    for sale in sales:
-        response.append(SaleResponse(
-            id=sale.id,
-            sale_price=sale.sale_price,
-            sale_date=to_uzbekistan_time(sale.sale_date),
-            created_at=to_uzbekistan_time(sale.created_at),
-            product_id=sale.product_id,
-            seller_id=sale.seller_id,
-            product_name=sale.product.name,
-            product_model=sale.product.model,
-            seller_name=sale.seller.name,
-            imei=sale.imei
-        ))
+    rows = query.order_by(Sale.created_at.desc()).offset(offset).limit(limit).all()
     
-    return response
+    return [sale_row_to_response(row) for row in rows]
 
 @router.post("/", response_model=SaleResponse)
 def create_sale(
@@ -141,18 +155,18 @@ def create_sale(
             )
     # Admin can sell any product
     
-    # Check if product is in stock
-    if product.count <= 0:
+    # Validate sale price
+    if sale_data.sale_price <= 0:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Product is out of stock"
+            detail="Sale price must be greater than 0"
         )
     
-    # Validate sale price
-    if sale_data.sale_price <= 0:
+    # Take one unit from stock in a single conditional UPDATE
+    if take_unit(db, Product, product.id) is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Sale price must be greater than 0"
+            detail="Product is out of stock"
         )
     
     try:
@@ -163,34 +177,29 @@ def create_sale(
                 detail="User must be assigned to a magazine to create sales"
             )
         
-        # Begin transaction for atomic operation
-        # Create the sale
-        new_sale = Sale(
-            product_id=sale_data.product_id,
-            sale_price=sale_data.sale_price,
-            seller_id=current_user.id,
-            magazine_id=current_user.magazine_id,
-            imei=sale_data.imei
-        )
-        
-        # Update product inventory atomically
-        product.count -= 1
-        
-        db.add(new_sale)
-        db.commit()
-        db.refresh(new_sale)
-        
-        # Create transaction record
-        create_transaction(
-            db=db,
-            transaction_type=TransactionType.SALE,
-            amount=new_sale.sale_price,
-            description=f"Sale of {product.name} {product.model or ''}".strip(),
-            seller_id=current_user.id,
-            magazine_id=current_user.magazine_id,
-            sale_id=new_sale.id,
-            product_id=product.id
-        )
+        # Sale, stock change and ledger row commit together
+        with unit_of_work(db):
+            new_sale = Sale(
+                product_id=sale_data.product_id,
+                sale_price=sale_data.sale_price,
+                seller_id=current_user.id,
+                magazine_id=current_user.magazine_id,
+                imei=sale_data.imei
+            )
+            db.add(new_sale)
+            db.flush()
+            
+            # Create transaction record
+            create_transaction(
+                db=db,
+                transaction_type=TransactionType.SALE,
+                amount=new_sale.sale_price,
+                description=f"Sale of {product.name} {product.model or ''}".strip(),
+                seller_id=current_user.id,
+                magazine_id=current_user.magazine_id,
+                sale_id=new_sale.id,
+                product_id=product.id
+            )
         
     except Exception as e:
         db.rollback()
@@ -235,7 +244,7 @@ def delete_sale(
 
     try:
         if product:
-            product.count += 1
+            release_unit(db, Product, product.id)
 
         db.query(Transaction).filter(Transaction.sale_id == sale.id).delete(synchronize_session=False)
         db.delete(sale)
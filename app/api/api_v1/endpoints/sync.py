@@ -0,0 +1,76 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import Dict, List, Optional
+from datetime import datetime
+from app.db.database import get_db
+from app.models.user import User
+from app.api.deps import get_current_user
+from app.api.api_v1.endpoints.clients import ClientResponse
+from app.api.api_v1.endpoints.products import ProductResponse
+from app.api.api_v1.endpoints.sales import sale_to_response
+from app.api.api_v1.endpoints.loans import calculate_overdue_amounts, loan_to_response, payment_to_response
+from app.services import sync_service
+from pydantic import BaseModel
+
+router = APIRouter()
+
+class SyncResponse(BaseModel):
+    watermark: datetime
+    full: bool
+    changes: Dict[str, List[dict]]
+    deleted: Dict[str, List[int]]
+
+def _serialize(db: Session, entity: str, rows: list) -> List[dict]:
+    if entity == "clients":
+        items = [ClientResponse.from_orm_with_json(client) for client in rows]
+    elif entity == "products":
+        items = [ProductResponse.model_validate(product) for product in rows]
+    elif entity == "sales":
+        items = [sale_to_response(sale) for sale in rows]
+    elif entity == "loans":
+        overdue_amounts = calculate_overdue_amounts(db, rows)
+        items = [loan_to_response(loan, overdue_amounts.get(loan.id, 0.0)) for loan in rows]
+    else:
+        items = [payment_to_response(payment) for payment in rows]
+    return [item.model_dump() for item in items]
+
+@router.get("/", response_model=SyncResponse)
+def sync(
+    since: Optional[datetime] = None,
+    entities: Optional[str] = Query(None, description=f"Comma-separated subset of {', '.join(sync_service.ENTITIES)}"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Changes and deletions in the user's scope since a watermark
+
+    Call without ``since`` for a full snapshot, then pass the returned
+    ``watermark`` back as ``since`` on the next call. Items in ``changes``
+    use the same shapes as the list endpoints and must be applied as
+    upserts (calls overlap slightly, so a row can arrive twice); ids in
+    ``deleted`` are to be removed. When ``full`` is true the response is a
+    complete snapshot and local data missing from it should be dropped:
+    that happens without ``since`` and when ``since`` is older than the
+    tombstone retention.
+    """
+    if entities:
+        requested = [name.strip() for name in entities.split(",") if name.strip()]
+        unknown = [name for name in requested if name not in sync_service.ENTITIES]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown entities: {', '.join(unknown)}")
+    else:
+        requested = list(sync_service.ENTITIES)
+
+    # Issue the next watermark before reading, so nothing committed meanwhile is skipped
+    watermark = sync_service.issue_watermark(db)
+    if since is not None:
+        since = sync_service.align_watermark(since, watermark)
+        if since < sync_service.tombstone_horizon(db):
+            since = None
+
+    changes = {}
+    deleted = {}
+    for entity in requested:
+        changes[entity] = _serialize(db, entity, sync_service.changed(db, current_user, entity, since))
+        deleted[entity] = sync_service.deleted(db, current_user, entity, since) if since is not None else []
+
+    return SyncResponse(watermark=watermark, full=since is None, changes=changes, deleted=deleted)
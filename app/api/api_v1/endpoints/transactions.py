@@ -2,12 +2,13 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
-from app.db.database import get_db
+from app.db.database import get_read_db
 from app.models.transaction import Transaction, TransactionType
 from app.models.auto_transaction import AutoSale, AutoLoan
 from app.models.user import User, UserRole, UserType
 from app.api.deps import get_current_user
 from app.core.timezone import to_uzbekistan_time
+from app.services.report_cache import cached_report
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -30,8 +31,9 @@ class TransactionResponse(BaseModel):
         from_attributes = True
 
 @router.get("/recent", response_model=List[TransactionResponse])
+@cached_report("transactions.recent")
 def get_recent_transactions(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
     limit: int = 10
 ):
@@ -126,7 +128,7 @@ def get_recent_transactions(
 
 @router.get("/", response_model=List[TransactionResponse])
 def get_all_transactions(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
     page: int = 1,
     limit: int = 50
@@ -234,7 +236,11 @@ def create_transaction(
     product_id: Optional[int] = None,
     client_id: Optional[int] = None
 ):
-    """Helper function to create transaction records"""
+    """Helper function to create transaction records.
+
+    Only flushes: the caller commits it together with the sale, loan or
+    payment it records (see app.db.database.unit_of_work).
+    """
     transaction = Transaction(
         type=transaction_type,
         amount=amount,
@@ -248,6 +254,5 @@ def create_transaction(
         client_id=client_id
     )
     db.add(transaction)
-    db.commit()
-    db.refresh(transaction)
+    db.flush()
     return transaction
\ No newline at end of file
@@ -1,8 +1,10 @@
+import time
 from typing import List
 from datetime import date, timedelta
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import and_, case, func, select
 from sqlalchemy.orm import Session
-from app.db.database import get_db
+from app.db.database import get_db, get_read_db
 from app.models.user import User, UserRole, UserStatus
 from app.schemas.user import UserResponse, SellerCreate, UserApproval, UserStatusUpdate, SellerPermissionsUpdate
 from app.api.deps import get_current_admin_user, get_current_manager_user
@@ -21,56 +23,76 @@ def get_all_users(
     users = db.query(User).all()
     return users
 
-@router.get("/stats")
-def get_user_stats(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_admin_user)
-):
-    """Get comprehensive user statistics (admin only)."""
-    from datetime import date, timedelta
-    today = date.today()
-    week_start = today - timedelta(days=7)
-    soon = today + timedelta(days=7)
+STATS_CACHE_TTL_SECONDS = 30
+_stats_cache: dict = {}
 
-    base = db.query(User).filter(User.role != UserRole.ADMIN)
 
-    total = base.count()
-    active = base.filter(User.status == UserStatus.ACTIVE).count()
-    deactivated = base.filter(User.status == UserStatus.INACTIVE).count()
-    pending = base.filter(User.status == UserStatus.PENDING).count()
+def _cached(key: tuple, compute):
+    """Serve admin dashboard aggregates from a short-lived in-process cache."""
+    now = time.monotonic()
+    hit = _stats_cache.get(key)
+    if hit and now - hit[0] < STATS_CACHE_TTL_SECONDS:
+        return hit[1]
+    payload = compute()
+    if len(_stats_cache) > 1000:
+        _stats_cache.clear()
+    _stats_cache[key] = (now, payload)
+    return payload
 
-    expiring_7d = base.filter(
-        User.status == UserStatus.ACTIVE,
-        User.subscription_end_date.isnot(None),
-        User.subscription_end_date >= today,
-        User.subscription_end_date <= soon,
-    ).count()
 
-    expired_active = base.filter(
-        User.status == UserStatus.ACTIVE,
-        User.subscription_end_date.isnot(None),
-        User.subscription_end_date < today,
-    ).count()
+def _count_if(*conditions):
+    return func.coalesce(func.sum(case((and_(*conditions), 1), else_=0)), 0)
 
-    new_today = base.filter(User.created_at >= today).count()
-    new_week = base.filter(User.created_at >= week_start).count()
 
-    return {
-        "total": total,
-        "active": active,
-        "pending": pending,
-        "deactivated": deactivated,
-        "expiring_7d": expiring_7d,
-        "expired": expired_active,
-        "new_today": new_today,
-        "new_week": new_week,
-    }
+@router.get("/stats")
+def get_user_stats(
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Get comprehensive user statistics (admin only)."""
+    def compute():
+        today = date.today()
+        week_start = today - timedelta(days=7)
+        soon = today + timedelta(days=7)
+
+        row = db.query(
+            func.count(User.id).label("total"),
+            _count_if(User.status == UserStatus.ACTIVE).label("active"),
+            _count_if(User.status == UserStatus.INACTIVE).label("deactivated"),
+            _count_if(User.status == UserStatus.PENDING).label("pending"),
+            _count_if(
+                User.status == UserStatus.ACTIVE,
+                User.subscription_end_date.isnot(None),
+                User.subscription_end_date >= today,
+                User.subscription_end_date <= soon,
+            ).label("expiring_7d"),
+            _count_if(
+                User.status == UserStatus.ACTIVE,
+                User.subscription_end_date.isnot(None),
+                User.subscription_end_date < today,
+            ).label("expired"),
+            _count_if(User.created_at >= today).label("new_today"),
+            _count_if(User.created_at >= week_start).label("new_week"),
+        ).filter(User.role != UserRole.ADMIN).one()
+
+        return {
+            "total": row.total,
+            "active": row.active,
+            "pending": row.pending,
+            "deactivated": row.deactivated,
+            "expiring_7d": row.expiring_7d,
+            "expired": row.expired,
+            "new_today": row.new_today,
+            "new_week": row.new_week,
+        }
+
+    return _cached(("stats",), compute)
 
 
 @router.get("/{user_id}/activity")
 def get_user_activity(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """Get per-user activity summary (admin only)."""
@@ -82,34 +104,40 @@ def get_user_activity(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    if user.user_type and user.user_type.value == "GADGETS" and user.magazine_id:
-        clients = db.query(Client).join(User, Client.manager_id == User.id).filter(
-            User.magazine_id == user.magazine_id
-        ).count()
-        products = db.query(Product).join(User, Product.manager_id == User.id).filter(
-            User.magazine_id == user.magazine_id
-        ).count() if hasattr(Product, "manager_id") else db.query(Product).count()
-        sales = db.query(Sale).filter(Sale.seller_id == user.id).count()
-        loans = db.query(Loan).filter(Loan.seller_id == user.id).count() if hasattr(Loan, "seller_id") else 0
-    else:
-        clients = db.query(Client).filter(Client.manager_id == user.id).count()
-        products = db.query(Product).filter(Product.manager_id == user.id).count() if hasattr(Product, "manager_id") else 0
-        sales = db.query(Sale).filter(Sale.seller_id == user.id).count()
-        loans = db.query(Loan).filter(Loan.seller_id == user.id).count() if hasattr(Loan, "seller_id") else 0
-
-    return {
-        "clients_count": clients,
-        "products_count": products,
-        "sales_count": sales,
-        "loans_count": loans,
-    }
+    def compute():
+        if user.user_type and user.user_type.value == "GADGETS" and user.magazine_id:
+            magazine_users = select(User.id).where(User.magazine_id == user.magazine_id)
+            clients = select(func.count(Client.id)).where(Client.manager_id.in_(magazine_users))
+            products = select(func.count(Product.id)).where(Product.manager_id.in_(magazine_users))
+        else:
+            clients = select(func.count(Client.id)).where(Client.manager_id == user.id)
+            products = select(func.count(Product.id)).where(Product.manager_id == user.id)
+        sales = select(func.count(Sale.id)).where(Sale.seller_id == user.id)
+        loans = select(func.count(Loan.id)).where(Loan.seller_id == user.id)
+
+        # All four counts in one round trip
+        row = db.query(
+            clients.scalar_subquery().label("clients"),
+            products.scalar_subquery().label("products"),
+            sales.scalar_subquery().label("sales"),
+            loans.scalar_subquery().label("loans"),
+        ).one()
+
+        return {
+            "clients_count": row.clients,
+            "products_count": row.products,
+            "sales_count": row.sales,
+            "loans_count": row.loans,
+        }
+
+    return _cached(("activity", user_id), compute)
 
 
 @router.get("/{user_id}/clients")
 def get_user_clients(
     user_id: int,
     limit: int = 50,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_admin_user),
 ):
     """Get list of clients created by this user with loan summary (admin only)."""
@@ -121,33 +149,47 @@ def get_user_clients(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    clients_q = db.query(Client).filter(Client.manager_id == user.id)
-    if user.user_type and user.user_type.value == "GADGETS" and user.magazine_id:
-        clients_q = db.query(Client).join(User, Client.manager_id == User.id).filter(
-            User.magazine_id == user.magazine_id
-        )
+    def compute():
+        is_auto = user.user_type and user.user_type.value == "AUTO"
+        LoanModel = AutoLoan if is_auto else Loan
+
+        clients_q = db.query(Client.id, Client.name, Client.phone, Client.created_at)
+        if user.user_type and user.user_type.value == "GADGETS" and user.magazine_id:
+            clients_q = clients_q.join(User, Client.manager_id == User.id).filter(
+                User.magazine_id == user.magazine_id
+            )
+        else:
+            clients_q = clients_q.filter(Client.manager_id == user.id)
+        rows = clients_q.order_by(Client.created_at.desc()).limit(limit).all()
+
+        # Loan totals for this page only, not a GROUP BY over the whole loans table
+        totals = {}
+        if rows:
+            totals = {
+                t.client_id: (t.loan_count, t.active_loan_count or 0, float(t.total_loan_value or 0))
+                for t in db.query(
+                    LoanModel.client_id,
+                    func.count(LoanModel.id).label("loan_count"),
+                    func.sum(case((LoanModel.is_completed.is_(True), 0), else_=1)).label("active_loan_count"),
+                    func.sum(LoanModel.loan_price).label("total_loan_value"),
+                ).filter(LoanModel.client_id.in_([r.id for r in rows])).group_by(LoanModel.client_id)
+            }
 
-    clients = clients_q.order_by(Client.created_at.desc()).limit(limit).all()
-
-    is_auto = user.user_type and user.user_type.value == "AUTO"
-    LoanModel = AutoLoan if is_auto else Loan
-
-    response = []
-    for c in clients:
-        loans = db.query(LoanModel).filter(LoanModel.client_id == c.id).all()
-        total_value = sum((l.loan_price or 0) for l in loans)
-        active_count = sum(1 for l in loans if not getattr(l, "is_completed", False))
-        response.append({
-            "id": c.id,
-            "name": c.name,
-            "phone": c.phone,
-            "created_at": c.created_at.isoformat() if c.created_at else None,
-            "loan_count": len(loans),
-            "active_loan_count": active_count,
-            "total_loan_value": float(total_value),
-        })
+        result = []
+        for r in rows:
+            loan_count, active_loan_count, total_loan_value = totals.get(r.id, (0, 0, 0.0))
+            result.append({
+                "id": r.id,
+                "name": r.name,
+                "phone": r.phone,
+                "created_at": r.created_at.isoformat() if r.created_at else None,
+                "loan_count": loan_count,
+                "active_loan_count": active_loan_count,
+                "total_loan_value": total_loan_value,
+            })
+        return result
 
-    return response
+    return _cached(("clients", user_id, limit), compute)
 
 
 @router.put("/{user_id}/grant-trial")
@@ -516,7 +558,7 @@ def auto_check_expired_users(
 @router.get("/audit")
 def get_audit_log(
     limit: int = 100,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_admin_user),
 ):
     """Admin audit log — newest first, capped at 200 per request."""
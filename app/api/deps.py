@@ -1,14 +1,41 @@
-from typing import Generator
+import logging
+from typing import Generator, Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from sqlalchemy.orm import Session
 from app.core.config import settings
-from app.db.database import get_db
+from app.core.logging import bind_request_context
+from app.db.database import SessionLocal, get_db
 from app.models.user import User, UserRole, UserStatus
 
+logger = logging.getLogger(__name__)
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login")
 
+def user_id_from_token(token: str) -> Optional[int]:
+    """User id of a valid access token, None if it is invalid or expired"""
+    try:
+        payload = jwt.decode(
+            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
+        )
+    except JWTError:
+        return None
+    user_id: str = payload.get("sub")
+    return int(user_id) if user_id is not None else None
+
+def is_admin_token(token: Optional[str]) -> bool:
+    """Whether the access token belongs to an admin, for checks made outside the dependencies"""
+    user_id = user_id_from_token(token) if token else None
+    if user_id is None:
+        return False
+    db = SessionLocal()
+    try:
+        user = db.get(User, user_id)
+        return user is not None and user.role == UserRole.ADMIN
+    finally:
+        db.close()
+
 def get_current_user(
     db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)
 ) -> User:
@@ -17,22 +44,17 @@ def get_current_user(
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-        )
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-    except JWTError:
+    user_id = user_id_from_token(token)
+    if user_id is None:
         raise credentials_exception
     
-    user = db.query(User).filter(User.id == int(user_id)).first()
+    user = db.query(User).filter(User.id == user_id).first()
     if user is None:
         raise credentials_exception
     
-    # Debug: Check what user data is loaded
-    print(f"DEBUG get_current_user: user_id={user.id}, user_type={user.user_type}, name={user.name}")
+    # Attribute the rest of the request's log lines (and its slow-request entry) to this user and shop
+    bind_request_context(user_id=user.id, magazine_id=user.magazine_id, role=user.role.name)
+    logger.debug(f"Authenticated user {user.id} ({user.role}, {user.user_type})")
     
     return user
 
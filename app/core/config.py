@@ -14,6 +14,10 @@ class Settings(BaseSettings):
     ENVIRONMENT: str = "development"
 
     DATABASE_URL: str = "sqlite:///./nasiya_bro.db"
+    # Optional read replica for report/list endpoints (empty = use primary)
+    DATABASE_READ_URL: str = ""
+    # After a client commits a write, its reads stay on the primary this long
+    READ_YOUR_WRITES_SECONDS: int = 5
 
     SECRET_KEY: str = ""
     ALGORITHM: str = "HS256"
@@ -32,10 +36,74 @@ class Settings(BaseSettings):
     UPLOAD_FOLDER: str = "uploads"
     MAX_FILE_SIZE: int = 10 * 1024 * 1024
 
+    # Where scripts/backup.py writes backups (one directory per backup)
+    BACKUP_DIR: str = "backups"
+
     TIMEZONE: str = "Asia/Tashkent"
 
     SENTRY_DSN: str = ""
 
+    # Logging: level name and "text" (development) or "json" (one object per line)
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "text"
+    # Requests slower than this are logged at WARNING with route, shop and query stats
+    SLOW_REQUEST_MS: int = 1000
+    # Bearer token for Prometheus scrapes of GET /metrics (admin access tokens also work; empty = admins only)
+    METRICS_TOKEN: str = ""
+
+    # Request profiler (X-Profile header / ?profile= for admins, or admin-defined rules)
+    PROFILE_DIR: str = "profiles"
+    PROFILE_MAX_FILES: int = 100
+    PROFILE_INTERVAL_MS: int = 5
+    PROFILE_MAX_CONCURRENT: int = 4
+
+    # Slow-query log: statements slower than SLOW_QUERY_MS (0 = off) are logged
+    # with their request, bind parameters and EXPLAIN plan
+    SLOW_QUERY_MS: int = 0
+    SLOW_QUERY_LOG: str = "logs/slow_queries.log"
+    SLOW_QUERY_LOG_MAX_BYTES: int = 10 * 1024 * 1024
+    SLOW_QUERY_LOG_BACKUPS: int = 5
+    SLOW_QUERY_EXPLAIN: bool = True
+    # Disable if bind parameters (phone numbers, names) must not reach the log
+    SLOW_QUERY_LOG_PARAMS: bool = True
+
+    # Report cache (/reports/summary, /reports/revenue, /transactions/recent, /dashboard):
+    # "" (off), "memory" (single worker) or "sqlite" (shared by workers via REPORT_CACHE_PATH)
+    REPORT_CACHE_BACKEND: str = "memory"
+    REPORT_CACHE_PATH: str = "report_cache.db"
+    REPORT_CACHE_TTL: int = 300
+    REPORT_CACHE_MAX_ENTRIES: int = 5000
+    # Identical concurrent report requests share one computation; followers wait at most this long
+    REPORT_COALESCE_WAIT_SECONDS: float = 10.0
+
+    # Delta sync (/sync): watermarks are moved back by SYNC_OVERLAP_SECONDS so rows
+    # committed by transactions that started earlier are not missed; deletion
+    # tombstones are kept SYNC_TOMBSTONE_DAYS, older watermarks get a full sync
+    SYNC_OVERLAP_SECONDS: int = 30
+    SYNC_TOMBSTONE_DAYS: int = 30
+
+    # Live events (WebSocket /live/ws): "" (off), "memory" (single worker) or "sqlite"
+    # (workers exchange events through LIVE_EVENTS_PATH, polled every LIVE_EVENTS_POLL_MS)
+    LIVE_EVENTS_BACKEND: str = "memory"
+    LIVE_EVENTS_PATH: str = "live_events.db"
+    LIVE_EVENTS_POLL_MS: int = 250
+    # Events buffered per connection before it is told to resync
+    LIVE_EVENTS_QUEUE_SIZE: int = 100
+    # Idle connections get a ping this often so proxies keep them open
+    LIVE_KEEPALIVE_SECONDS: int = 25
+
+    # N+1 guard for development: "" (off), "log" or "raise" when one statement
+    # runs QUERY_GUARD_THRESHOLD times in a request
+    QUERY_GUARD: str = ""
+    QUERY_GUARD_THRESHOLD: int = 10
+
+    # Requests per client IP per minute
+    RATE_LIMIT_PER_MINUTE: int = 120
+
+    # External services (overridable so load tests can point them at local stubs)
+    EXPO_PUSH_URL: str = "https://exp.host/--/api/v2/push/send"
+    CBU_RATES_URL: str = "https://cbu.uz/oz/arkhiv-kursov-valyut/json/"
+
     TRIAL_DAYS: int = 90
 
     def __init__(self, **kwargs):
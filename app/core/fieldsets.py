@@ -0,0 +1,92 @@
+"""Sparse fieldsets for list endpoints.
+
+List screens show a handful of a row's fields, yet the list endpoints
+return the whole response model. With ``?fields=id,client_name,...`` (any
+fields of the response model) or ``?view=list`` (a named projection
+declared by the endpoint) only those fields are returned; ``view=full``
+or neither parameter keeps the full representation.
+
+Endpoints describe their rows as labelled columns and the join each
+column needs, so a projection reads only the selected columns and skips
+the joins nobody asked for::
+
+    selected = requested_fields(LoanResponse, LOAN_VIEWS, fields, view)
+    query = projection_query(db, Loan, LOAN_COLUMNS, LOAN_JOINS, selected)
+    ...
+    if selected is None:
+        return [full rows]
+    return projected_response(LoanResponse, selected, row_dicts)
+"""
+from functools import lru_cache
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple, Type
+
+from fastapi import HTTPException, Response
+from pydantic import BaseModel, TypeAdapter, create_model
+from sqlalchemy.orm import Query, Session
+
+FULL_VIEW = "full"
+
+
+def requested_fields(
+    model: Type[BaseModel], views: Mapping[str, Sequence[str]], fields: Optional[str], view: Optional[str]
+) -> Optional[Tuple[str, ...]]:
+    """Field names to return, in the model's order; None for the full representation."""
+    if fields and view:
+        raise HTTPException(status_code=400, detail="Use either fields or view, not both")
+    if fields:
+        wanted = {name.strip() for name in fields.split(",") if name.strip()}
+        unknown = wanted - model.model_fields.keys()
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+        if not wanted:
+            raise HTTPException(status_code=400, detail="No fields requested")
+    elif view and view != FULL_VIEW:
+        if view not in views:
+            raise HTTPException(
+                status_code=400, detail=f"Unknown view: {view} (available: {', '.join([*views, FULL_VIEW])})"
+            )
+        wanted = set(views[view])
+    else:
+        return None
+    return tuple(name for name in model.model_fields if name in wanted)
+
+
+def projection_query(
+    db: Session,
+    base: Any,
+    columns: Mapping[str, Any],
+    joins: Mapping[str, Tuple[Any, Any]],
+    selected: Optional[Sequence[str]],
+    extra: Sequence[str] = (),
+) -> Query:
+    """Query from ``base`` reading the selected fields' columns (all when None) plus ``extra`` ones.
+
+    ``columns`` maps field names to labelled columns; ``joins`` maps the
+    fields that live in another table to its (target, onclause). Each
+    target is joined once, and only when one of its fields is read.
+    """
+    names = list(columns) if selected is None else [name for name in selected if name in columns]
+    names += [name for name in extra if name not in names]
+    query = db.query(*(columns[name] for name in names)).select_from(base)
+    joined = []
+    for name in names:
+        join = joins.get(name)
+        if join is not None and join[0] not in joined:
+            query = query.join(*join)
+            joined.append(join[0])
+    return query
+
+
+@lru_cache(maxsize=256)
+def _list_adapter(model: Type[BaseModel], fields: Tuple[str, ...]) -> TypeAdapter:
+    projection = create_model(
+        f"{model.__name__}Fields",
+        **{name: (model.model_fields[name].annotation, model.model_fields[name]) for name in fields},
+    )
+    return TypeAdapter(List[projection])
+
+
+def projected_response(model: Type[BaseModel], fields: Tuple[str, ...], rows: List[Dict[str, Any]]) -> Response:
+    """JSON list of ``rows`` restricted to ``fields``, validated with the types ``model`` declares for them."""
+    adapter = _list_adapter(model, fields)
+    return Response(content=adapter.dump_json(adapter.validate_python(rows)), media_type="application/json")
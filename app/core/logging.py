@@ -0,0 +1,78 @@
+"""
+Leveled, structured logging.
+
+``configure_logging()`` installs one root handler. LOG_FORMAT=json writes
+one JSON object per line with the record's ``extra`` fields and the
+current request context (request id, user, shop) merged in; "text" keeps
+the usual human-readable lines for development.
+
+The request context is a dict held in a context variable. The metrics
+middleware opens it per request and dependencies add to it with
+``bind_request_context``; the dict is shared by reference, so values
+bound inside the threadpool are visible to the middleware afterwards.
+"""
+import json
+import logging
+import sys
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+_request_context: ContextVar[Optional[Dict[str, Any]]] = ContextVar("request_context", default=None)
+
+# Attributes every LogRecord has; anything else came in through ``extra``
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+def new_request_context(**fields: Any) -> Dict[str, Any]:
+    context = dict(fields)
+    _request_context.set(context)
+    return context
+
+
+def bind_request_context(**fields: Any) -> None:
+    context = _request_context.get()
+    if context is not None:
+        context.update(fields)
+
+
+def get_request_context() -> Dict[str, Any]:
+    return _request_context.get() or {}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update(get_request_context())
+        entry.update({k: v for k, v in vars(record).items() if k not in _RESERVED})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class ContextTextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = {**get_request_context(), **{k: v for k, v in vars(record).items() if k not in _RESERVED}}
+        if fields:
+            line += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        return line
+
+
+def configure_logging(level: str = "INFO", fmt: str = "text") -> None:
+    handler = logging.StreamHandler(sys.stdout)
+    if fmt == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(ContextTextFormatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level.upper())
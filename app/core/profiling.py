@@ -0,0 +1,314 @@
+"""
+On-demand sampling profiler for live requests.
+
+A profiled request gets a statistical CPU profile (stack samples every
+PROFILE_INTERVAL_MS) and a timeline of its SQL statements. Results are
+JSON files in PROFILE_DIR, kept as a ring buffer of the newest
+PROFILE_MAX_FILES, and listed/downloaded through /diagnostics/profiles.
+
+Sync endpoints run in the threadpool, where cProfile attached to the event
+loop cannot see them. Instead one sampler thread reads every thread's
+stack with sys._current_frames() and attributes it to the profile that
+owns the thread. A worker thread is claimed by the request whose SQL it
+executes (every statement re-stamps the owner, so a thread handed to
+another request stops counting). The event loop thread is attributed
+only while a single profile is active. Stacks without application code
+(idle workers, the selector) are dropped.
+
+What gets profiled (see app.middleware.profiling):
+- an admin request carrying ``X-Profile: <rate>`` or ``?profile=<rate>``,
+  where rate is a sampling probability in (0, 1] ("1" = always);
+- requests matching a rule (route prefix, optional shop, sample rate,
+  expiry) created by an admin. Rules live in PROFILE_DIR/rules.json so
+  every worker process on the host picks them up.
+"""
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+APP_DIR = str(Path(__file__).resolve().parent.parent)
+PROJECT_DIR = str(Path(APP_DIR).parent)
+MAX_STACK_DEPTH = 128
+MAX_SQL_ENTRIES = 2000
+TOP_FUNCTIONS = 50
+PROFILE_ID = re.compile(r"^[0-9TZ]+-[0-9a-f]{8}$")
+RULES_FILE = "rules.json"
+
+
+class Profile:
+    def __init__(self, method: str, path: str, trigger: str):
+        self.id = f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%fZ')}-{uuid.uuid4().hex[:8]}"
+        self.created_at = datetime.now(timezone.utc)
+        self.method = method
+        self.path = path
+        self.trigger = trigger
+        self.started = time.perf_counter()
+        self.samples: Counter = Counter()
+        self.sql: List[dict] = []
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+
+    def record_sql(self, statement: str, started: float, duration: float) -> None:
+        self.sql_count += 1
+        self.sql_seconds += duration
+        if len(self.sql) < MAX_SQL_ENTRIES:
+            self.sql.append({
+                "start_ms": round((started - self.started) * 1000, 2),
+                "duration_ms": round(duration * 1000, 2),
+                "thread": threading.get_ident(),
+                "statement": " ".join(statement.split())[:2000],
+            })
+
+    def to_dict(self, status: int, duration: float, route: str, context: dict) -> dict:
+        self_counts: Counter = Counter()
+        total_counts: Counter = Counter()
+        for stack, n in self.samples.items():
+            self_counts[stack[-1]] += n
+            for frame in set(stack):
+                total_counts[frame] += n
+        top = [
+            {"function": name, "self": self_counts.get(name, 0), "total": total}
+            for name, total in total_counts.most_common(TOP_FUNCTIONS)
+        ]
+        return {
+            "id": self.id,
+            "created_at": self.created_at.isoformat(),
+            "method": self.method,
+            "path": self.path,
+            "route": route,
+            "status": status,
+            "duration_ms": round(duration * 1000, 1),
+            "trigger": self.trigger,
+            "user_id": context.get("user_id"),
+            "magazine_id": context.get("magazine_id"),
+            "request_id": context.get("request_id"),
+            "interval_ms": settings.PROFILE_INTERVAL_MS,
+            "sample_count": sum(self.samples.values()),
+            "sql": {
+                "count": self.sql_count,
+                "total_ms": round(self.sql_seconds * 1000, 1),
+                "timeline": self.sql,
+            },
+            "top_functions": top,
+            "stacks": {";".join(stack): n for stack, n in self.samples.most_common()},
+        }
+
+
+_current: ContextVar[Optional[Profile]] = ContextVar("profile", default=None)
+_active: Dict[str, Profile] = {}
+_thread_owner: Dict[int, Optional[Profile]] = {}
+_lock = threading.Lock()
+_loop_thread: Optional[int] = None
+_sampler: Optional[threading.Thread] = None
+
+
+def _frame_name(code) -> str:
+    filename = code.co_filename
+    if filename.startswith(PROJECT_DIR):
+        filename = os.path.relpath(filename, PROJECT_DIR)
+    else:
+        filename = os.path.basename(filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+def _stack(frame) -> Optional[Tuple[str, ...]]:
+    """Root-to-leaf stack, or None when no application frame is on it."""
+    names = []
+    has_app_code = False
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        if code.co_filename.startswith(APP_DIR):
+            has_app_code = True
+        names.append(_frame_name(code))
+        frame = frame.f_back
+    if not has_app_code:
+        return None
+    return tuple(reversed(names))
+
+
+def _sample_loop() -> None:
+    global _sampler
+    me = threading.get_ident()
+    interval = max(settings.PROFILE_INTERVAL_MS, 1) / 1000
+    while True:
+        time.sleep(interval)
+        with _lock:
+            if not _active:
+                _sampler = None
+                return
+            active = list(_active.values())
+            owners = dict(_thread_owner)
+        loop_owner = active[0] if len(active) == 1 else None
+
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            profile = owners.get(ident)
+            if profile is None and ident == _loop_thread:
+                profile = loop_owner
+            if profile is None or profile.id not in _active:
+                continue
+            stack = _stack(frame)
+            if stack is not None:
+                profile.samples[stack] += 1
+
+
+def start_profile(method: str, path: str, trigger: str) -> Profile:
+    global _sampler, _loop_thread
+    profile = Profile(method, path, trigger)
+    _current.set(profile)
+    with _lock:
+        _loop_thread = threading.get_ident()
+        _active[profile.id] = profile
+        if _sampler is None:
+            _sampler = threading.Thread(target=_sample_loop, name="request-profiler", daemon=True)
+            _sampler.start()
+    return profile
+
+
+def stop_profile(profile: Profile) -> None:
+    with _lock:
+        _active.pop(profile.id, None)
+        for ident in [i for i, owner in _thread_owner.items() if owner is profile]:
+            del _thread_owner[ident]
+
+
+def active_count() -> int:
+    return len(_active)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if not _active:
+        return
+    profile = _current.get()
+    # Claim (or release) the thread for whichever request is running SQL on it
+    _thread_owner[threading.get_ident()] = profile
+    if profile is not None:
+        conn.info.setdefault("profile_query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current.get()
+    starts = conn.info.get("profile_query_start")
+    if profile is None or not starts:
+        return
+    started = starts.pop()
+    profile.record_sql(statement, started, time.perf_counter() - started)
+
+
+# --- storage ---------------------------------------------------------------
+
+def profile_dir() -> Path:
+    path = Path(settings.PROFILE_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def save_profile(data: dict) -> Path:
+    """Write one profile and drop the oldest beyond PROFILE_MAX_FILES."""
+    directory = profile_dir()
+    path = directory / f"{data['id']}.json"
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(data, default=str))
+    tmp.replace(path)
+
+    files = sorted(directory.glob("*.json"))
+    files = [f for f in files if f.name != RULES_FILE]
+    for old in files[:-settings.PROFILE_MAX_FILES]:
+        old.unlink(missing_ok=True)
+    return path
+
+
+def profile_path(profile_id: str) -> Optional[Path]:
+    if not PROFILE_ID.match(profile_id):
+        return None
+    path = profile_dir() / f"{profile_id}.json"
+    return path if path.exists() else None
+
+
+def list_profiles() -> List[dict]:
+    """Summaries of the stored profiles, newest first."""
+    summaries = []
+    for path in sorted(profile_dir().glob("*.json"), reverse=True):
+        if path.name == RULES_FILE:
+            continue
+        try:
+            data = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        summaries.append({
+            key: data.get(key)
+            for key in ("id", "created_at", "method", "path", "route", "status", "duration_ms",
+                        "trigger", "user_id", "magazine_id", "sample_count")
+        } | {"sql_count": data.get("sql", {}).get("count"), "size_bytes": path.stat().st_size})
+    return summaries
+
+
+def collapsed_stacks(data: dict) -> str:
+    """Stacks in the collapsed format read by flamegraph.pl and speedscope."""
+    return "".join(f"{stack} {n}\n" for stack, n in data.get("stacks", {}).items())
+
+
+# --- rules -----------------------------------------------------------------
+
+_rules_cache: Tuple[float, float, List[dict]] = (0.0, -1.0, [])
+
+
+def _rules_path() -> Path:
+    return profile_dir() / RULES_FILE
+
+
+def load_rules() -> List[dict]:
+    """Unexpired rules; the file is re-read at most once a second and only when changed."""
+    global _rules_cache
+    checked, mtime, rules = _rules_cache
+    now = time.monotonic()
+    if now - checked >= 1.0:
+        path = Path(settings.PROFILE_DIR) / RULES_FILE
+        try:
+            current = path.stat().st_mtime
+        except OSError:
+            current, rules = 0.0, []
+        if current and current != mtime:
+            try:
+                rules = json.loads(path.read_text())
+            except (OSError, ValueError):
+                rules = []
+        _rules_cache = checked, mtime, rules = now, current, rules
+    wall = time.time()
+    return [rule for rule in rules if rule.get("expires_at", 0) > wall]
+
+
+def save_rules(rules: List[dict]) -> None:
+    global _rules_cache
+    path = _rules_path()
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(rules))
+    tmp.replace(path)
+    _rules_cache = (0.0, -1.0, [])
+
+
+def matching_rule(path: str) -> Optional[dict]:
+    for rule in load_rules():
+        if path.startswith(rule["route_prefix"]):
+            return rule
+    return None
@@ -2,6 +2,8 @@ from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 from app.services.magazine_service import check_and_deactivate_expired_magazines
 from app.services.subscription_service import check_and_deactivate_expired_users
+from app.services.sync_service import prune_tombstones
+from app.db.database import SessionLocal
 import logging
 
 logger = logging.getLogger(__name__)
@@ -33,6 +35,15 @@ class AppScheduler:
             replace_existing=True
         )
         
+        # Daily sync tombstone cleanup at 3:00 AM
+        self.scheduler.add_job(
+            func=self._daily_tombstone_prune,
+            trigger=CronTrigger(hour=3, minute=0),
+            id="daily_tombstone_prune",
+            name="Daily Sync Tombstone Cleanup",
+            replace_existing=True
+        )
+        
         logger.info("Daily expiration checks scheduled")
     
     def _daily_magazine_check(self):
@@ -61,6 +72,17 @@ class AppScheduler:
         except Exception as e:
             logger.error(f"Error in daily user check: {str(e)}")
     
+    def _daily_tombstone_prune(self):
+        """Drop sync tombstones older than SYNC_TOMBSTONE_DAYS"""
+        db = SessionLocal()
+        try:
+            removed = prune_tombstones(db)
+            logger.info(f"Pruned {removed} sync tombstones")
+        except Exception as e:
+            logger.error(f"Error pruning sync tombstones: {str(e)}")
+        finally:
+            db.close()
+    
     def stop(self):
         """Stop the scheduler"""
         self.scheduler.shutdown()
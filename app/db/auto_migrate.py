@@ -72,6 +72,27 @@ def auto_migrate_database():
             """)
             migrations_applied.append("existing data migrated")
         
+        # updated_at on every synced table, indexed for /sync delta queries
+        # (PostgreSQL databases get these from add_updated_at_columns.py)
+        for table in ("products", "clients", "sales", "loans", "loan_payments"):
+            cursor.execute(f"PRAGMA table_info({table})")
+            table_columns = [column[1] for column in cursor.fetchall()]
+            if not table_columns:
+                continue
+            if 'updated_at' not in table_columns:
+                logger.info(f"Adding missing updated_at column to {table} table")
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN updated_at DATETIME")
+                migrations_applied.append(f"{table}.updated_at column added")
+            cursor.execute(f"UPDATE {table} SET updated_at = CURRENT_TIMESTAMP WHERE updated_at IS NULL")
+            if cursor.rowcount:
+                migrations_applied.append(f"{table}.updated_at backfilled")
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_updated_at ON {table} (updated_at)")
+        
+        # Per-user notification lookups (my-notifications and its ETag validator)
+        cursor.execute("PRAGMA table_info(notifications)")
+        if cursor.fetchall():
+            cursor.execute("CREATE INDEX IF NOT EXISTS ix_notifications_recipient_user_id ON notifications (recipient_user_id)")
+        
         # Add more migrations here as needed in the future
         # Example:
         # if 'new_column' not in columns:
@@ -1,33 +1,238 @@
-from sqlalchemy import create_engine
+import hashlib
+import logging
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from fastapi import Depends, Request
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.sql.functions import now
+from app.core import metrics
 from app.core.config import settings
+from app.db import slow_query_log
 
-# Create SQLAlchemy engine with PostgreSQL optimizations
-engine_kwargs = {}
+logger = logging.getLogger(__name__)
+
+
+@compiles(now, "sqlite")
+def _sqlite_now(element, compiler, **kw):
+    # CURRENT_TIMESTAMP only has whole seconds; updated_at columns back sync
+    # watermarks and ETags, where two writes in one second must differ
+    return "STRFTIME('%Y-%m-%d %H:%M:%f', 'now')"
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection."""
+
+    # Log under SQLAlchemy's own pool logger, which stays at WARNING by default
+    _sqla_logger_namespace = "sqlalchemy.pool.impl.QueuePool"
 
-if "postgresql" in settings.DATABASE_URL:
-    engine_kwargs = {
-        "pool_size": 10,
-        "max_overflow": 20,
-        "pool_pre_ping": True,
-        "pool_recycle": 3600
-    }
-elif "sqlite" in settings.DATABASE_URL:
-    engine_kwargs = {"connect_args": {"check_same_thread": False}}
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except Exception:
+            metrics.POOL_CHECKOUT_TIMEOUTS.inc()
+            raise
+        finally:
+            metrics.POOL_CHECKOUT_WAIT.observe(time.perf_counter() - start)
 
-engine = create_engine(settings.DATABASE_URL, **engine_kwargs)
+
+def _engine_kwargs(url: str) -> dict:
+    """Connection options per backend (PostgreSQL pool tuning, SQLite threading)."""
+    if "postgresql" in url:
+        return {
+            "poolclass": TimedQueuePool,
+            "pool_size": 10,
+            "max_overflow": 20,
+            "pool_pre_ping": True,
+            "pool_recycle": 3600
+        }
+    if "sqlite" in url:
+        kwargs = {"connect_args": {"check_same_thread": False}}
+        if ":memory:" not in url and url.rstrip("/") != "sqlite:":
+            kwargs["poolclass"] = TimedQueuePool
+        return kwargs
+    return {}
+
+
+# Create SQLAlchemy engine with PostgreSQL optimizations
+engine = create_engine(settings.DATABASE_URL, **_engine_kwargs(settings.DATABASE_URL))
+
+metrics.Gauge(
+    "db_pool_checked_out", "Connections currently checked out of the primary pool.",
+    collect=lambda: engine.pool.checkedout() if isinstance(engine.pool, QueuePool) else None,
+)
+metrics.Gauge(
+    "db_pool_size", "Configured size of the primary connection pool.",
+    collect=lambda: engine.pool.size() if isinstance(engine.pool, QueuePool) else None,
+)
 
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Optional read replica. Unset DATABASE_READ_URL keeps every query on the primary.
+read_engine = (
+    create_engine(settings.DATABASE_READ_URL, **_engine_kwargs(settings.DATABASE_READ_URL))
+    if settings.DATABASE_READ_URL
+    else None
+)
+ReadSessionLocal = (
+    sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+    if read_engine is not None
+    else None
+)
+
+if settings.SLOW_QUERY_MS > 0:
+    slow_query_log.install(engine)
+    if read_engine is not None:
+        slow_query_log.install(read_engine)
+
 # Create Base class for models
 Base = declarative_base()
 
+# Read-your-writes bookkeeping: client key -> monotonic time of last committed write
+_recent_writes: Dict[str, float] = {}
+_replica_down_until = 0.0
+REPLICA_RETRY_SECONDS = 30
+
+
+def _client_key(request: Optional[Request]) -> Optional[str]:
+    """Identify the caller by its bearer token (hashed), falling back to client IP."""
+    if request is None:
+        return None
+    auth = request.headers.get("authorization")
+    if auth:
+        return hashlib.sha1(auth.encode()).hexdigest()
+    return request.client.host if request.client else None
+
+
+def mark_recent_write(key: Optional[str]) -> None:
+    """Pin ``key`` to the primary for the read-your-writes window."""
+    if not key:
+        return
+    now = time.monotonic()
+    _recent_writes[key] = now
+    # Keep the map bounded: drop entries whose window has already passed
+    if len(_recent_writes) > 10000:
+        cutoff = now - settings.READ_YOUR_WRITES_SECONDS
+        for k in [k for k, t in _recent_writes.items() if t < cutoff]:
+            _recent_writes.pop(k, None)
+
+
+def has_recent_write(key: Optional[str]) -> bool:
+    if not key:
+        return False
+    last = _recent_writes.get(key)
+    return last is not None and time.monotonic() - last < settings.READ_YOUR_WRITES_SECONDS
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _flag_session_write(session, flush_context):
+    session.info["has_writes"] = True
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _record_session_write(session):
+    if session.info.pop("has_writes", False):
+        mark_recent_write(session.info.get("rw_key"))
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _clear_session_write(session):
+    session.info.pop("has_writes", None)
+
+
 # Dependency to get DB session
-def get_db():
+def get_db(request: Request = None):
     db = SessionLocal()
+    db.info["rw_key"] = _client_key(request)
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+
+@contextmanager
+def unit_of_work(db: Session):
+    """Commit everything done inside the block exactly once.
+
+    Helpers called inside (ledger rows, payment schedules) only flush, so a
+    business operation costs one commit and either fully lands or is rolled
+    back as a whole.
+    """
+    try:
+        yield db
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+
+@contextmanager
+def savepoint_session(db: Session):
+    """A session inside ``db``'s transaction whose commits only release savepoints.
+
+    Endpoint code that commits (or uses unit_of_work) can run on it
+    unchanged; its rollbacks undo only the work since its last commit.
+    Nothing is durable until ``db`` itself commits, so several
+    operations land in one commit or are rolled back together. Report
+    cache invalidation and live events are deferred to
+    ``deferred_report_tenants`` and ``deferred_live_events`` in the
+    session info, for the caller to apply after that commit.
+    """
+    connection = db.connection()
+    if connection.dialect.name == "sqlite" and not connection.connection.dbapi_connection.in_transaction:
+        # pysqlite only sends BEGIN before the first write; without it the
+        # first RELEASE SAVEPOINT would commit on its own
+        connection.exec_driver_sql("BEGIN")
+    nested = SessionLocal(bind=connection, join_transaction_mode="create_savepoint")
+    nested.info["rw_key"] = db.info.get("rw_key")
+    nested.info["defer_report_invalidation"] = True
+    try:
+        yield nested
+    finally:
+        nested.close()
+
+
+def _open_replica_session() -> Optional[Session]:
+    """Open a replica session, or return None if the replica is unreachable."""
+    global _replica_down_until
+    if ReadSessionLocal is None or time.monotonic() < _replica_down_until:
+        return None
+    session = ReadSessionLocal()
+    try:
+        session.connection()
+    except DBAPIError as e:
+        session.close()
+        _replica_down_until = time.monotonic() + REPLICA_RETRY_SECONDS
+        logger.warning(f"Read replica unavailable, falling back to primary: {e}")
+        return None
+    return session
+
+
+def get_read_db(request: Request, db: Session = Depends(get_db)):
+    """Session for read-only endpoints.
+
+    Routes to the replica when DATABASE_READ_URL is set, except for callers
+    that committed a write within READ_YOUR_WRITES_SECONDS or when the
+    replica cannot be reached; those get the request's primary session.
+    """
+    if ReadSessionLocal is None or has_recent_write(_client_key(request)):
+        yield db
+        return
+
+    replica = _open_replica_session()
+    if replica is None:
+        yield db
+        return
+
+    try:
+        yield replica
+    finally:
+        replica.close()
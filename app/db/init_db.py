@@ -1,11 +1,17 @@
+import logging
 from sqlalchemy.orm import Session
 from app.db.database import engine, SessionLocal, Base
 from app.models.user import User, UserRole, UserStatus
 from app.models.product import Product
 from app.models.transaction import Sale, Loan, LoanPayment
 from app.models.user import Client
+from app.models.search import SearchDocument
+from app.models.sync import SyncDeletion
 from app.core.config import settings
 from app.core.security import get_password_hash
+from app.services.search_service import ensure_search_index
+
+logger = logging.getLogger(__name__)
 
 def init_db() -> None:
     """
@@ -31,12 +37,18 @@ def init_db() -> None:
             )
             db.add(admin_user)
             db.commit()
-            print("Default admin user created")
+            logger.info("Default admin user created")
         else:
-            print("Admin user already exists")
+            logger.debug("Admin user already exists")
     
     except Exception as e:
-        print(f"Error creating admin user: {e}")
+        logger.error(f"Error creating admin user: {e}")
+        db.rollback()
+
+    try:
+        ensure_search_index(db)
+    except Exception as e:
+        logger.error(f"Error building search index: {e}")
         db.rollback()
     finally:
         db.close() 
\ No newline at end of file
@@ -0,0 +1,90 @@
+"""
+SQL statement counting for N+1 detection.
+
+One listener on every Engine counts executed statements into whichever
+QueryStats are active:
+
+- track_queries(): scoped to the current context (request). Context
+  variables follow sync endpoints into the threadpool, so everything a
+  request executes is counted, and concurrent requests do not mix.
+- count_queries(): everything executed on any engine while the block
+  runs, from any thread. Meant for tests, where the request runs in the
+  TestClient's thread.
+
+A statement that runs many times with identical SQL is the signature of
+a per-row lazy load; QueryStats.repeated() reports those.
+"""
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryStats:
+    def __init__(self, parent: Optional["QueryStats"] = None):
+        self.parent = parent
+        self.count = 0
+        self.duration = 0.0
+        self.statements: Counter = Counter()
+
+    def record(self, statement: str, duration: float) -> None:
+        stats = self
+        while stats is not None:
+            stats.count += 1
+            stats.duration += duration
+            stats.statements[statement] += 1
+            stats = stats.parent
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """Statements executed at least ``threshold`` times, most frequent first."""
+        return [(sql, n) for sql, n in self.statements.most_common() if n >= threshold]
+
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+_global: List[QueryStats] = []
+_global_lock = threading.Lock()
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    stats = QueryStats(parent=_current.get())
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def count_queries() -> Iterator[QueryStats]:
+    stats = QueryStats()
+    with _global_lock:
+        _global.append(stats)
+    try:
+        yield stats
+    finally:
+        with _global_lock:
+            _global.remove(stats)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("query_start")
+    duration = time.perf_counter() - starts.pop() if starts else 0.0
+    stats = _current.get()
+    if stats is not None:
+        stats.record(statement, duration)
+    if _global:
+        with _global_lock:
+            for stats in _global:
+                stats.record(statement, duration)
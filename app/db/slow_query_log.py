@@ -0,0 +1,246 @@
+"""
+Slow-query log.
+
+Opt-in (SLOW_QUERY_MS > 0) cursor hooks on the application engines record
+every statement slower than the threshold with the request it ran for,
+its bind parameters and the query plan:
+
+- SQLite: ``EXPLAIN QUERY PLAN``; PostgreSQL: ``EXPLAIN`` (never ANALYZE,
+  the statement is not run twice) inside a savepoint, so a failing
+  EXPLAIN cannot abort the request's transaction. Plans are captured for
+  SELECTs only, at most once per fingerprint every EXPLAIN_INTERVAL.
+- Entries go as JSON lines to a rotating file (SLOW_QUERY_LOG) and into
+  an in-process aggregate keyed by statement fingerprint: the SQL with
+  literals, placeholders and IN-lists folded, so the same query with
+  different arguments lands in one bucket. The aggregate is per worker
+  process; the log file is the complete record.
+"""
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.core.logging import get_request_context
+
+logger = logging.getLogger(__name__)
+
+EXPLAIN_INTERVAL = 600
+MAX_FINGERPRINTS = 500
+RECENT_ENTRIES = 200
+MAX_PARAM_LENGTH = 200
+MAX_PATHS_PER_FINGERPRINT = 20
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|(?<![:\w]):\w+|\$\d+|\?")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+_lock = threading.Lock()
+_fingerprints: Dict[str, Dict[str, Any]] = {}
+_recent: Deque[dict] = deque(maxlen=RECENT_ENTRIES)
+_file_logger: Optional[logging.Logger] = None
+
+
+def normalize(statement: str) -> str:
+    sql = _STRING.sub("?", statement)
+    sql = _PLACEHOLDER.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _IN_LIST.sub("(...)", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+def fingerprint(normalized: str) -> str:
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12]
+
+
+def _format_parameters(parameters: Any) -> Any:
+    if not settings.SLOW_QUERY_LOG_PARAMS:
+        return None
+
+    def short(value):
+        text = repr(value)
+        return text if len(text) <= MAX_PARAM_LENGTH else text[:MAX_PARAM_LENGTH] + "..."
+
+    if isinstance(parameters, dict):
+        return {key: short(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [short(value) for value in parameters]
+    return short(parameters)
+
+
+def _explain(cursor, dialect: str, statement: str, parameters: Any) -> Optional[List[str]]:
+    """Plan of ``statement`` via a fresh DBAPI cursor (bypasses engine events)."""
+    raw = cursor.connection.cursor()
+    try:
+        if dialect == "sqlite":
+            raw.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+            return [" | ".join(str(col) for col in row) for row in raw.fetchall()]
+        if dialect == "postgresql":
+            raw.execute("SAVEPOINT slow_query_explain")
+            try:
+                raw.execute(f"EXPLAIN {statement}", parameters)
+                plan = [row[0] for row in raw.fetchall()]
+                raw.execute("RELEASE SAVEPOINT slow_query_explain")
+                return plan
+            except Exception:
+                raw.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+                raise
+        return None
+    except Exception as e:
+        logger.debug(f"EXPLAIN failed: {e}")
+        return None
+    finally:
+        raw.close()
+
+
+def _file_log() -> logging.Logger:
+    global _file_logger
+    if _file_logger is None:
+        path = Path(settings.SLOW_QUERY_LOG)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        handler = RotatingFileHandler(
+            path, maxBytes=settings.SLOW_QUERY_LOG_MAX_BYTES,
+            backupCount=settings.SLOW_QUERY_LOG_BACKUPS, encoding="utf-8",
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        file_logger = logging.getLogger("app.slow_queries")
+        for existing in list(file_logger.handlers):
+            file_logger.removeHandler(existing)
+            existing.close()
+        file_logger.addHandler(handler)
+        file_logger.setLevel(logging.INFO)
+        file_logger.propagate = False
+        _file_logger = file_logger
+    return _file_logger
+
+
+def record(statement: str, parameters: Any, duration: float, plan_source=None) -> dict:
+    """Log one slow statement and fold it into its fingerprint's aggregate.
+
+    ``plan_source`` is a callable returning the plan; it is only invoked
+    when the fingerprint has no recent plan.
+    """
+    normalized = normalize(statement)
+    key = fingerprint(normalized)
+    context = get_request_context()
+    duration_ms = round(duration * 1000, 2)
+    now = time.time()
+
+    with _lock:
+        agg = _fingerprints.get(key)
+        needs_plan = agg is None or now - agg["explained_at"] > EXPLAIN_INTERVAL
+    plan = plan_source() if needs_plan and plan_source is not None else None
+
+    entry = {
+        "ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+        "fingerprint": key,
+        "duration_ms": duration_ms,
+        "path": context.get("path"),
+        "request_id": context.get("request_id"),
+        "magazine_id": context.get("magazine_id"),
+        "statement": statement,
+        "parameters": _format_parameters(parameters),
+        "plan": plan,
+    }
+
+    with _lock:
+        agg = _fingerprints.get(key)
+        if agg is None:
+            if len(_fingerprints) >= MAX_FINGERPRINTS:
+                # Forget the fingerprint with the least total time
+                del _fingerprints[min(_fingerprints, key=lambda k: _fingerprints[k]["total_ms"])]
+            agg = _fingerprints[key] = {
+                "fingerprint": key,
+                "normalized": normalized,
+                "count": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+                "paths": {},
+                "example": None,
+                "plan": None,
+                "explained_at": 0.0,
+                "last_seen": None,
+            }
+        agg["count"] += 1
+        agg["total_ms"] = round(agg["total_ms"] + duration_ms, 2)
+        if duration_ms >= agg["max_ms"]:
+            agg["max_ms"] = duration_ms
+            agg["example"] = {"statement": statement, "parameters": entry["parameters"], "path": entry["path"]}
+        if entry["path"] and (entry["path"] in agg["paths"] or len(agg["paths"]) < MAX_PATHS_PER_FINGERPRINT):
+            agg["paths"][entry["path"]] = agg["paths"].get(entry["path"], 0) + 1
+        if plan is not None:
+            agg["plan"] = plan
+            agg["explained_at"] = now
+        elif needs_plan and plan_source is not None:
+            # Do not retry a failing EXPLAIN on every execution
+            agg["explained_at"] = now
+        agg["last_seen"] = entry["ts"]
+        _recent.append(entry)
+
+    try:
+        _file_log().info(json.dumps(entry, default=str, ensure_ascii=False))
+    except OSError as e:
+        logger.error(f"Cannot write slow-query log: {e}")
+    return entry
+
+
+def aggregates(limit: int = 50) -> List[dict]:
+    """Fingerprints ordered by total time spent, slowest first."""
+    with _lock:
+        items = [dict(agg, paths=dict(agg["paths"])) for agg in _fingerprints.values()]
+    items.sort(key=lambda agg: agg["total_ms"], reverse=True)
+    for agg in items:
+        agg["avg_ms"] = round(agg["total_ms"] / agg["count"], 2)
+        agg.pop("explained_at", None)
+    return items[:limit]
+
+
+def recent(limit: int = 50) -> List[dict]:
+    with _lock:
+        return list(_recent)[-limit:][::-1]
+
+
+def reset() -> None:
+    with _lock:
+        _fingerprints.clear()
+        _recent.clear()
+
+
+def install(engine: Engine) -> None:
+    """Attach the slow-query hooks to ``engine``."""
+    dialect = engine.dialect.name
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("slow_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("slow_query_start")
+        if not starts:
+            return
+        duration = time.perf_counter() - starts.pop()
+        if duration * 1000 < settings.SLOW_QUERY_MS:
+            return
+        explainable = (
+            settings.SLOW_QUERY_EXPLAIN
+            and not executemany
+            and statement.lstrip()[:6].upper() in ("SELECT", "WITH")
+        )
+        plan_source = (lambda: _explain(cursor, dialect, statement, parameters)) if explainable else None
+        try:
+            record(statement, parameters, duration, plan_source)
+        except Exception as e:
+            logger.error(f"Slow-query log failed: {e}")
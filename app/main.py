@@ -1,23 +1,41 @@
-from fastapi import FastAPI
+import secrets
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
 from pathlib import Path
 from app.core.config import settings
+from app.core import metrics
+from app.core.logging import configure_logging
 from app.api.api_v1.api import api_router
+from app.api.deps import is_admin_token
 from app.db.init_db import init_db
 from app.db.auto_migrate import ensure_database_compatibility
 from app.core.scheduler import app_scheduler
 from app.middleware.rate_limiting import RateLimitMiddleware
+from app.middleware.query_guard import QueryGuardMiddleware
+from app.middleware.metrics import MetricsMiddleware
+from app.middleware.profiling import ProfilingMiddleware
 import logging
 
+configure_logging(settings.LOG_LEVEL, settings.LOG_FORMAT)
 logger = logging.getLogger(__name__)
 
+# No default_response_class (e.g. ORJSONResponse): for routes with a response_model
+# FastAPI encodes straight to JSON bytes in pydantic-core, which a custom class
+# would bypass (measured slower, see scripts/bench_serialization.py)
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
     openapi_url=f"{settings.API_V1_STR}/openapi.json"
 )
 
-app.add_middleware(RateLimitMiddleware, calls=120, period=60)
+app.add_middleware(RateLimitMiddleware, calls=settings.RATE_LIMIT_PER_MINUTE, period=60)
+
+if settings.QUERY_GUARD:
+    app.add_middleware(
+        QueryGuardMiddleware, mode=settings.QUERY_GUARD, threshold=settings.QUERY_GUARD_THRESHOLD
+    )
 
 if settings.BACKEND_CORS_ORIGINS:
     app.add_middleware(
@@ -26,8 +44,14 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_credentials=True,
         allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
         allow_headers=["Authorization", "Content-Type", "Accept", "X-Requested-With"],
+        expose_headers=["X-Next-Cursor"],
     )
 
+app.add_middleware(ProfilingMiddleware, max_concurrent=settings.PROFILE_MAX_CONCURRENT)
+
+# Outermost, so timings include every other middleware
+app.add_middleware(MetricsMiddleware, slow_request_ms=settings.SLOW_REQUEST_MS)
+
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
 @app.on_event("startup")
@@ -70,6 +94,20 @@ async def privacy_policy():
     path = Path(__file__).resolve().parent.parent / "static" / "privacy.html"
     return FileResponse(str(path), media_type="text/html")
 
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics(request: Request):
+    """Prometheus scrape endpoint (request latency, SQL per request, pool, threadpool).
+
+    Needs METRICS_TOKEN or an admin's access token as the bearer token.
+    """
+    auth = request.headers.get("authorization", "")
+    scrape_token = settings.METRICS_TOKEN and secrets.compare_digest(auth, f"Bearer {settings.METRICS_TOKEN}")
+    if not scrape_token:
+        token = auth[7:] if auth.lower().startswith("bearer ") else None
+        if not await run_in_threadpool(is_admin_token, token):
+            raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/scheduler/status")
 async def get_scheduler_status():
     """Get information about scheduled jobs"""
@@ -0,0 +1,120 @@
+"""
+Per-request instrumentation.
+
+Pure ASGI so the response body is streamed through untouched. For every
+HTTP request it records latency, status, in-flight count and the number
+of SQL statements and time spent in the database (via track_queries),
+all labelled by route template. It also opens the logging request
+context (request id, later user and shop) and writes one structured log
+line per request: DEBUG normally, WARNING above SLOW_REQUEST_MS, which is
+where per-shop slowness shows up.
+"""
+import logging
+import time
+import uuid
+
+from anyio import to_thread
+from starlette.datastructures import MutableHeaders
+from starlette.routing import replace_params
+
+from app.core import metrics
+from app.core.logging import new_request_context
+from app.db.query_counter import track_queries
+
+logger = logging.getLogger("app.requests")
+
+UNMATCHED_ROUTE = "unmatched"
+
+
+def _thread_limiter():
+    # Only available from inside the event loop, which is where /metrics renders
+    return to_thread.current_default_thread_limiter()
+
+
+# Sync endpoints and dependencies run on this pool; busy == size means saturation
+metrics.Gauge(
+    "threadpool_size", "Worker threads available to sync endpoints.",
+    collect=lambda: _thread_limiter().total_tokens,
+)
+metrics.Gauge(
+    "threadpool_busy", "Worker threads currently running sync endpoints.",
+    collect=lambda: _thread_limiter().borrowed_tokens,
+)
+metrics.Gauge(
+    "threadpool_waiting", "Calls queued for a free worker thread.",
+    collect=lambda: _thread_limiter().statistics().tasks_waiting,
+)
+
+
+def route_template(scope) -> str:
+    """The matched route as a template, e.g. /api/v1/loans/{loan_id}.
+
+    Taken from scope["route"]. Routes of included routers only carry their
+    own path, so the router prefix is recovered by filling the route's
+    parameters back in and cutting that tail off the request path. Requests
+    that matched no route share one fixed label.
+    """
+    route = scope.get("route")
+    path_format = getattr(route, "path_format", None)
+    if path_format is None:
+        return UNMATCHED_ROUTE
+    path = scope["path"]
+    own_path, _ = replace_params(path_format, route.param_convertors, dict(scope.get("path_params", {})))
+    if not path.endswith(own_path):
+        return path_format
+    return path[:len(path) - len(own_path)] + path_format
+
+
+class MetricsMiddleware:
+    def __init__(self, app, slow_request_ms: int = 1000):
+        self.app = app
+        self.slow_request_ms = slow_request_ms
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope.get("headers", []):
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")[:64]
+                break
+        request_id = request_id or uuid.uuid4().hex
+        new_request_context(request_id=request_id, path=scope["path"])
+
+        status = 500
+        start = time.perf_counter()
+        metrics.IN_FLIGHT.inc()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                MutableHeaders(scope=message)["X-Request-ID"] = request_id
+            await send(message)
+
+        with track_queries() as stats:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                metrics.IN_FLIGHT.dec()
+                duration = time.perf_counter() - start
+                method = scope["method"]
+                route = route_template(scope)
+
+                metrics.REQUESTS.inc(method=method, route=route, status=str(status))
+                metrics.REQUEST_LATENCY.observe(duration, method=method, route=route)
+                metrics.REQUEST_QUERIES.observe(stats.count, method=method, route=route)
+                metrics.REQUEST_DB_TIME.observe(stats.duration, method=method, route=route)
+
+                duration_ms = round(duration * 1000, 1)
+                level = logging.WARNING if duration_ms >= self.slow_request_ms else logging.DEBUG
+                if logger.isEnabledFor(level):
+                    logger.log(level, f"{method} {route} {status} in {duration_ms} ms", extra={
+                        "route": route,
+                        "status": status,
+                        "duration_ms": duration_ms,
+                        "db_queries": stats.count,
+                        "db_ms": round(stats.duration * 1000, 1),
+                    })
@@ -0,0 +1,98 @@
+"""
+Decides which requests to profile and stores the results.
+
+A request asking for it with ``X-Profile`` / ``?profile=`` is profiled
+only if its bearer token belongs to an admin; for anyone else the flag is
+ignored. Rule-matched requests are kept only if they belong to the rule's
+shop (when it names one). Concurrent profiles are capped at PROFILE_MAX_CONCURRENT.
+
+Must sit inside MetricsMiddleware, which opens the request context that
+tells us the caller's role and shop.
+"""
+import logging
+import random
+import time
+from urllib.parse import parse_qs
+
+from starlette.concurrency import run_in_threadpool
+
+from app.api.deps import is_admin_token
+from app.core import profiling
+from app.core.logging import get_request_context
+from app.middleware.metrics import route_template
+
+logger = logging.getLogger(__name__)
+
+
+def _requested_rate(scope) -> float:
+    value = None
+    for name, raw in scope.get("headers", []):
+        if name == b"x-profile":
+            value = raw.decode("latin-1")
+            break
+    if value is None and scope.get("query_string"):
+        values = parse_qs(scope["query_string"].decode("latin-1")).get("profile")
+        value = values[0] if values else None
+    if value is None:
+        return 0.0
+    try:
+        return min(max(float(value), 0.0), 1.0)
+    except ValueError:
+        return 1.0 if value.lower() in ("true", "yes", "on") else 0.0
+
+
+def _bearer_token(scope):
+    for name, raw in scope.get("headers", []):
+        if name == b"authorization":
+            value = raw.decode("latin-1")
+            return value[7:] if value.lower().startswith("bearer ") else None
+    return None
+
+
+class ProfilingMiddleware:
+    def __init__(self, app, max_concurrent: int = 4):
+        self.app = app
+        self.max_concurrent = max_concurrent
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or profiling.active_count() >= self.max_concurrent:
+            await self.app(scope, receive, send)
+            return
+
+        trigger = None
+        rule = None
+        rate = _requested_rate(scope)
+        if rate and random.random() < rate and await run_in_threadpool(is_admin_token, _bearer_token(scope)):
+            trigger = "request"
+        else:
+            rule = profiling.matching_rule(scope["path"])
+            if rule is not None and random.random() < rule["sample_rate"]:
+                trigger = f"rule:{rule['id']}"
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        profile = profiling.start_profile(scope["method"], scope["path"], trigger)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiling.stop_profile(profile)
+            duration = time.perf_counter() - start
+            context = dict(get_request_context())
+            keep = rule is None or rule.get("magazine_id") is None or rule["magazine_id"] == context.get("magazine_id")
+            if keep:
+                data = profile.to_dict(status, duration, route_template(scope), context)
+                try:
+                    await run_in_threadpool(profiling.save_profile, data)
+                    logger.info(f"Saved profile {profile.id} for {scope['method']} {scope['path']}")
+                except OSError as e:
+                    logger.error(f"Failed to save profile {profile.id}: {e}")
@@ -0,0 +1,70 @@
+"""
+Development guard against N+1 queries.
+
+Counts the SQL statements of every request, adds an X-Query-Count
+response header and flags requests where one statement ran at least
+``threshold`` times, which is what a lazy load per result row looks like.
+In "log" mode offenders are logged; in "raise" mode the response is
+replaced with a 500 so the problem cannot be missed during development.
+
+Enabled with QUERY_GUARD=log|raise; keep it off in production.
+"""
+import json
+import logging
+
+from starlette.datastructures import MutableHeaders
+
+from app.db.query_counter import track_queries
+
+logger = logging.getLogger(__name__)
+
+
+class QueryGuardMiddleware:
+    def __init__(self, app, mode: str = "log", threshold: int = 10):
+        self.app = app
+        self.mode = mode
+        self.threshold = threshold
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        replaced = False
+
+        with track_queries() as stats:
+            async def send_wrapper(message):
+                nonlocal replaced
+                if replaced:
+                    return
+                if message["type"] == "http.response.start":
+                    offenders = stats.repeated(self.threshold)
+                    if offenders:
+                        sql, times = offenders[0]
+                        logger.warning(
+                            f"Possible N+1 on {scope['method']} {scope['path']}: {stats.count} queries, "
+                            f"statement ran {times} times: {' '.join(sql.split())[:300]}"
+                        )
+                        if self.mode == "raise":
+                            replaced = True
+                            body = json.dumps({
+                                "detail": "N+1 query pattern detected",
+                                "query_count": stats.count,
+                                "statement": sql,
+                                "times": times,
+                            }).encode()
+                            await send({
+                                "type": "http.response.start",
+                                "status": 500,
+                                "headers": [
+                                    (b"content-type", b"application/json"),
+                                    (b"content-length", str(len(body)).encode()),
+                                    (b"x-query-count", str(stats.count).encode()),
+                                ],
+                            })
+                            await send({"type": "http.response.body", "body": body})
+                            return
+                    MutableHeaders(scope=message)["X-Query-Count"] = str(stats.count)
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
@@ -50,7 +50,7 @@ class Notification(Base):
     data = Column(JSON, nullable=True)  # Additional data payload
     
     # Recipient information
-    recipient_user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    recipient_user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
     recipient_role = Column(String, nullable=True)  # For broadcasting to roles
     
     # Sender information
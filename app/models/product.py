@@ -14,7 +14,7 @@ class Product(Base):
     sale_price = Column(Float, nullable=True)      # Price the business wants to sell for
     count = Column(Integer, default=0)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now(), index=True)
     
     # Reference to manager who owns this warehouse
     manager_id = Column(Integer, ForeignKey("users.id"), nullable=False)
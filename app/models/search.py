@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, String, Text, UniqueConstraint
+from app.db.database import Base
+
+class SearchDocument(Base):
+    """Normalized search text for one searchable row (product, client, user...).
+
+    Kept in sync on write by app.services.search_service. SQLite mirrors it
+    into an FTS5 trigram table; PostgreSQL serves it from a pg_trgm GIN index.
+    """
+    __tablename__ = "search_documents"
+
+    id = Column(Integer, primary_key=True, index=True)
+    entity_type = Column(String(32), nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    content = Column(Text, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('entity_type', 'entity_id', name='uq_search_entity'),
+    )
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy.sql import func
+from app.db.database import Base
+
+class SyncDeletion(Base):
+    """Tombstone of a hard-deleted row, so /sync can tell clients to drop it.
+
+    Written on delete by app.services.sync_service. The scope columns are
+    copied from the deleted row (or its loan) because the row itself is gone
+    when a client asks; tombstones older than SYNC_TOMBSTONE_DAYS are pruned.
+    """
+    __tablename__ = "sync_deletions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    entity = Column(String(32), nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    magazine_id = Column(Integer, nullable=True)
+    manager_id = Column(Integer, nullable=True)
+    deleted_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
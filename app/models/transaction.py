@@ -20,6 +20,7 @@ class Sale(Base):
     sale_date = Column(DateTime(timezone=True), default=uzbekistan_now)
     imei = Column(String(20), nullable=True)
     created_at = Column(DateTime(timezone=True), default=uzbekistan_now)
+    updated_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now(), index=True)
     
     # Foreign keys
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
@@ -48,6 +49,7 @@ class Loan(Base):
     is_completed = Column(Boolean, default=False)
     track_payments = Column(Boolean, default=False, nullable=False, server_default="false")
     created_at = Column(DateTime(timezone=True), default=uzbekistan_now)
+    updated_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now(), index=True)
     
     # Foreign keys
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
@@ -79,6 +81,7 @@ class LoanPayment(Base):
     is_full_payment = Column(Boolean, default=False)  # True if this is a one-time full loan payment
     notes = Column(Text, nullable=True)  # Optional notes for payment (delays, reasons, etc.)
     created_at = Column(DateTime(timezone=True), default=uzbekistan_now)
+    updated_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now(), index=True)
     
     # Foreign key
     loan_id = Column(Integer, ForeignKey("loans.id"), nullable=False)
@@ -65,7 +65,7 @@ class Client(Base):
     passport_image_url = Column(String, nullable=True)  # Keep for backward compatibility
     passport_image_urls = Column(String, nullable=True)  # JSON array of all image paths
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now(), index=True)
     
     # Relationship to manager who added this client
     manager_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -23,7 +23,8 @@ def cleanup_for_user(db: Session, user: User) -> int:
     """Delete demo seed items for a user if they still match signature.
 
     Returns count of removed rows. User-modified items won't match and are
-    preserved.
+    preserved. Rows are deleted through the session so sync tombstones are
+    written and offline clients drop them too.
     """
     removed = 0
     try:
@@ -39,14 +40,18 @@ def cleanup_for_user(db: Session, user: User) -> int:
                 Product.sale_price == sale,
                 Product.count == count,
             )
-            removed += q.delete(synchronize_session=False)
+            for product in q.all():
+                db.delete(product)
+                removed += 1
 
         q = db.query(Client).filter(
             Client.manager_id == user.id,
             Client.name == DEMO_CLIENT_NAME,
             Client.phone == DEMO_CLIENT_PHONE + str(user.id),
         )
-        removed += q.delete(synchronize_session=False)
+        for client in q.all():
+            db.delete(client)
+            removed += 1
 
         db.commit()
     except Exception:
@@ -0,0 +1,49 @@
+"""Stock counters for products and auto products.
+
+Stock changes are single conditional UPDATE statements, so two sellers
+taking the last unit at the same moment cannot both succeed: the database
+applies ``count > 0`` and the decrement together under its row lock. The
+updates run inside the caller's session transaction and become permanent
+with the caller's commit (or are undone by its rollback).
+"""
+from typing import Optional, Type, Union
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app.models.product import Product
+from app.models.auto_product import AutoProduct
+
+StockModel = Type[Union[Product, AutoProduct]]
+
+
+def take_unit(db: Session, model: StockModel, product_id: int) -> Optional[int]:
+    """Take one unit of stock.
+
+    Returns the remaining count, or None if the product is out of stock
+    (or does not exist). Nothing is changed in the None case.
+    """
+    stmt = (
+        update(model)
+        .where(model.id == product_id, model.count > 0)
+        .values(count=model.count - 1)
+        .execution_options(synchronize_session="fetch")
+    )
+    if db.get_bind().dialect.update_returning:
+        return db.execute(stmt.returning(model.count)).scalar_one_or_none()
+
+    # Backends without UPDATE ... RETURNING: rowcount tells us whether it applied
+    result = db.execute(stmt)
+    if result.rowcount == 0:
+        return None
+    return db.query(model.count).filter(model.id == product_id).scalar()
+
+
+def release_unit(db: Session, model: StockModel, product_id: int, quantity: int = 1) -> None:
+    """Put ``quantity`` units back into stock (e.g. when a sale is deleted)."""
+    db.execute(
+        update(model)
+        .where(model.id == product_id)
+        .values(count=model.count + quantity)
+        .execution_options(synchronize_session="fetch")
+    )
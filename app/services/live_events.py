@@ -0,0 +1,306 @@
+"""Live events pushed to connected clients (WebSocket /live/ws).
+
+Clients used to poll /auth/check-approval-status,
+/notifications/my-notifications and /loans/active-payments to notice
+changes. Instead they keep one connection open and refetch when told:
+
+- "payment_recorded": a loan payment changed status (regular or auto)
+- "sale_created" / "loan_created": a new sale or loan
+- "account_approved": the user's account became active
+- "notification_created": a notification for the user
+
+Every event goes to one channel: "user:{id}" or "magazine:{id}". Gadgets
+users receive their own and their shop's channel, auto users (whose data
+is per seller, as in report_cache) only their own. Events carry ids, not
+data; clients fetch what changed through the usual endpoints.
+
+Events are published after commit by session events, the same way
+report_cache follows writes, so every writer (endpoints, batch,
+scheduler, scripts) publishes without extra calls and rolled back
+writes never do.
+
+Backends (LIVE_EVENTS_BACKEND):
+- "memory": events reach the subscribers of the publishing process only,
+  so use it with a single worker.
+- "sqlite": events are appended to one SQLite file (LIVE_EVENTS_PATH);
+  every worker tails it and delivers to its own subscribers.
+- "" disables live events; the WebSocket refuses connections.
+
+A subscriber that falls LIVE_EVENTS_QUEUE_SIZE events behind gets a single
+"resync" event instead, and should refetch everything it shows.
+"""
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import event, inspect
+
+from app.core import metrics
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models.auto_transaction import AutoLoan, AutoLoanPayment, AutoSale
+from app.models.notification import Notification
+from app.models.transaction import Loan, LoanPayment, Sale
+from app.models.user import User, UserStatus, UserType
+
+logger = logging.getLogger(__name__)
+
+LIVE_CONNECTIONS = metrics.Gauge("live_connections", "Open live event connections in this worker.")
+LIVE_EVENTS = metrics.Counter("live_events_total", "Live events published, by type.", ("type",))
+
+# Published (channel, event) pairs
+Message = Tuple[str, dict]
+
+
+class Subscription:
+    """One connection's queue; filled from any thread, read on the connection's event loop."""
+
+    def __init__(self, channels: List[str], loop: asyncio.AbstractEventLoop):
+        self.channels = channels
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.LIVE_EVENTS_QUEUE_SIZE)
+
+    def _put(self, payload: dict) -> None:
+        if self.queue.full():
+            # Too far behind: drop the backlog and ask for a full refetch
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            payload = {"type": "resync"}
+        self.queue.put_nowait(payload)
+
+    def push(self, payload: dict) -> None:
+        try:
+            self.loop.call_soon_threadsafe(self._put, payload)
+        except RuntimeError:
+            # Loop already closed: the connection is going away
+            pass
+
+    async def next(self, timeout: float) -> Optional[dict]:
+        """The next event, or None after ``timeout`` seconds without one."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+_subscribers: Dict[str, Set[Subscription]] = defaultdict(set)
+_subscribers_lock = threading.Lock()
+
+
+def _deliver(messages: Iterable[Message]) -> None:
+    """Hand messages to this process's subscribers."""
+    for channel, payload in messages:
+        with _subscribers_lock:
+            targets = list(_subscribers.get(channel, ()))
+        for subscription in targets:
+            subscription.push(payload)
+
+
+class MemoryBackend:
+    def start(self) -> None:
+        pass
+
+    def publish(self, messages: List[Message]) -> None:
+        _deliver(messages)
+
+
+class SQLiteBackend:
+    """Events appended to one SQLite file and tailed by every worker process."""
+
+    def __init__(self, path: str, poll_seconds: float, retention_seconds: int = 60):
+        self.path = path
+        self.poll_seconds = poll_seconds
+        self.retention_seconds = retention_seconds
+        self._local = threading.local()
+        self._poller: Optional[threading.Thread] = None
+        self._poller_lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS live_events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    channel TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                );
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def publish(self, messages: List[Message]) -> None:
+        now = time.time()
+        self._connect().executemany(
+            "INSERT INTO live_events (channel, payload, created_at) VALUES (?, ?, ?)",
+            [(channel, json.dumps(payload), now) for channel, payload in messages],
+        )
+
+    def start(self) -> None:
+        """Start tailing the file; called when this worker gets its first subscriber."""
+        with self._poller_lock:
+            if self._poller is None:
+                self._poller = threading.Thread(target=self._tail, name="live-events", daemon=True)
+                self._poller.start()
+
+    def _tail(self) -> None:
+        conn = self._connect()
+        last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM live_events").fetchone()[0]
+        last_prune = 0.0
+        while True:
+            time.sleep(self.poll_seconds)
+            try:
+                rows = conn.execute(
+                    "SELECT id, channel, payload FROM live_events WHERE id > ? ORDER BY id", (last_id,)
+                ).fetchall()
+                if rows:
+                    last_id = rows[-1][0]
+                    _deliver((channel, json.loads(payload)) for _, channel, payload in rows)
+                now = time.time()
+                if now - last_prune > self.retention_seconds:
+                    conn.execute("DELETE FROM live_events WHERE created_at < ?", (now - self.retention_seconds,))
+                    last_prune = now
+            except Exception as e:
+                logger.warning(f"Live events poll failed: {e}")
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """The configured backend, or None when live events are disabled."""
+    global _backend
+    if _backend is None and settings.LIVE_EVENTS_BACKEND:
+        with _backend_lock:
+            if _backend is None:
+                if settings.LIVE_EVENTS_BACKEND == "sqlite":
+                    _backend = SQLiteBackend(settings.LIVE_EVENTS_PATH, settings.LIVE_EVENTS_POLL_MS / 1000)
+                else:
+                    _backend = MemoryBackend()
+    return _backend
+
+
+def channels_for(user: User) -> List[str]:
+    channels = [f"user:{user.id}"]
+    if user.user_type != UserType.AUTO and user.magazine_id:
+        channels.append(f"magazine:{user.magazine_id}")
+    return channels
+
+
+def subscribe(channels: List[str]) -> Subscription:
+    """Register a subscription on the running event loop; pair with ``unsubscribe``."""
+    get_backend().start()
+    subscription = Subscription(channels, asyncio.get_running_loop())
+    with _subscribers_lock:
+        for channel in channels:
+            _subscribers[channel].add(subscription)
+    LIVE_CONNECTIONS.inc()
+    return subscription
+
+
+def unsubscribe(subscription: Subscription) -> None:
+    with _subscribers_lock:
+        for channel in subscription.channels:
+            subscribers = _subscribers.get(channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del _subscribers[channel]
+    LIVE_CONNECTIONS.dec()
+
+
+def publish(messages: List[Message]) -> None:
+    backend = get_backend()
+    if backend is None or not messages:
+        return
+    try:
+        backend.publish(messages)
+    except Exception as e:
+        logger.error(f"Publishing {len(messages)} live events failed: {e}")
+        return
+    for _, payload in messages:
+        LIVE_EVENTS.inc(type=payload["type"])
+
+
+def _message(channel: str, event_type: str, **data) -> Message:
+    return channel, {"type": event_type, "data": data, "at": datetime.now(timezone.utc).isoformat()}
+
+
+def _changed(obj, *attributes: str) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[name].history.has_changes() for name in attributes)
+
+
+def _messages_for(session, obj, is_new: bool) -> List[Message]:
+    if isinstance(obj, LoanPayment) and not is_new and _changed(obj, "status", "payment_date"):
+        loan = session.get(Loan, obj.loan_id)
+        if loan is None or not loan.magazine_id:
+            return []
+        return [_message(f"magazine:{loan.magazine_id}", "payment_recorded",
+                         loan_id=obj.loan_id, payment_id=obj.id, status=obj.status)]
+    if isinstance(obj, AutoLoanPayment) and not is_new and _changed(obj, "status", "payment_date"):
+        loan = session.get(AutoLoan, obj.auto_loan_id)
+        if loan is None:
+            return []
+        return [_message(f"user:{loan.seller_id}", "payment_recorded",
+                         auto_loan_id=obj.auto_loan_id, payment_id=obj.id, status=obj.status)]
+    if is_new and isinstance(obj, Sale):
+        return [_message(f"magazine:{obj.magazine_id}", "sale_created", sale_id=obj.id, product_id=obj.product_id)]
+    if is_new and isinstance(obj, AutoSale):
+        return [_message(f"user:{obj.seller_id}", "sale_created",
+                         auto_sale_id=obj.id, auto_product_id=obj.auto_product_id)]
+    if is_new and isinstance(obj, Loan) and obj.magazine_id:
+        return [_message(f"magazine:{obj.magazine_id}", "loan_created", loan_id=obj.id)]
+    if is_new and isinstance(obj, AutoLoan):
+        return [_message(f"user:{obj.seller_id}", "loan_created", auto_loan_id=obj.id)]
+    if isinstance(obj, User) and not is_new and obj.status == UserStatus.ACTIVE and _changed(obj, "status"):
+        return [_message(f"user:{obj.id}", "account_approved", user_id=obj.id)]
+    if is_new and isinstance(obj, Notification) and obj.recipient_user_id:
+        return [_message(f"user:{obj.recipient_user_id}", "notification_created",
+                         notification_id=obj.id, notification_type=obj.type)]
+    return []
+
+
+_TRACKED = (LoanPayment, AutoLoanPayment, Sale, AutoSale, Loan, AutoLoan, User, Notification)
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _collect_live_events(session, flush_context):
+    if get_backend() is None:
+        return
+    messages = []
+    for objects, is_new in ((session.new, True), (session.dirty, False)):
+        for obj in objects:
+            if isinstance(obj, _TRACKED):
+                messages.extend(_messages_for(session, obj, is_new))
+    if messages:
+        session.info.setdefault("live_events", []).extend(messages)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _publish_live_events(session):
+    messages = session.info.pop("live_events", None)
+    if not messages:
+        return
+    if session.info.get("defer_report_invalidation"):
+        # Savepoint release inside a larger transaction: the caller publishes
+        # once the data is really committed
+        session.info.setdefault("deferred_live_events", []).extend(messages)
+        return
+    publish(messages)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_live_events(session):
+    session.info.pop("live_events", None)
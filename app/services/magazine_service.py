@@ -1,6 +1,7 @@
 from datetime import date, timedelta
-from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from typing import Dict, List, Optional
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import and_, func, select
 from app.models.magazine import Magazine, MagazineStatus
 from app.models.user import User, UserRole, UserStatus
 from app.db.database import SessionLocal
@@ -8,6 +9,75 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+def _serialize_magazine(magazine: Magazine, manager: Optional[User]) -> dict:
+    return {
+        "id": magazine.id,
+        "name": magazine.name,
+        "status": magazine.status.value,
+        "subscription_end_date": magazine.subscription_end_date,
+        "created_at": magazine.created_at,
+        "manager": {
+            "id": manager.id,
+            "name": manager.name,
+            "phone": manager.phone,
+            "status": manager.status.value
+        } if manager else None
+    }
+
+def list_magazines_with_managers(
+    db: Session,
+    status: Optional[MagazineStatus] = None,
+    expiring_within_days: Optional[int] = None,
+    limit: Optional[int] = None,
+    offset: int = 0
+) -> List[dict]:
+    """
+    List magazines together with their manager in a single statement.
+
+    The manager is the lowest-id MANAGER user of the magazine, resolved via a
+    grouped subquery and outer joins instead of one query per magazine.
+    """
+    first_manager = (
+        select(User.magazine_id, func.min(User.id).label("manager_id"))
+        .where(User.role == UserRole.MANAGER, User.magazine_id.isnot(None))
+        .group_by(User.magazine_id)
+        .subquery()
+    )
+    manager = aliased(User)
+    
+    query = (
+        db.query(Magazine, manager)
+        .outerjoin(first_manager, first_manager.c.magazine_id == Magazine.id)
+        .outerjoin(manager, manager.id == first_manager.c.manager_id)
+    )
+    
+    if status is not None:
+        query = query.filter(Magazine.status == status)
+    
+    if expiring_within_days is not None:
+        today = date.today()
+        query = query.filter(
+            and_(
+                Magazine.subscription_end_date <= today + timedelta(days=expiring_within_days),
+                Magazine.subscription_end_date >= today
+            )
+        )
+    
+    query = query.order_by(Magazine.id).offset(offset)
+    if limit is not None:
+        query = query.limit(limit)
+    
+    return [_serialize_magazine(magazine, mgr) for magazine, mgr in query.all()]
+
+def get_magazine_status_counts(db: Session) -> Dict[str, int]:
+    """Number of magazines per status, plus the overall total."""
+    counts = {status.value: 0 for status in MagazineStatus}
+    for status, count in db.query(Magazine.status, func.count(Magazine.id)).group_by(Magazine.status):
+        if status is not None:
+            counts[status.value] = count
+    counts["total"] = sum(counts.values())
+    return counts
+
 def check_and_deactivate_expired_magazines() -> dict:
     """
     Background task to check for expired magazine subscriptions and deactivate them.
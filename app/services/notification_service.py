@@ -1,13 +1,17 @@
 import httpx
 import json
+import logging
 from typing import Dict, Any, Optional
 from datetime import datetime
 from sqlalchemy.orm import Session
 
+from app.core.config import settings
 from app.models.notification import Notification, NotificationStatus
 
+logger = logging.getLogger(__name__)
+
 class NotificationService:
-    EXPO_PUSH_URL = "https://exp.host/--/api/v2/push/send"
+    EXPO_PUSH_URL = settings.EXPO_PUSH_URL
     
     def __init__(self):
         self.client = httpx.AsyncClient()
@@ -65,15 +69,15 @@ class NotificationService:
                     if result.get("status") == "ok":
                         return True
                     else:
-                        print(f"Expo push error: {result.get('message', 'Unknown error')}")
+                        logger.warning(f"Expo push error: {result.get('message', 'Unknown error')}")
                         return False
                 return True
             else:
-                print(f"Push notification failed: {response.status_code} - {response_data}")
+                logger.warning(f"Push notification failed: {response.status_code} - {response_data}")
                 return False
                 
         except Exception as e:
-            print(f"Error sending push notification: {str(e)}")
+            logger.error(f"Error sending push notification: {e}")
             
             # Update notification status to failed
             if notification_id and db:
@@ -86,7 +90,7 @@ class NotificationService:
                         notification.error_message = str(e)
                         db.commit()
                 except Exception as db_error:
-                    print(f"Failed to update notification status: {str(db_error)}")
+                    logger.error(f"Failed to update notification status: {db_error}")
             
             return False
     
@@ -125,7 +129,7 @@ class NotificationService:
             db.commit()
             
         except Exception as e:
-            print(f"Error updating notification status: {str(e)}")
+            logger.error(f"Error updating notification status: {e}")
     
     async def send_bulk_push_notifications(
         self,
@@ -197,7 +201,7 @@ class NotificationService:
                 results["failed"] = results["total"]
                 
         except Exception as e:
-            print(f"Bulk notification error: {str(e)}")
+            logger.error(f"Bulk notification error: {e}")
             results["failed"] = results["total"]
         
         return results
@@ -213,7 +217,7 @@ class NotificationService:
                 notification.sent_at = datetime.now()
                 db.commit()
         except Exception as e:
-            print(f"Error marking notification as sent: {str(e)}")
+            logger.error(f"Error marking notification as sent: {e}")
     
     async def _mark_notification_failed(self, notification_id: int, error_message: str, db: Session):
         """Mark notification as failed"""
@@ -226,7 +230,7 @@ class NotificationService:
                 notification.error_message = error_message
                 db.commit()
         except Exception as e:
-            print(f"Error marking notification as failed: {str(e)}")
+            logger.error(f"Error marking notification as failed: {e}")
     
     async def close(self):
         """Close HTTP client"""
@@ -0,0 +1,263 @@
+"""Bulk product import and stock adjustment.
+
+Onboarding a shop or recording a stock count means thousands of rows;
+going through create_product / update_product would cost a request, a
+commit and several statements per row. Here a whole file is:
+
+1. validated in memory in one pass (types, prices, duplicate keys), so
+   bad rows are reported without touching the database;
+2. matched against the manager's existing products with one query, on
+   the (manager_id, name, model) key;
+3. written with executemany INSERT ... RETURNING / UPDATE statements in
+   chunks of WRITE_CHUNK rows (stock deltas on PostgreSQL: one
+   UPDATE ... FROM (VALUES ...) RETURNING per chunk), and committed once.
+
+Bulk statements skip ORM mapper events, so search documents for new
+products are written here through search_service.index_documents.
+"""
+import csv
+import io
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
+from sqlalchemy import Integer, bindparam, column, insert, update, values
+from sqlalchemy.orm import Session
+
+from app.models.product import Product
+from app.services.search_service import index_documents
+
+logger = logging.getLogger(__name__)
+
+MAX_ROWS = 10000
+WRITE_CHUNK = 1000
+# Legacy single-price rows: purchase price estimated with a 20% margin
+LEGACY_PURCHASE_RATIO = 0.8
+
+
+class ImportRow(BaseModel):
+    model_config = ConfigDict(str_strip_whitespace=True)
+
+    name: str = Field(..., min_length=1)
+    model: str = Field(..., min_length=1)
+    purchase_price: Optional[float] = Field(None, ge=0)
+    sale_price: Optional[float] = Field(None, ge=0)
+    price: Optional[float] = Field(None, ge=0)
+    count: int = Field(0, ge=0)
+
+
+class StockAdjustment(BaseModel):
+    product_id: int
+    # Exactly one of: the counted stock, or a change (+ received, - written off)
+    count: Optional[int] = Field(None, ge=0)
+    delta: Optional[int] = None
+
+
+def resolve_prices(purchase_price: Optional[float], sale_price: Optional[float],
+                   legacy_price: Optional[float]) -> Optional[Tuple[float, float, float]]:
+    """(price, purchase_price, sale_price) from new or legacy price fields, or None if missing."""
+    if purchase_price is not None and sale_price is not None:
+        return sale_price, purchase_price, sale_price
+    if legacy_price is not None:
+        return legacy_price, legacy_price * LEGACY_PURCHASE_RATIO, legacy_price
+    return None
+
+
+def parse_csv(text: str) -> List[dict]:
+    """Rows of a CSV with a header line; header names are case-insensitive, blanks become None."""
+    reader = csv.DictReader(io.StringIO(text.lstrip("\ufeff")))
+    rows = []
+    for record in reader:
+        rows.append({
+            (key or "").strip().lower(): (value.strip() or None) if isinstance(value, str) else value
+            for key, value in record.items()
+        })
+    return rows
+
+
+def _error(row: int, message: str) -> dict:
+    return {"row": row, "status": "error", "product_id": None, "error": message}
+
+
+def _validation_message(e: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in e.errors())
+
+
+def _chunks(items: list) -> Iterable[list]:
+    for start in range(0, len(items), WRITE_CHUNK):
+        yield items[start:start + WRITE_CHUNK]
+
+
+def import_products(db: Session, manager_id: int, raw_rows: List[dict]) -> List[dict]:
+    """Upsert ``raw_rows`` into the manager's warehouse; one result per row, in input order.
+
+    New keys are created; existing ones get the row's prices and count.
+    The caller commits.
+    """
+    results: List[Optional[dict]] = [None] * len(raw_rows)
+    valid: Dict[Tuple[str, str], Tuple[int, ImportRow, tuple]] = {}
+    for index, raw in enumerate(raw_rows):
+        row_number = index + 1
+        try:
+            row = ImportRow.model_validate(raw)
+        except ValidationError as e:
+            results[index] = _error(row_number, _validation_message(e))
+            continue
+        prices = resolve_prices(row.purchase_price, row.sale_price, row.price)
+        if prices is None:
+            results[index] = _error(row_number, "Either provide purchase_price and sale_price, or price")
+            continue
+        key = (row.name, row.model)
+        if key in valid:
+            results[index] = _error(row_number, f"Duplicate of row {valid[key][0] + 1}")
+            continue
+        valid[key] = (index, row, prices)
+
+    existing = {
+        (name, model): product_id
+        for product_id, name, model in db.query(Product.id, Product.name, Product.model).filter(
+            Product.manager_id == manager_id
+        )
+    }
+
+    inserts, updates = [], []
+    for key, (index, row, (price, purchase_price, sale_price)) in valid.items():
+        values = {"price": price, "purchase_price": purchase_price, "sale_price": sale_price, "count": row.count}
+        if key in existing:
+            product_id = existing[key]
+            updates.append({"b_id": product_id, **{f"b_{k}": v for k, v in values.items()}})
+            results[index] = {"row": index + 1, "status": "updated", "product_id": product_id, "error": None}
+        else:
+            inserts.append((index, {"name": row.name, "model": row.model, "manager_id": manager_id, **values}))
+
+    update_stmt = update(Product.__table__).where(Product.__table__.c.id == bindparam("b_id")).values(
+        price=bindparam("b_price"), purchase_price=bindparam("b_purchase_price"),
+        sale_price=bindparam("b_sale_price"), count=bindparam("b_count"),
+    )
+    for chunk in _chunks(updates):
+        db.execute(update_stmt, chunk)
+
+    for chunk in _chunks(inserts):
+        created = db.execute(
+            insert(Product.__table__).returning(
+                Product.__table__.c.id, Product.__table__.c.name, Product.__table__.c.model
+            ),
+            [values for _, values in chunk],
+        ).all()
+        index_documents(db, "product", [(row.id, row.name, row.model) for row in created])
+        # Keys are unique within the import, so RETURNING rows are matched by key
+        # rather than relying on their order (which would force row-at-a-time inserts)
+        for row in created:
+            index = valid[(row.name, row.model)][0]
+            results[index] = {"row": index + 1, "status": "created", "product_id": row.id, "error": None}
+
+    logger.info(f"Product import for manager {manager_id}: {len(inserts)} created, {len(updates)} updated, "
+                f"{len(raw_rows) - len(valid)} rejected")
+    return results
+
+
+def _parse_adjustments(raw_items: List[dict]) -> Tuple[List[Optional[dict]], List[Tuple[int, StockAdjustment]]]:
+    results: List[Optional[dict]] = [None] * len(raw_items)
+    items = []
+    for index, raw in enumerate(raw_items):
+        try:
+            item = StockAdjustment.model_validate(raw)
+        except ValidationError as e:
+            results[index] = _error(index + 1, _validation_message(e))
+            continue
+        if (item.count is None) == (item.delta is None):
+            results[index] = _error(index + 1, "Provide either count or delta")
+            continue
+        items.append((index, item))
+    return results, items
+
+
+def _adjust_statement(item: StockAdjustment, manager_id: Optional[int]):
+    table = Product.__table__
+    stmt = update(table).where(table.c.id == item.product_id)
+    if manager_id is not None:
+        stmt = stmt.where(table.c.manager_id == manager_id)
+    if item.delta is not None:
+        return stmt.where(table.c.count + item.delta >= 0).values(count=table.c.count + item.delta)
+    return stmt.values(count=item.count)
+
+
+def adjust_stock(db: Session, manager_id: Optional[int], raw_items: List[dict]) -> List[dict]:
+    """Apply counted stock or deltas to the manager's products (any product when ``manager_id`` is None).
+
+    Deltas are applied relative to the current count in the database, so
+    sales made meanwhile are not overwritten; a delta that would take the
+    count below zero is rejected. The caller commits.
+    """
+    results, items = _parse_adjustments(raw_items)
+
+    current = {}
+    for chunk in _chunks(items):
+        query = db.query(Product.id, Product.count).filter(Product.id.in_([item.product_id for _, item in chunk]))
+        if manager_id is not None:
+            query = query.filter(Product.manager_id == manager_id)
+        current.update(query.all())
+
+    counted, deltas = [], []
+    for index, item in items:
+        if item.product_id not in current:
+            results[index] = _error(index + 1, "Product not found")
+        elif item.delta is not None and current[item.product_id] + item.delta < 0:
+            results[index] = _error(index + 1, f"Stock would go negative (have {current[item.product_id]})")
+        else:
+            (counted if item.count is not None else deltas).append((index, item))
+
+    table = Product.__table__
+    for chunk in _chunks(counted):
+        db.execute(
+            update(table).where(table.c.id == bindparam("b_id")).values(count=bindparam("b_count")),
+            [{"b_id": item.product_id, "b_count": item.count} for _, item in chunk],
+        )
+    # Rows for the same product are summed, so each product is updated once
+    totals: Dict[int, int] = {}
+    for _, item in deltas:
+        totals[item.product_id] = totals.get(item.product_id, 0) + item.delta
+    for chunk in _chunks(list(totals.items())):
+        if not _apply_deltas(db, chunk):
+            # A sale made meanwhile invalidated one of them: start over one row at a time
+            db.rollback()
+            return _adjust_one_by_one(db, manager_id, raw_items)
+
+    for index, item in counted + deltas:
+        results[index] = {"row": index + 1, "status": "updated", "product_id": item.product_id, "error": None}
+    return results
+
+
+def _apply_deltas(db: Session, chunk: List[Tuple[int, int]]) -> bool:
+    """Add each (product id, delta) unless the count would go negative; True if all of them applied."""
+    table = Product.__table__
+    dialect = db.get_bind().dialect
+    if dialect.name == "postgresql":
+        # psycopg2 cannot report rowcount for executemany UPDATEs: one
+        # UPDATE ... FROM (VALUES ...) and the ids it returns instead
+        rows = values(column("id", Integer), column("delta", Integer), name="v").data(chunk)
+        updated = db.execute(
+            update(table)
+            .where(table.c.id == rows.c.id, table.c.count + rows.c.delta >= 0)
+            .values(count=table.c.count + rows.c.delta)
+            .returning(table.c.id)
+        ).scalars().all()
+        return set(updated) == {product_id for product_id, _ in chunk}
+    if not dialect.supports_sane_multi_rowcount:
+        # Cannot tell which rows applied: the caller goes one row at a time
+        return False
+    stmt = update(table).where(
+        table.c.id == bindparam("b_id"), table.c.count + bindparam("b_delta") >= 0
+    ).values(count=table.c.count + bindparam("b_delta"))
+    params = [{"b_id": product_id, "b_delta": delta} for product_id, delta in chunk]
+    return db.execute(stmt, params).rowcount == len(params)
+
+
+def _adjust_one_by_one(db: Session, manager_id: Optional[int], raw_items: List[dict]) -> List[dict]:
+    results, items = _parse_adjustments(raw_items)
+    for index, item in items:
+        if db.execute(_adjust_statement(item, manager_id)).rowcount:
+            results[index] = {"row": index + 1, "status": "updated", "product_id": item.product_id, "error": None}
+        else:
+            results[index] = _error(index + 1, "Product not found or stock would go negative")
+    return results
@@ -0,0 +1,348 @@
+"""Tenant-scoped cache for report endpoints.
+
+Reports are recomputed only when the tenant's data changed. Every tenant
+(a shop for gadgets users, the seller for auto users, "global" for
+admins) has a version counter; cache keys embed it, so a write simply
+bumps the version and stale entries are never read again (LRU and TTL
+then clear them out).
+
+Versions are bumped after commit by session events, the same way the
+search index follows writes: any flushed sale, loan, payment or ledger
+row (regular or auto) marks its tenant, and the commit bumps it. So do
+clients and products (through their manager's shop), whose names cached
+sections such as the dashboard's active payments show, and auto products
+(through their owner), whose purchase price feeds revenue. Sale, loan and
+payment endpoints therefore invalidate without extra calls, and so does
+every other writer (scheduler, scripts).
+
+Backends (REPORT_CACHE_BACKEND):
+- "memory": per-process OrderedDict. Fast, but each worker only sees
+  its own writes, so use it with a single worker.
+- "sqlite": one SQLite file (REPORT_CACHE_PATH) shared by all workers on
+  the host, for consistent invalidation across processes.
+- "" disables caching.
+
+Misses are coalesced: concurrent identical requests (same tenant, version
+and parameters) share one computation through SingleFlight, so a refresh
+storm on one shop's dashboard costs a single query set. Followers wait at
+most REPORT_COALESCE_WAIT_SECONDS. ``coalesced_report`` gives uncached
+endpoints (the export) the coalescing alone.
+"""
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Dict, Iterable, Optional, Set
+
+from fastapi.encoders import jsonable_encoder
+from pydantic_core import from_json, to_json, to_jsonable_python
+from sqlalchemy import event
+
+from app.core import metrics
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models.auto_product import AutoProduct
+from app.models.auto_transaction import AutoLoan, AutoLoanPayment, AutoSale
+from app.models.product import Product
+from app.models.transaction import Loan, LoanPayment, Sale, Transaction
+from app.models.user import Client, User, UserRole, UserType
+from app.services.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_TENANT = "global"
+
+REPORT_REQUESTS = metrics.Counter(
+    "report_requests_total", "Report requests by endpoint and outcome (hit, miss, coalesced).",
+    ("endpoint", "result"),
+)
+
+
+class MemoryBackend:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def version(self, tenant: str) -> int:
+        return self._versions.get(tenant, 0)
+
+    def bump(self, tenants: Iterable[str]) -> None:
+        with self._lock:
+            for tenant in tenants:
+                self._versions[tenant] = self._versions.get(tenant, 0) + 1
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: int) -> None:
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+
+
+class SQLiteBackend:
+    """Cache and versions in one SQLite file, shared by every worker process."""
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS report_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    used_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS ix_report_cache_used_at ON report_cache (used_at);
+                CREATE TABLE IF NOT EXISTS report_versions (
+                    tenant TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL
+                );
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def version(self, tenant: str) -> int:
+        row = self._connect().execute(
+            "SELECT version FROM report_versions WHERE tenant = ?", (tenant,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def bump(self, tenants: Iterable[str]) -> None:
+        self._connect().executemany(
+            "INSERT INTO report_versions (tenant, version) VALUES (?, 1) "
+            "ON CONFLICT(tenant) DO UPDATE SET version = version + 1",
+            [(tenant,) for tenant in tenants],
+        )
+
+    def get(self, key: str) -> Optional[Any]:
+        conn = self._connect()
+        now = time.time()
+        row = conn.execute(
+            "SELECT value FROM report_cache WHERE key = ? AND expires_at >= ?", (key, now)
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE report_cache SET used_at = ? WHERE key = ?", (now, key))
+        return from_json(row[0])
+
+    def set(self, key: str, value: Any, ttl: int) -> None:
+        conn = self._connect()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO report_cache (key, value, expires_at, used_at) VALUES (?, ?, ?, ?)",
+            (key, to_json(value).decode(), now + ttl, now),
+        )
+        # Evict expired rows, then the least recently used beyond the cap
+        conn.execute("DELETE FROM report_cache WHERE expires_at < ?", (now,))
+        conn.execute(
+            "DELETE FROM report_cache WHERE key IN ("
+            " SELECT key FROM report_cache ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def clear(self) -> None:
+        conn = self._connect()
+        conn.execute("DELETE FROM report_cache")
+        conn.execute("DELETE FROM report_versions")
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """The configured backend, or None when caching is disabled."""
+    global _backend
+    if _backend is None and settings.REPORT_CACHE_BACKEND:
+        with _backend_lock:
+            if _backend is None:
+                if settings.REPORT_CACHE_BACKEND == "sqlite":
+                    _backend = SQLiteBackend(settings.REPORT_CACHE_PATH, settings.REPORT_CACHE_MAX_ENTRIES)
+                else:
+                    _backend = MemoryBackend(settings.REPORT_CACHE_MAX_ENTRIES)
+    return _backend
+
+
+def tenant_for(user: User) -> str:
+    if user.role == UserRole.ADMIN:
+        return GLOBAL_TENANT
+    if user.user_type == UserType.AUTO:
+        return f"seller:{user.id}"
+    return f"magazine:{user.magazine_id}"
+
+
+def _normalize(params: Dict[str, Any]) -> str:
+    cleaned = {}
+    for name, value in params.items():
+        if value is None or value == "":
+            continue
+        if isinstance(value, str):
+            value = " ".join(value.split()).lower() if name == "search" else value.strip()
+        cleaned[name] = value
+    return json.dumps(cleaned, sort_keys=True, default=str)
+
+
+def cache_key(user: User, endpoint: str, params: Dict[str, Any], version: int) -> str:
+    # Auto users' reports are filtered by their own id even for admins
+    scope = {"user_type": user.user_type.name if user.user_type else None}
+    if user.user_type == UserType.AUTO:
+        scope["user_id"] = user.id
+    digest = hashlib.sha1((_normalize(params) + _normalize(scope)).encode()).hexdigest()[:16]
+    return f"{tenant_for(user)}:{version}:{endpoint}:{digest}"
+
+
+_flights = SingleFlight()
+
+
+def get_or_compute(
+    user: User, endpoint: str, params: Dict[str, Any], compute: Callable[[], Any], cache: bool = True
+) -> Any:
+    backend = get_backend() if cache else None
+    key = None
+    if backend is not None:
+        try:
+            key = cache_key(user, endpoint, params, backend.version(tenant_for(user)))
+            hit = backend.get(key)
+        except Exception as e:
+            logger.warning(f"Report cache unavailable: {e}")
+            backend, key = None, None
+        else:
+            if hit is not None:
+                REPORT_REQUESTS.inc(endpoint=endpoint, result="hit")
+                return hit
+    if key is None:
+        key = cache_key(user, endpoint, params, 0)
+
+    def compute_and_store():
+        value = compute()
+        if backend is not None:
+            # pydantic-core's encoder is an order of magnitude faster than
+            # jsonable_encoder on row lists; the latter handles anything else
+            value = to_jsonable_python(value, fallback=jsonable_encoder)
+            try:
+                backend.set(key, value, settings.REPORT_CACHE_TTL)
+            except Exception as e:
+                logger.warning(f"Could not store report in cache: {e}")
+        return value
+
+    value, shared = _flights.do(key, compute_and_store, settings.REPORT_COALESCE_WAIT_SECONDS)
+    REPORT_REQUESTS.inc(endpoint=endpoint, result="coalesced" if shared else "miss")
+    return value
+
+
+def cached_report(endpoint: str, cache: bool = True):
+    """Cache a report endpoint per tenant and query parameters.
+
+    The wrapped endpoint must take ``current_user``; ``db`` is excluded
+    from the key, every other argument is part of it. With ``cache=False``
+    only concurrent identical requests are coalesced.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            params = {k: v for k, v in kwargs.items() if k not in ("db", "current_user")}
+            return get_or_compute(
+                kwargs["current_user"], endpoint, params, lambda: func(*args, **kwargs), cache=cache
+            )
+        return wrapper
+    return decorator
+
+
+def coalesced_report(endpoint: str):
+    return cached_report(endpoint, cache=False)
+
+
+def invalidate(tenants: Iterable[str]) -> None:
+    backend = get_backend()
+    tenants = set(tenants) | {GLOBAL_TENANT}
+    if backend is None:
+        return
+    try:
+        backend.bump(tenants)
+    except Exception as e:
+        logger.error(f"Report cache invalidation failed for {sorted(tenants)}: {e}")
+
+
+def _tenants_of(session, obj) -> Set[str]:
+    if isinstance(obj, (Sale, Loan, Transaction)):
+        return {f"magazine:{obj.magazine_id}"} if obj.magazine_id else set()
+    if isinstance(obj, (AutoSale, AutoLoan)):
+        return {f"seller:{obj.seller_id}"}
+    if isinstance(obj, LoanPayment):
+        loan = session.get(Loan, obj.loan_id) if obj.loan_id else None
+        return {f"magazine:{loan.magazine_id}"} if loan is not None else set()
+    if isinstance(obj, AutoLoanPayment):
+        loan = session.get(AutoLoan, obj.auto_loan_id) if obj.auto_loan_id else None
+        return {f"seller:{loan.seller_id}"} if loan is not None else set()
+    if isinstance(obj, (Client, Product)):
+        manager = session.get(User, obj.manager_id) if obj.manager_id else None
+        return {f"magazine:{manager.magazine_id}"} if manager is not None and manager.magazine_id else set()
+    if isinstance(obj, AutoProduct):
+        return {f"seller:{obj.manager_id}"} if obj.manager_id else set()
+    return set()
+
+
+_TRACKED = (Sale, Loan, LoanPayment, Transaction, AutoSale, AutoLoan, AutoLoanPayment, Client, Product, AutoProduct)
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _collect_report_tenants(session, flush_context):
+    if get_backend() is None:
+        return
+    changed = [obj for obj in (*session.new, *session.dirty, *session.deleted) if isinstance(obj, _TRACKED)]
+    if not changed:
+        return
+    tenants = session.info.setdefault("report_tenants", set())
+    for obj in changed:
+        tenants |= _tenants_of(session, obj)
+    tenants.add(GLOBAL_TENANT)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _bump_report_versions(session):
+    tenants = session.info.pop("report_tenants", None)
+    if not tenants:
+        return
+    if session.info.get("defer_report_invalidation"):
+        # Savepoint release inside a larger transaction: the caller bumps
+        # once the data is really committed
+        session.info.setdefault("deferred_report_tenants", set()).update(tenants)
+        return
+    invalidate(tenants)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_report_tenants(session):
+    session.info.pop("report_tenants", None)
@@ -0,0 +1,224 @@
+"""Indexed substring search over products, auto products, clients and users.
+
+Every searchable row gets one ``search_documents`` row holding its text in a
+normalized form (lowercase, Cyrillic transliterated to Uzbek Latin, common
+spelling variants folded), so "Нексия", "NEXIA" and "Neksiya" all look the
+same. Writes keep the index current through mapper events; reads go through
+``matching_ids`` which returns a subquery usable inside any ``filter``.
+
+Backends:
+- SQLite: FTS5 external-content table with the trigram tokenizer.
+- PostgreSQL: ``pg_trgm`` GIN index serving ``LIKE '%term%'``.
+"""
+import logging
+import re
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import event, inspect, select, text, delete, insert
+from sqlalchemy.orm import Session
+
+from app.db.database import engine
+from app.models.search import SearchDocument
+from app.models.product import Product
+from app.models.auto_product import AutoProduct
+from app.models.user import User, Client
+
+logger = logging.getLogger(__name__)
+
+CYRILLIC_TO_LATIN: Dict[str, str] = {
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "yo",
+    "ж": "j", "з": "z", "и": "i", "й": "y", "к": "k", "л": "l", "м": "m",
+    "н": "n", "о": "o", "п": "p", "р": "r", "с": "s", "т": "t", "у": "u",
+    "ф": "f", "х": "x", "ц": "ts", "ч": "ch", "ш": "sh", "щ": "sh", "ъ": "",
+    "ы": "i", "ь": "", "э": "e", "ю": "yu", "я": "ya",
+    # Uzbek-specific letters
+    "ў": "o", "қ": "q", "ғ": "g", "ҳ": "h",
+}
+
+# Applied in order after transliteration. Brand names written in Cyrillic
+# spell Latin "x" as "кс" (Nexia -> Нексия), and Russian-style Latin spells
+# Uzbek "x" as "kh" (Xurshid -> Khurshid); fold them all to "x".
+_FOLDS = (
+    ("kh", "x"),
+    ("ks", "x"),
+    ("iy", "i"),
+)
+
+_APOSTROPHES = re.compile(r"[’‘ʻʼ'`]")
+_NON_WORD = re.compile(r"[^\w]+")
+
+# Minimum term length the FTS5 trigram tokenizer can MATCH
+TRIGRAM_MIN_LENGTH = 3
+
+
+def normalize(value: Optional[str]) -> str:
+    """Fold text to the canonical form stored in and queried from the index."""
+    if not value:
+        return ""
+    result = "".join(CYRILLIC_TO_LATIN.get(ch, ch) for ch in value.lower())
+    result = _APOSTROPHES.sub("", result)
+    for src, dst in _FOLDS:
+        result = result.replace(src, dst)
+    return _NON_WORD.sub(" ", result).strip()
+
+
+# entity_type -> (model, columns that make up the document)
+SEARCHABLE = {
+    "product": (Product, ("name", "model")),
+    "auto_product": (AutoProduct, ("car_name", "model", "color")),
+    "client": (Client, ("name", "phone", "passport_series")),
+    "user": (User, ("name",)),
+}
+
+
+def _document(obj, columns: Iterable[str]) -> str:
+    return " ".join(normalize(getattr(obj, col, None)) for col in columns).strip()
+
+
+def _write_document(connection, entity_type: str, entity_id: int, content: str) -> None:
+    table = SearchDocument.__table__
+    connection.execute(
+        delete(table).where(table.c.entity_type == entity_type, table.c.entity_id == entity_id)
+    )
+    if content:
+        connection.execute(
+            insert(table).values(entity_type=entity_type, entity_id=entity_id, content=content)
+        )
+
+
+def _register_listeners(entity_type: str, model, columns) -> None:
+    @event.listens_for(model, "after_insert")
+    def _after_insert(mapper, connection, target):
+        _write_document(connection, entity_type, target.id, _document(target, columns))
+
+    @event.listens_for(model, "after_update")
+    def _after_update(mapper, connection, target):
+        state = inspect(target)
+        if not any(state.attrs[col].history.has_changes() for col in columns):
+            return
+        _write_document(connection, entity_type, target.id, _document(target, columns))
+
+    @event.listens_for(model, "after_delete")
+    def _after_delete(mapper, connection, target):
+        _write_document(connection, entity_type, target.id, "")
+
+
+for _entity_type, (_model, _columns) in SEARCHABLE.items():
+    _register_listeners(_entity_type, _model, _columns)
+
+
+_fts_available = False
+
+
+def ensure_search_schema() -> None:
+    """Create the backend-specific index structures (idempotent)."""
+    global _fts_available
+    SearchDocument.__table__.create(bind=engine, checkfirst=True)
+    dialect = engine.dialect.name
+    try:
+        with engine.begin() as conn:
+            if dialect == "sqlite":
+                fts_existed = conn.execute(text(
+                    "SELECT 1 FROM sqlite_master WHERE name = 'search_documents_fts'"
+                )).first() is not None
+                conn.execute(text(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS search_documents_fts USING fts5("
+                    "content, content='search_documents', content_rowid='id', tokenize='trigram')"
+                ))
+                conn.execute(text(
+                    "CREATE TRIGGER IF NOT EXISTS search_documents_ai AFTER INSERT ON search_documents BEGIN "
+                    "INSERT INTO search_documents_fts(rowid, content) VALUES (new.id, new.content); END"
+                ))
+                conn.execute(text(
+                    "CREATE TRIGGER IF NOT EXISTS search_documents_ad AFTER DELETE ON search_documents BEGIN "
+                    "INSERT INTO search_documents_fts(search_documents_fts, rowid, content) "
+                    "VALUES ('delete', old.id, old.content); END"
+                ))
+                if not fts_existed:
+                    # Index documents written before the FTS table existed
+                    conn.execute(text(
+                        "INSERT INTO search_documents_fts(search_documents_fts) VALUES ('rebuild')"
+                    ))
+                _fts_available = True
+            elif dialect == "postgresql":
+                conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+                conn.execute(text(
+                    "CREATE INDEX IF NOT EXISTS ix_search_documents_content_trgm "
+                    "ON search_documents USING gin (content gin_trgm_ops)"
+                ))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_search_documents_type_entity "
+                "ON search_documents (entity_type, entity_id)"
+            ))
+    except Exception as e:
+        logger.warning(f"Search index setup incomplete, falling back to LIKE scans: {e}")
+
+
+def drop_search_schema() -> None:
+    """Drop the SQLite FTS table and its triggers, which ``Base.metadata.drop_all`` does not know about."""
+    global _fts_available
+    if engine.dialect.name == "sqlite":
+        with engine.begin() as conn:
+            conn.execute(text("DROP TRIGGER IF EXISTS search_documents_ai"))
+            conn.execute(text("DROP TRIGGER IF EXISTS search_documents_ad"))
+            conn.execute(text("DROP TABLE IF EXISTS search_documents_fts"))
+    _fts_available = False
+
+
+def rebuild_search_index(db: Session) -> int:
+    """Re-index every searchable row. Returns the number of documents written."""
+    table = SearchDocument.__table__
+    db.execute(delete(table))
+    total = 0
+    for entity_type, (model, columns) in SEARCHABLE.items():
+        rows = db.query(model.id, *[getattr(model, c) for c in columns]).yield_per(1000)
+        batch = []
+        for row in rows:
+            content = " ".join(normalize(v) for v in row[1:]).strip()
+            if content:
+                batch.append({"entity_type": entity_type, "entity_id": row[0], "content": content})
+            if len(batch) >= 1000:
+                db.execute(insert(table), batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            db.execute(insert(table), batch)
+            total += len(batch)
+    db.commit()
+    return total
+
+
+def index_documents(db: Session, entity_type: str, rows: Iterable[tuple]) -> None:
+    """Index rows written with bulk statements, which bypass the mapper events.
+
+    ``rows`` are (id, *values of the entity's SEARCHABLE columns) of new rows.
+    """
+    batch = []
+    for row in rows:
+        content = " ".join(normalize(v) for v in row[1:]).strip()
+        if content:
+            batch.append({"entity_type": entity_type, "entity_id": row[0], "content": content})
+    if batch:
+        db.execute(insert(SearchDocument.__table__), batch)
+
+
+def ensure_search_index(db: Session) -> None:
+    """Backfill the index on first start after upgrade."""
+    ensure_search_schema()
+    if db.query(SearchDocument.id).first() is None:
+        count = rebuild_search_index(db)
+        logger.info(f"Search index built with {count} documents")
+
+
+def matching_ids(entity_type: str, term: str):
+    """Subquery of ``entity_id`` values whose document contains ``term``."""
+    needle = normalize(term)
+    table = SearchDocument.__table__
+    query = select(table.c.entity_id).where(table.c.entity_type == entity_type)
+    if _fts_available and len(needle) >= TRIGRAM_MIN_LENGTH:
+        fts_query = '"' + needle.replace('"', '""') + '"'
+        return query.where(table.c.id.in_(
+            select(text("rowid")).select_from(text("search_documents_fts"))
+            .where(text("search_documents_fts MATCH :fts_query").bindparams(fts_query=fts_query))
+        ))
+    return query.where(table.c.content.contains(needle, autoescape=True))
@@ -0,0 +1,61 @@
+"""Single-flight: concurrent calls with the same key share one computation.
+
+The first caller (the leader) runs the function; callers arriving while
+it runs wait for its result instead of repeating the work. A follower
+waits at most ``wait_seconds`` and then computes on its own, so one stuck
+leader cannot stall everyone behind it. Errors raised by the leader are
+re-raised in its followers.
+
+Coalescing is per process; workers do not share in-flight calls.
+"""
+import logging
+import threading
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+        self.followers = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], Any], wait_seconds: float) -> Tuple[Any, bool]:
+        """Run ``fn`` once per key at a time; returns (result, shared)."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.followers += 1
+
+        if leader:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+                raise
+            finally:
+                with self._lock:
+                    self._calls.pop(key, None)
+                call.done.set()
+            return call.result, False
+
+        if not call.done.wait(wait_seconds):
+            logger.warning(f"Gave up waiting {wait_seconds}s for in-flight {key}, computing separately")
+            return fn(), False
+        if call.error is not None:
+            raise call.error
+        return call.result, True
+
+    def in_flight(self) -> int:
+        return len(self._calls)
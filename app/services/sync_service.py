@@ -0,0 +1,183 @@
+"""Delta sync: what changed in a user's scope since a server watermark.
+
+Changes are found through the indexed ``updated_at`` column of every
+synced table (set by the database on insert and update). Hard deletes
+leave a tombstone in ``sync_deletions``, written by mapper events in the
+same flush as the DELETE, so every deleting code path is covered as long
+as it deletes through the ORM session.
+
+Watermarks come from the database clock, not the app server's. They are
+moved back by SYNC_OVERLAP_SECONDS before being handed out: ``updated_at``
+is taken when a statement runs (PostgreSQL: when the transaction starts),
+so a row can become visible after a later watermark was issued. Clients
+therefore receive a few rows twice and must apply changes as upserts.
+"""
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Query, Session, joinedload
+
+from app.core.config import settings
+from app.models.product import Product
+from app.models.sync import SyncDeletion
+from app.models.transaction import Loan, LoanPayment, Sale
+from app.models.user import Client, User, UserRole, UserType
+
+logger = logging.getLogger(__name__)
+
+ENTITIES = ("clients", "products", "sales", "loans", "payments")
+
+_ENTITY_MODELS = {
+    "clients": Client,
+    "products": Product,
+    "sales": Sale,
+    "loans": Loan,
+    "payments": LoanPayment,
+}
+
+
+def server_now(db: Session) -> datetime:
+    return db.query(func.now()).scalar()
+
+
+def issue_watermark(db: Session) -> datetime:
+    return server_now(db) - timedelta(seconds=settings.SYNC_OVERLAP_SECONDS)
+
+
+def align_watermark(since: datetime, reference: datetime) -> datetime:
+    """Give a client watermark the same timezone awareness as the DB clock (UTC)."""
+    if reference.tzinfo is not None and since.tzinfo is None:
+        return since.replace(tzinfo=timezone.utc)
+    if reference.tzinfo is None and since.tzinfo is not None:
+        return since.astimezone(timezone.utc).replace(tzinfo=None)
+    return since
+
+
+def tombstone_horizon(db: Session) -> datetime:
+    """Oldest watermark that still has every tombstone after it."""
+    return server_now(db) - timedelta(days=settings.SYNC_TOMBSTONE_DAYS)
+
+
+def _client_managers(user: User):
+    """Manager ids whose clients the user sees (same rules as GET /clients)."""
+    if user.user_type == UserType.GADGETS:
+        return select(User.id).where(User.magazine_id == user.magazine_id)
+    if user.user_type == UserType.AUTO:
+        if user.role == UserRole.ADMIN:
+            return select(User.id).where(User.user_type == UserType.AUTO)
+        return [user.id if user.role == UserRole.MANAGER else user.manager_id]
+    return None
+
+
+def _product_manager(user: User) -> Optional[int]:
+    return user.id if user.role == UserRole.MANAGER else user.manager_id
+
+
+def in_scope(query: Query, entity: str, user: User, columns) -> Optional[Query]:
+    """Restrict ``query`` to the user's scope, or None when it is empty.
+
+    ``columns`` maps "magazine_id"/"manager_id" to the columns to filter
+    on, so the same rules serve live rows and tombstones.
+    """
+    if entity == "clients":
+        managers = _client_managers(user)
+        return None if managers is None else query.filter(columns["manager_id"].in_(managers))
+    if user.role == UserRole.ADMIN:
+        return query
+    if entity == "products":
+        return query.filter(columns["manager_id"] == _product_manager(user))
+    if not user.magazine_id:
+        return None
+    return query.filter(columns["magazine_id"] == user.magazine_id)
+
+
+def _scope_columns(query: Query, entity: str):
+    model = _ENTITY_MODELS[entity]
+    if entity == "payments":
+        return query.join(Loan, LoanPayment.loan_id == Loan.id), {"magazine_id": Loan.magazine_id}
+    return query, {"magazine_id": getattr(model, "magazine_id", None), "manager_id": getattr(model, "manager_id", None)}
+
+
+def version(db: Session, user: User, entity: str) -> tuple:
+    """(row count, latest updated_at) of ``entity`` in scope: changes on any insert, update or delete."""
+    model = _ENTITY_MODELS[entity]
+    query, columns = _scope_columns(db.query(func.count(model.id), func.max(model.updated_at)), entity)
+    query = in_scope(query, entity, user, columns)
+    return tuple(query.one()) if query is not None else (0, None)
+
+
+def changed(db: Session, user: User, entity: str, since: Optional[datetime]) -> list:
+    """Live rows of ``entity`` in scope, updated at or after ``since`` (all when None)."""
+    model = _ENTITY_MODELS[entity]
+    query, columns = _scope_columns(db.query(model), entity)
+    if entity == "sales":
+        query = query.options(joinedload(Sale.product), joinedload(Sale.seller))
+    elif entity == "loans":
+        query = query.options(joinedload(Loan.product), joinedload(Loan.client), joinedload(Loan.seller))
+
+    query = in_scope(query, entity, user, columns)
+    if query is None:
+        return []
+    if since is not None:
+        query = query.filter(model.updated_at >= since)
+    return query.order_by(model.id).all()
+
+
+def deleted(db: Session, user: User, entity: str, since: datetime) -> List[int]:
+    """Ids of ``entity`` rows in scope deleted at or after ``since``."""
+    query = db.query(SyncDeletion.entity_id).filter(
+        SyncDeletion.entity == entity,
+        SyncDeletion.deleted_at >= since
+    )
+    query = in_scope(query, entity, user, {
+        "magazine_id": SyncDeletion.magazine_id, "manager_id": SyncDeletion.manager_id
+    })
+    if query is None:
+        return []
+    return sorted({row.entity_id for row in query.all()})
+
+
+def prune_tombstones(db: Session) -> int:
+    """Drop tombstones past the retention window; returns how many."""
+    removed = db.query(SyncDeletion).filter(
+        SyncDeletion.deleted_at < tombstone_horizon(db)
+    ).delete(synchronize_session=False)
+    db.commit()
+    return removed
+
+
+def _record_deletion(connection, entity: str, entity_id: int,
+                     magazine_id: Optional[int] = None, manager_id: Optional[int] = None) -> None:
+    connection.execute(SyncDeletion.__table__.insert().values(
+        entity=entity, entity_id=entity_id, magazine_id=magazine_id, manager_id=manager_id
+    ))
+
+
+@event.listens_for(Client, "after_delete")
+def _client_deleted(mapper, connection, target):
+    _record_deletion(connection, "clients", target.id, manager_id=target.manager_id)
+
+
+@event.listens_for(Product, "after_delete")
+def _product_deleted(mapper, connection, target):
+    _record_deletion(connection, "products", target.id, manager_id=target.manager_id)
+
+
+@event.listens_for(Sale, "after_delete")
+def _sale_deleted(mapper, connection, target):
+    _record_deletion(connection, "sales", target.id, magazine_id=target.magazine_id)
+
+
+@event.listens_for(Loan, "after_delete")
+def _loan_deleted(mapper, connection, target):
+    _record_deletion(connection, "loans", target.id, magazine_id=target.magazine_id)
+
+
+@event.listens_for(LoanPayment, "after_delete")
+def _payment_deleted(mapper, connection, target):
+    magazine_id = connection.execute(
+        select(Loan.magazine_id).where(Loan.id == target.loan_id)
+    ).scalar()
+    _record_deletion(connection, "payments", target.id, magazine_id=magazine_id)
@@ -1,29 +1,21 @@
 #!/usr/bin/env python3
 """
 Script to run on PRODUCTION SERVER to create database dump.
-Creates a SQL dump file that can be uploaded to GitHub and downloaded locally.
+Creates a compressed, parallel pg_dump (directory format, see app/db/backup.py)
+plus a restore script that loads it with pg_restore --jobs.
 """
 
 import os
-import subprocess
 import sys
-from datetime import datetime
+
+from app.db.backup import backup_postgres
 
 # Production database configuration (local on prod server)
 PROD_HOST = "localhost"  # Running on prod server
 PROD_PORT = "5432"
 PROD_DB = "nasiya_bro" 
 PROD_USER = "nasiya_user"
-
-def run_command(command, env=None):
-    """Run shell command and return success status"""
-    try:
-        print(f"Running: {command}")
-        result = subprocess.run(command, shell=True, check=True, env=env)
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"Error: Command failed with exit code {e.returncode}")
-        return False
+DUMP_JOBS = 4
 
 def main():
     print("🔄 Creating production database dump...")
@@ -34,34 +26,23 @@ def main():
         print("❌ Password is required")
         sys.exit(1)
     
-    # Create timestamp for dump file
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    dump_file = f"nasiya_prod_dump_{timestamp}.sql"
-    
     print("\n1️⃣ Creating database dump...")
     
-    # Set environment for production dump
-    prod_env = os.environ.copy()
-    prod_env['PGPASSWORD'] = prod_password
-    
-    # Create clean dump with complete data
-    dump_cmd = f"pg_dump -h {PROD_HOST} -p {PROD_PORT} -U {PROD_USER} -d {PROD_DB} --no-owner --no-privileges --clean --if-exists --verbose > {dump_file}"
-    
-    if not run_command(dump_cmd, env=prod_env):
-        print("❌ Failed to create dump")
+    url = f"postgresql://{PROD_USER}:{prod_password}@{PROD_HOST}:{PROD_PORT}/{PROD_DB}"
+    try:
+        backup_dir = backup_postgres(url, ".", jobs=DUMP_JOBS)
+    except Exception as e:
+        print(f"❌ Failed to create dump: {e}")
         sys.exit(1)
+    dump_dir = os.path.join(backup_dir, "dump")
     
-    print(f"✅ Database dump created: {dump_file}")
+    print(f"✅ Database dump created: {backup_dir}")
     
-    # Check dump file size
-    try:
-        file_size = os.path.getsize(dump_file)
-        print(f"📁 Dump file size: {file_size / 1024 / 1024:.2f} MB")
-        
-        if file_size > 100 * 1024 * 1024:  # 100MB
-            print("⚠️  Large file - consider compressing before upload")
-    except:
-        pass
+    # Check dump size
+    file_size = sum(
+        os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(dump_dir) for f in files
+    )
+    print(f"📁 Dump size (compressed): {file_size / 1024 / 1024:.2f} MB")
     
     print("\n2️⃣ Creating restore script...")
     
@@ -85,9 +66,9 @@ dropdb -h localhost -U postgres --if-exists nasiya_bro
 echo "Creating nasiya_bro database..."
 createdb -h localhost -U postgres nasiya_bro
 
-# Restore dump
+# Restore dump (parallel)
 echo "Restoring database from dump..."
-psql -h localhost -U postgres -d nasiya_bro < {dump_file}
+pg_restore -h localhost -U postgres -d nasiya_bro --no-owner --no-privileges --jobs={DUMP_JOBS} {dump_dir}
 
 # Create .env file for local development
 echo "Creating .env file..."
@@ -123,12 +104,12 @@ echo "🚀 You can now run: python run.py"
     
     print(f"\n🎉 Database dump completed!")
     print(f"📦 Files created:")
-    print(f"   • {dump_file} - Database dump")
+    print(f"   • {backup_dir} - Database dump")
     print(f"   • {restore_file} - Restore script")
     
     print(f"\n📋 Next steps:")
-    print(f"1. Upload both files to GitHub")
-    print(f"2. Download on local machine")
+    print(f"1. Copy both to the local machine (e.g. tar czf dump.tgz {backup_dir} {restore_file})")
+    print(f"2. Unpack in the backend folder")
     print(f"3. Run: bash {restore_file}")
 
 if __name__ == "__main__":
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Create, list and restore database backups (see app/db/backup.py).
+
+Run from the backend folder:
+
+    python -m scripts.backup create                  # native: SQLite online backup / pg_dump -Fd -j
+    python -m scripts.backup create --format logical # per-table compressed JSON lines
+    python -m scripts.backup create --incremental    # rows added, changed or deleted since the last logical backup
+    python -m scripts.backup list
+    python -m scripts.backup restore backups/20250101_030000_logical --database-url sqlite:///./restored.db
+
+Backups go to BACKUP_DIR (default ./backups). Restore overwrites the target
+database; stop the app first when restoring onto the live database.
+"""
+
+import argparse
+import logging
+import sys
+import time
+
+from app.core.config import settings
+from app.db.backup import create_backup, list_backups, restore_backup
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Database backups")
+    parser.add_argument("--database-url", default=settings.DATABASE_URL)
+    parser.add_argument("--backup-dir", default=settings.BACKUP_DIR)
+    parser.add_argument("--workers", type=int, default=4, help="parallel tables / pg_dump jobs")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    create = sub.add_parser("create")
+    create.add_argument("--format", choices=["auto", "sqlite", "pg", "logical"], default="auto")
+    create.add_argument("--incremental", action="store_true",
+                        help="logical backup of rows added, changed or deleted since the previous logical backup")
+
+    restore = sub.add_parser("restore")
+    restore.add_argument("path", help="backup directory")
+
+    sub.add_parser("list")
+    return parser.parse_args()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    args = parse_args()
+
+    if args.command == "list":
+        for backup in list_backups(args.backup_dir):
+            parent = f" <- {backup['parent']}" if backup.get("parent") else ""
+            print(f"{backup['path']}  {backup['format']:<8}{backup['kind']:<12}"
+                  f"{backup['size_bytes'] / 1024 / 1024:8.2f} MB{parent}")
+        return
+
+    started = time.monotonic()
+    if args.command == "create":
+        path = create_backup(
+            args.database_url, args.backup_dir, fmt=args.format,
+            incremental=args.incremental, workers=args.workers,
+        )
+        print(f"✅ Backup created: {path} ({time.monotonic() - started:.1f}s)")
+    else:
+        try:
+            restore_backup(args.path, args.database_url, workers=args.workers)
+        except RuntimeError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        print(f"✅ Restored {args.path} ({time.monotonic() - started:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
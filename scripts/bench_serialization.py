@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Serialization micro-benchmark for large list responses.
+
+Seeds one shop with --rows loans, sales and clients, then measures for
+/loans (full and view=list), /sales, /clients and /reports/export (each
+asked for --rows rows):
+
+- build:      the endpoint function itself (query and response rows)
+- serialize:  what FastAPI does with the result: validation against the
+              response_model and encoding to JSON bytes
+- request:    the whole request through the ASGI app (in process, no network)
+
+Times are medians over --repeat runs, in milliseconds. Run from the backend
+folder:
+
+    python -m scripts.bench_serialization
+    python -m scripts.bench_serialization --rows 2000 --repeat 20
+"""
+
+import argparse
+import logging
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="List endpoint serialization timings")
+    parser.add_argument("--rows", type=int, default=500, help="rows per list")
+    parser.add_argument("--repeat", type=int, default=10, help="runs per measurement")
+    return parser.parse_args()
+
+
+def median_ms(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    args = parse_args()
+    tmp_db = tempfile.mktemp(suffix=".db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{tmp_db}"
+    os.environ["RATE_LIMIT_PER_MINUTE"] = "100000000"
+    os.environ["REPORT_CACHE_BACKEND"] = ""
+
+    # Imported after DATABASE_URL is set so the engine points at the bench database
+    import anyio
+    from fastapi import Response
+    from fastapi.routing import serialize_response
+    from fastapi.testclient import TestClient
+    from app.core.security import create_access_token
+    from app.db.database import Base, SessionLocal, engine
+    from app.db.table_copy import load_models
+    from app.main import app
+    from app.models.magazine import Magazine, MagazineStatus
+    from app.models.product import Product
+    from app.models.transaction import Loan, Sale
+    from app.models.user import User, UserRole, UserStatus, UserType, Client
+    from app.api.api_v1.endpoints import clients, loans, reports, sales
+
+    load_models()
+    Base.metadata.create_all(bind=engine)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    db = SessionLocal()
+    magazine = Magazine(name="Bench", status=MagazineStatus.ACTIVE)
+    db.add(magazine)
+    db.flush()
+    manager = User(name="Bench Manager", phone="+998000000001", password_hash="x", role=UserRole.MANAGER,
+                   status=UserStatus.ACTIVE, user_type=UserType.GADGETS, magazine_id=magazine.id)
+    db.add(manager)
+    db.flush()
+    product = Product(name="Bench Phone", model="B1", price=100, purchase_price=80, sale_price=100,
+                      count=10 ** 9, manager_id=manager.id)
+    db.add(product)
+    db.flush()
+    customers = [Client(name=f"Client {i}", phone=f"+9989{i:08d}", passport_series=f"AB{i:07d}",
+                        manager_id=manager.id) for i in range(args.rows)]
+    db.add_all(customers)
+    db.flush()
+    start = datetime.now() - timedelta(days=365)
+    db.add_all([Sale(product_id=product.id, sale_price=100 + i, seller_id=manager.id, magazine_id=magazine.id,
+                     imei=f"35{i:013d}", sale_date=start + timedelta(hours=i)) for i in range(args.rows)])
+    db.add_all([Loan(product_id=product.id, client_id=customers[i].id, seller_id=manager.id,
+                     magazine_id=magazine.id, loan_price=1200, initial_payment=100, remaining_amount=1100,
+                     loan_months=12, interest_rate=10, monthly_payment=100, loan_start_date=start + timedelta(hours=i),
+                     video_url="/uploads/videos/v.mp4", agreement_images='["/uploads/a/1.jpg", "/uploads/a/2.jpg"]',
+                     imei=f"35{i:013d}") for i in range(args.rows)])
+    db.commit()
+    manager = db.get(User, manager.id)
+
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {create_access_token(manager.id)}"}
+
+    def response_field(router, path):
+        return next(route.response_field for route in router.routes if route.path == path and "GET" in route.methods)
+
+    endpoints = [
+        ("/loans", loans.router, "/", {"limit": args.rows},
+         lambda: loans.get_loans(db=db, current_user=manager, limit=args.rows, offset=0,
+                                 date_from=None, date_to=None, search=None)),
+        ("/loans?view=list", loans.router, "/", {"limit": args.rows, "view": "list"},
+         lambda: loans.get_loans(db=db, current_user=manager, limit=args.rows, offset=0,
+                                 date_from=None, date_to=None, search=None, view="list")),
+        ("/sales", sales.router, "/", {"limit": args.rows},
+         lambda: sales.get_sales(limit=args.rows, offset=0, date_from=None, date_to=None, search=None,
+                                 db=db, current_user=manager)),
+        ("/clients", clients.router, "/", {"limit": min(args.rows, clients.MAX_CLIENTS_PAGE_SIZE)},
+         lambda: clients.get_clients(request=_Request(), response=_Response(),
+                                     limit=min(args.rows, clients.MAX_CLIENTS_PAGE_SIZE), cursor=None, search=None,
+                                     include_images=False, db=db, current_user=manager)),
+        ("/reports/export", reports.router, "/export", {"limit": args.rows},
+         lambda: reports.export_transactions(date_from=None, date_to=None, search=None, transaction_type=None,
+                                             limit=args.rows, db=db, current_user=manager)),
+    ]
+
+    print(f"Database: {engine.dialect.name}, {args.rows} rows, median of {args.repeat} runs (ms)\n")
+    print(f"{'endpoint':<18}{'rows':>6}{'build':>10}{'serialize':>11}{'request':>10}{'bytes':>10}")
+    try:
+        for name, router, route_path, params, build in endpoints:
+            prefix = name.split("?")[0]
+            path = f"/api/v1{prefix}/" if route_path == "/" else f"/api/v1{prefix}"
+            field = response_field(router, route_path)
+            result = build()
+
+            def serialize():
+                if isinstance(result, Response):
+                    # Sparse fieldsets are encoded by the endpoint itself
+                    return result.body
+                return anyio.run(lambda: serialize_response(field=field, response_content=result, dump_json=True))
+
+            body = client.get(path, params=params, headers=headers)
+            body.raise_for_status()
+            build_ms = median_ms(build, args.repeat)
+            serialize_ms = median_ms(serialize, args.repeat)
+            request_ms = median_ms(lambda: client.get(path, params=params, headers=headers), args.repeat)
+            print(f"{name:<18}{len(body.json()):>6}{build_ms:>10.1f}{serialize_ms:>11.1f}{request_ms:>10.1f}"
+                  f"{len(body.content):>10}")
+    finally:
+        db.close()
+        engine.dispose()
+        if os.path.exists(tmp_db):
+            os.remove(tmp_db)
+
+
+class _Request:
+    """Just enough of a request for endpoints that check If-None-Match"""
+    headers = {}
+
+
+class _Response:
+    def __init__(self):
+        self.headers = {}
+
+
+if __name__ == "__main__":
+    main()
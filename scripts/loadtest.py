@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""
+End-to-end HTTP load test with per-route latency budgets.
+
+Boots the API with uvicorn against a seeded local database, points Expo
+push and CBU currency calls at local stub servers, then drives a mobile
+app traffic mix (login, home feed, list pages, loan details, payment
+recording, reports) from concurrent virtual users. Each virtual user logs
+in as a different generated manager, so big and small stores are both
+exercised.
+
+Prints throughput and p50/p95/p99 per route and compares them with the
+committed baseline (scripts/loadtest_baseline.json). Exits with status 1
+when a route's p95 or error rate, or the overall throughput, regresses
+beyond --tolerance.
+
+Run from the backend folder:
+
+    python -m scripts.loadtest                         # builds .loadtest/bench_small_42.db on first run
+    python -m scripts.loadtest --users 50 --duration 60
+    python -m scripts.loadtest --update-baseline       # accept the current numbers
+
+The dataset comes from scripts.generate_dataset (small scale unless
+--scale is given); pass --database-url to test an existing seeded
+database instead. Baselines are machine-specific: record them on the
+machine that runs the comparison.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+from scripts.generate_dataset import GENERATED_PASSWORD, manager_phone
+
+DATA_DIR = ".loadtest"
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "loadtest_baseline.json")
+API = "/api/v1"
+# Routes with fewer samples than this are reported but not held to a budget
+MIN_SAMPLES = 20
+
+# (route label, weight): roughly what the mobile app requests in a session
+TRAFFIC_MIX = [
+    ("GET /loans/active-payments", 30),
+    ("GET /loans/", 8),
+    ("GET /clients", 8),
+    ("GET /products/", 8),
+    ("GET /sales/", 5),
+    ("GET /loans/{id}", 6),
+    ("GET /loans/{id}/payments", 8),
+    ("POST /loans/{id}/payments/{id}/record", 5),
+    ("GET /reports/summary", 6),
+    ("GET /reports/revenue", 4),
+    ("GET /notifications/my-notifications", 6),
+    ("GET /currency/rates", 2),
+    ("POST /auth/login-json", 2),
+]
+
+
+# ---------------------------------------------------------------------------
+# External service stubs
+# ---------------------------------------------------------------------------
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """Answers like Expo push (POST) and the CBU rates archive (GET)."""
+
+    def _reply(self, payload) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self._reply({"data": {"status": "ok", "id": "stub-ticket"}})
+
+    def do_GET(self):
+        code = self.path.rstrip("/").rsplit("/", 1)[-1].upper()
+        rate = {"USD": "12650.00", "EUR": "13710.50", "RUB": "139.80"}.get(code, "1.00")
+        self._reply([{"Ccy": code, "Rate": rate, "Diff": "0.5", "Date": datetime.now().strftime("%d.%m.%Y")}])
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub_server() -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ---------------------------------------------------------------------------
+# Server under test
+# ---------------------------------------------------------------------------
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def prepare_database(args) -> str:
+    if args.database_url:
+        return args.database_url
+    os.makedirs(DATA_DIR, exist_ok=True)
+    path = os.path.join(DATA_DIR, f"bench_{args.scale}_{args.seed}.db")
+    if not os.path.exists(path):
+        print(f"Generating {args.scale} dataset into {path} (first run only)...")
+        subprocess.run(
+            [sys.executable, "-m", "scripts.generate_dataset", "--database-url", f"sqlite:///./{path}",
+             "--scale", args.scale, "--seed", str(args.seed)],
+            check=True,
+        )
+    # Each run writes (payments, logins) to a fresh copy so runs start from the same data
+    run_path = os.path.join(DATA_DIR, "run.db")
+    shutil.copyfile(path, run_path)
+    return f"sqlite:///./{run_path}"
+
+
+def start_api(database_url: str, stub_url: str, workers: int):
+    port = _free_port()
+    env = dict(
+        os.environ,
+        DATABASE_URL=database_url,
+        EXPO_PUSH_URL=f"{stub_url}/--/api/v2/push/send",
+        CBU_RATES_URL=f"{stub_url}/json/",
+        # All virtual users share one IP; keep the limiter in the path but out of the way
+        RATE_LIMIT_PER_MINUTE="100000000",
+    )
+    env.setdefault("SECRET_KEY", "loadtest-secret-key")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("API server exited during startup")
+        try:
+            if httpx.get(f"{base_url}{API}/health/live", timeout=1).status_code == 200:
+                return process, base_url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("API server did not become ready within 60s")
+
+
+# ---------------------------------------------------------------------------
+# Virtual users
+# ---------------------------------------------------------------------------
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}
+        self.errors = {}
+        self.recording = False
+
+    def add(self, route: str, seconds: float, ok: bool) -> None:
+        if not self.recording:
+            return
+        self.samples.setdefault(route, []).append(seconds)
+        if not ok:
+            self.errors[route] = self.errors.get(route, 0) + 1
+
+
+class VirtualUser:
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder, phones: list, rng: random.Random):
+        self.client = client
+        self.recorder = recorder
+        self.phones = phones
+        self.phone = phones[0]
+        self.rng = rng
+        self.headers = {}
+        self.loan_ids = []
+
+    async def request(self, route: str, method: str, url: str, **kwargs) -> httpx.Response:
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, f"{API}{url}", headers=self.headers, **kwargs)
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            response, ok = None, False
+        self.recorder.add(route, time.perf_counter() - started, ok)
+        return response
+
+    async def login(self) -> bool:
+        response = await self.request(
+            "POST /auth/login-json", "POST", "/auth/login-json",
+            json={"phone": self.phone, "password": GENERATED_PASSWORD},
+        )
+        if response is None or response.status_code != 200:
+            return False
+        self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        return True
+
+    async def home_feed(self) -> None:
+        response = await self.request("GET /loans/active-payments", "GET", "/loans/active-payments")
+        if response is not None and response.status_code == 200:
+            self.loan_ids = [item["loan_id"] for item in response.json()[:50]]
+
+    async def record_payment(self) -> None:
+        if not self.loan_ids:
+            return
+        loan_id = self.rng.choice(self.loan_ids)
+        try:
+            response = await self.client.get(f"{API}/loans/{loan_id}/payments", headers=self.headers)
+        except httpx.HTTPError:
+            return
+        if response.status_code != 200:
+            return
+        pending = [p for p in response.json() if p["status"] != "paid"]
+        if not pending:
+            self.loan_ids.remove(loan_id)
+            return
+        payment = pending[0]
+        await self.request(
+            "POST /loans/{id}/payments/{id}/record", "POST",
+            f"/loans/{loan_id}/payments/{payment['id']}/record",
+            json={"amount": payment["amount"], "payment_date": datetime.now().isoformat()},
+        )
+
+    async def step(self, route: str) -> None:
+        loan_id = self.rng.choice(self.loan_ids) if self.loan_ids else None
+        if route == "GET /loans/active-payments":
+            await self.home_feed()
+        elif route == "POST /auth/login-json":
+            await self.login()
+        elif route == "POST /loans/{id}/payments/{id}/record":
+            await self.record_payment()
+        elif route == "GET /loans/{id}":
+            if loan_id:
+                await self.request(route, "GET", f"/loans/{loan_id}")
+        elif route == "GET /loans/{id}/payments":
+            if loan_id:
+                await self.request(route, "GET", f"/loans/{loan_id}/payments")
+        elif route == "GET /clients":
+            await self.request(route, "GET", "/clients", params={"limit": 50})
+        else:
+            method, path = route.split(" ", 1)
+            await self.request(route, method, path)
+
+    async def start(self) -> bool:
+        # Some generated managers are pending approval; take the first that can log in
+        for phone in self.phones:
+            self.phone = phone
+            if await self.login():
+                await self.home_feed()
+                return True
+        return False
+
+    async def run(self, stop_at: float, think_seconds: float) -> None:
+        routes, weights = zip(*TRAFFIC_MIX)
+        while time.monotonic() < stop_at:
+            await self.step(self.rng.choices(routes, weights=weights)[0])
+            if think_seconds:
+                await asyncio.sleep(self.rng.uniform(0, 2 * think_seconds))
+
+
+async def drive(base_url: str, args) -> tuple:
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    async with httpx.AsyncClient(base_url=base_url, timeout=30, limits=limits) as client:
+        users = [
+            VirtualUser(
+                client, recorder, [manager_phone(i + k * args.users) for k in range(10)],
+                random.Random(args.seed + i),
+            )
+            for i in range(args.users)
+        ]
+        # Initial logins are not measured: they would all land in the first seconds
+        logged_in = await asyncio.gather(*(u.start() for u in users))
+        users = [u for u, ok in zip(users, logged_in) if ok]
+        if not users:
+            raise RuntimeError("No virtual user could log in; is the database seeded by generate_dataset?")
+        stop_at = time.monotonic() + args.warmup + args.duration
+        tasks = [asyncio.create_task(u.run(stop_at, args.think_ms / 1000)) for u in users]
+        await asyncio.sleep(args.warmup)
+        recorder.recording = True
+        measured_from = time.monotonic()
+        await asyncio.gather(*tasks)
+        elapsed = time.monotonic() - measured_from
+    return recorder, elapsed
+
+
+# ---------------------------------------------------------------------------
+# Reporting and baselines
+# ---------------------------------------------------------------------------
+
+def _percentile(values, pct: float) -> float:
+    """Nearest-rank percentile of sorted ``values``."""
+    index = max(0, min(len(values) - 1, int(round(pct / 100 * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+def summarize(recorder: Recorder, elapsed: float) -> dict:
+    routes = {}
+    for route, samples in sorted(recorder.samples.items()):
+        samples.sort()
+        routes[route] = {
+            "count": len(samples),
+            "rps": round(len(samples) / elapsed, 2),
+            "p50_ms": round(_percentile(samples, 50) * 1000, 1),
+            "p95_ms": round(_percentile(samples, 95) * 1000, 1),
+            "p99_ms": round(_percentile(samples, 99) * 1000, 1),
+            "error_rate": round(recorder.errors.get(route, 0) / len(samples), 4),
+        }
+    total = sum(r["count"] for r in routes.values())
+    return {"throughput_rps": round(total / elapsed, 1), "requests": total, "routes": routes}
+
+
+def print_report(result: dict) -> None:
+    print(f"\n{'route':<42}{'count':>7}{'rps':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}")
+    for route, r in result["routes"].items():
+        print(f"{route:<42}{r['count']:>7}{r['rps']:>8.1f}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}"
+              f"{r['p99_ms']:>9.1f}{r['error_rate']:>8.1%}")
+    print(f"\nTotal: {result['requests']} requests, {result['throughput_rps']} req/s")
+
+
+def compare(result: dict, baseline: dict, tolerance: float, slack_ms: float) -> list:
+    """Regressions against ``baseline`` as human-readable strings."""
+    problems = []
+    if result["throughput_rps"] < baseline["throughput_rps"] * (1 - tolerance):
+        problems.append(f"throughput {result['throughput_rps']} req/s < baseline {baseline['throughput_rps']}")
+    for route, base in baseline["routes"].items():
+        current = result["routes"].get(route)
+        if current is None:
+            problems.append(f"{route}: no requests recorded")
+            continue
+        if min(current["count"], base["count"]) < MIN_SAMPLES:
+            continue
+        budget = base["p95_ms"] * (1 + tolerance) + slack_ms
+        if current["p95_ms"] > budget:
+            problems.append(f"{route}: p95 {current['p95_ms']}ms > budget {budget:.1f}ms")
+        if current["error_rate"] > base["error_rate"] + 0.01:
+            problems.append(f"{route}: error rate {current['error_rate']:.1%} (baseline {base['error_rate']:.1%})")
+    return problems
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="HTTP load test with latency budgets")
+    parser.add_argument("--database-url", help="seeded database to test; default builds one")
+    parser.add_argument("--scale", default="small", help="generate_dataset scale for the built database")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--users", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="unmeasured seconds before measuring")
+    parser.add_argument("--think-ms", type=float, default=0, help="mean pause between a user's requests")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression")
+    parser.add_argument("--slack-ms", type=float, default=5, help="absolute p95 slack for very fast routes")
+    parser.add_argument("--update-baseline", action="store_true")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    database_url = prepare_database(args)
+    stubs = start_stub_server()
+    stub_url = f"http://127.0.0.1:{stubs.server_address[1]}"
+    process, base_url = start_api(database_url, stub_url, args.workers)
+    print(f"API at {base_url}, {args.users} users, {args.warmup:.0f}s warmup + {args.duration:.0f}s measured")
+    try:
+        recorder, elapsed = asyncio.run(drive(base_url, args))
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+        stubs.shutdown()
+
+    result = summarize(recorder, elapsed)
+    print_report(result)
+
+    config = {k: getattr(args, k) for k in ("scale", "seed", "users", "duration", "think_ms", "workers")}
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({"config": config, **result}, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print("No baseline to compare against; run with --update-baseline to record one")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("config") != config:
+        print(f"⚠️  Baseline was recorded with {baseline.get('config')}, this run used {config}")
+    problems = compare(result, baseline, args.tolerance, args.slack_ms)
+    if problems:
+        print("\n❌ Regressions against baseline:")
+        for problem in problems:
+            print(f"   • {problem}")
+        sys.exit(1)
+    print(f"\n✅ Within {args.tolerance:.0%} of baseline")
+
+
+if __name__ == "__main__":
+    main()
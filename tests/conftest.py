@@ -0,0 +1,110 @@
+"""
+Shared pytest fixtures: a throwaway SQLite database, a TestClient for the
+app, auth headers, the SQL query counter and a seeded shop.
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+# Configure the app before it is imported
+_db_fd, _db_path = tempfile.mkstemp(suffix=".db")
+os.close(_db_fd)
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_path}"
+os.environ.setdefault("RATE_LIMIT_PER_MINUTE", "1000000")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.security import create_access_token
+from app.db.database import Base, SessionLocal, engine
+from app.db.query_counter import count_queries
+from app.db.table_copy import load_models
+from app.main import app
+from app.models.magazine import Magazine, MagazineStatus
+from app.models.product import Product
+from app.models.transaction import Loan, LoanPayment, PaymentStatus
+from app.models.user import Client, User, UserRole, UserStatus, UserType
+from app.services import report_cache
+
+load_models()
+Base.metadata.create_all(bind=engine)
+
+
+def clear_database() -> None:
+    """Delete every row (SQLite does not enforce the FKs, so order is irrelevant)."""
+    with engine.begin() as conn:
+        for table in Base.metadata.tables.values():
+            conn.execute(table.delete())
+    if report_cache.get_backend() is not None:
+        report_cache.get_backend().clear()
+
+
+@pytest.fixture
+def db():
+    """A session on an empty database for every test."""
+    clear_database()
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+@pytest.fixture
+def auth_headers():
+    def headers(user_id: int) -> dict:
+        return {"Authorization": f"Bearer {create_access_token(user_id)}"}
+    return headers
+
+
+@pytest.fixture
+def query_counter():
+    """``with query_counter() as stats:`` counts every statement run in the block."""
+    return count_queries
+
+
+@pytest.fixture
+def shop(db):
+    """One gadgets shop: its manager, a product (5 in stock), a client and a
+    1200 loan with two pending payments of 600 due in 30 and 60 days.
+
+    Attributes: magazine, manager, product, customer, loan, payments.
+    Tests needing other dates or extra rows change them and commit.
+    """
+    magazine = Magazine(name="Shop", status=MagazineStatus.ACTIVE)
+    db.add(magazine)
+    db.flush()
+    manager = User(name="Manager", phone="+998000000001", password_hash="x", role=UserRole.MANAGER,
+                   status=UserStatus.ACTIVE, user_type=UserType.GADGETS, magazine_id=magazine.id)
+    db.add(manager)
+    db.flush()
+    product = Product(name="Phone", model="X", price=100, purchase_price=80, sale_price=100,
+                      count=5, manager_id=manager.id)
+    customer = Client(name="Client", phone="+998901112233", passport_series="AA1234567", manager_id=manager.id)
+    db.add_all([product, customer])
+    db.flush()
+    loan = Loan(loan_price=1200, initial_payment=0, remaining_amount=1200, loan_months=2, interest_rate=0,
+                monthly_payment=600, loan_start_date=datetime.now(), product_id=product.id,
+                client_id=customer.id, seller_id=manager.id, magazine_id=magazine.id)
+    db.add(loan)
+    db.flush()
+    payments = [LoanPayment(amount=600, due_date=datetime.now() + timedelta(days=30 * (i + 1)), loan_id=loan.id,
+                            status=PaymentStatus.PENDING) for i in range(2)]
+    db.add_all(payments)
+    db.commit()
+    return SimpleNamespace(magazine=magazine, manager=manager, product=product, customer=customer,
+                           loan=loan, payments=payments)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    engine.dispose()
+    if os.path.exists(_db_path):
+        os.remove(_db_path)
@@ -0,0 +1,68 @@
+"""Logical backups: an incremental chain restores updates and deletes consistently."""
+import json
+import os
+
+import pytest
+from sqlalchemy import MetaData, select
+
+from app.db import backup
+from app.db.database import engine
+from app.db.table_copy import make_engine
+from app.models.notification import Notification, NotificationStatus, NotificationType
+from app.models.transaction import Loan, Transaction
+from app.models.user import Client
+
+
+def _snapshot(url: str) -> dict:
+    """Every row of the tables the app writes here, keyed by table."""
+    source = make_engine(url)
+    metadata = MetaData()
+    names = ["clients", "loans", "sales", "transactions", "notifications"]
+    metadata.reflect(bind=source, only=names)
+    with source.connect() as conn:
+        rows = {name: sorted(tuple(row) for row in conn.execute(select(metadata.tables[name])))
+                for name in names}
+    source.dispose()
+    return rows
+
+
+def test_incremental_chain_restores_updates_and_deletes(db, client, auth_headers, shop, tmp_path):
+    headers = auth_headers(shop.manager.id)
+    sale_id = client.post("/api/v1/sales/", headers=headers,
+                          json={"product_id": shop.product.id, "sale_price": 100}).json()["id"]
+    db.add(Notification(type=NotificationType.loan_approved, title="Hi", body="Approved",
+                        recipient_user_id=shop.manager.id))
+    db.commit()
+    root = str(tmp_path / "backups")
+    backup.create_backup(str(engine.url), root, fmt="logical")
+
+    # Updates, a delete that also removes the sale's ledger row, and an insert
+    db.get(Loan, shop.loan.id).remaining_amount = 600
+    db.query(Notification).one().status = NotificationStatus.sent
+    db.add(Client(name="New", phone="+998900000000", passport_series="BB7654321", manager_id=shop.manager.id))
+    db.commit()
+    assert client.delete(f"/api/v1/sales/{sale_id}", headers=headers).status_code == 200
+    assert db.query(Transaction).filter(Transaction.sale_id == sale_id).count() == 0
+    increment = backup.create_backup(str(engine.url), root, incremental=True)
+
+    restored = f"sqlite:///{tmp_path / 'restored.db'}"
+    backup.restore_backup(increment, restored)
+    assert _snapshot(restored) == _snapshot(str(engine.url))
+
+
+def test_increment_without_change_tracking_is_refused(db, shop, tmp_path):
+    root = str(tmp_path / "backups")
+    backup.create_backup(str(engine.url), root, fmt="logical")
+    increment = backup.create_backup(str(engine.url), root, incremental=True)
+
+    # What older increments looked like: new rows of a few tables, no id lists
+    manifest = backup.read_manifest(increment)
+    manifest["tables"] = {"transactions": {key: value for key, value in manifest["tables"]["transactions"].items()
+                                           if key not in ("ids", "live_rows")}}
+    with open(os.path.join(increment, backup.MANIFEST), "w") as f:
+        json.dump(manifest, f)
+
+    target = tmp_path / "restored.db"
+    with pytest.raises(RuntimeError, match="cannot be restored consistently"):
+        backup.restore_backup(increment, f"sqlite:///{target}")
+    assert not target.exists()
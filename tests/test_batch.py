@@ -0,0 +1,65 @@
+"""Batch API: ordered sub-operations on one session and one commit."""
+from app.api.api_v1.endpoints import clients
+from app.models.product import Product
+from app.models.transaction import LoanPayment, PaymentStatus
+from app.models.user import Client
+
+
+def _operations(shop):
+    return [
+        {"id": "a", "op": "mark_paid", "loan_id": shop.loan.id, "payment_id": shop.payments[0].id,
+         "data": {"amount": 600}},
+        {"id": "b", "op": "create_sale", "data": {"product_id": shop.product.id, "sale_price": 100}},
+        {"id": "c", "op": "mark_paid", "loan_id": shop.loan.id, "payment_id": 999999, "data": {"amount": 600}},
+        {"id": "d", "op": "create_client", "data": {"name": "New", "phone": "+998900000000",
+                                                   "passport_series": "BB7654321"}},
+    ]
+
+
+def test_failed_operation_does_not_stop_the_rest(db, client, auth_headers, shop):
+    body = client.post("/api/v1/batch/", headers=auth_headers(shop.manager.id),
+                       json={"operations": _operations(shop)}).json()
+    assert body["committed"] is True
+    assert [(r["id"], r["status"]) for r in body["results"]] == [("a", 200), ("b", 200), ("c", 404), ("d", 200)]
+
+    db.expire_all()
+    assert db.get(LoanPayment, shop.payments[0].id).status == PaymentStatus.PAID
+    assert db.get(Product, shop.product.id).count == 4
+    assert db.query(Client).count() == 2
+
+
+def test_atomic_batch_saves_nothing_on_failure(db, client, auth_headers, shop):
+    body = client.post("/api/v1/batch/", headers=auth_headers(shop.manager.id),
+                       json={"operations": _operations(shop), "atomic": True}).json()
+    assert body["committed"] is False
+    assert [r["status"] for r in body["results"]] == [200, 200, 404, 424]
+
+    db.expire_all()
+    assert db.get(LoanPayment, shop.payments[0].id).status == PaymentStatus.PENDING
+    assert db.get(Product, shop.product.id).count == 5
+    assert db.query(Client).count() == 1
+
+
+def test_invalid_payload_is_a_per_item_error(client, auth_headers, shop):
+    body = client.post("/api/v1/batch/", headers=auth_headers(shop.manager.id), json={"operations": [
+        {"op": "record_payment", "loan_id": shop.loan.id, "payment_id": shop.payments[1].id, "data": {}},
+    ]}).json()
+    assert body["results"][0]["status"] == 422
+
+
+def test_unexpected_error_fails_only_its_operation(db, client, auth_headers, shop, monkeypatch):
+    def broken_create_client(**kwargs):
+        kwargs["db"].add(Client(name="Half", phone="+998900000001", passport_series="CC1111111",
+                                manager_id=shop.manager.id))
+        kwargs["db"].flush()
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(clients, "create_client", broken_create_client)
+    body = client.post("/api/v1/batch/", headers=auth_headers(shop.manager.id),
+                       json={"operations": _operations(shop)}).json()
+    assert body["committed"] is True
+    assert [(r["id"], r["status"]) for r in body["results"]] == [("a", 200), ("b", 200), ("c", 404), ("d", 500)]
+
+    db.expire_all()
+    assert db.get(Product, shop.product.id).count == 4
+    assert db.query(Client).count() == 1
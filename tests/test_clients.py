@@ -0,0 +1,57 @@
+"""Client list: cursor paging, search and the compact projection."""
+import json
+
+import pytest
+
+from app.models.user import Client
+
+
+@pytest.fixture
+def customers(db, shop):
+    """25 more clients of the shop, the last five named Karimov; the shop's own client has passport images."""
+    shop.customer.passport_image_urls = json.dumps(["/uploads/p1.jpg"])
+    db.add_all([Client(name="Karimov" if i >= 20 else f"Client {i}", phone=f"+99890{i:07d}",
+                       passport_series=f"AB{i:07d}", manager_id=shop.manager.id) for i in range(25)])
+    db.commit()
+    return [row.id for row in db.query(Client.id).order_by(Client.id.desc())]
+
+
+def test_cursor_pages_through_every_client(client, auth_headers, shop, customers):
+    headers = auth_headers(shop.manager.id)
+    seen, cursor, pages = [], None, 0
+    while True:
+        params = {"limit": 10} if cursor is None else {"limit": 10, "cursor": cursor}
+        response = client.get("/api/v1/clients/", headers=headers, params=params)
+        seen += [row["id"] for row in response.json()]
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert seen == customers
+    assert pages == 3
+
+
+def test_unpaged_request_returns_the_full_list_with_images(client, auth_headers, shop, customers):
+    response = client.get("/api/v1/clients/", headers=auth_headers(shop.manager.id))
+    rows = response.json()
+    assert [row["id"] for row in rows] == customers
+    assert "X-Next-Cursor" not in response.headers
+    assert rows[-1]["passport_image_urls"] == ["/uploads/p1.jpg"]
+
+
+def test_paged_list_is_compact_unless_images_are_asked_for(client, auth_headers, shop, customers):
+    headers = auth_headers(shop.manager.id)
+    compact = client.get("/api/v1/clients/", headers=headers, params={"limit": 100}).json()
+    assert compact[-1]["passport_image_urls"] is None
+    full = client.get("/api/v1/clients/", headers=headers, params={"limit": 100, "include_images": True}).json()
+    assert full[-1]["passport_image_urls"] == ["/uploads/p1.jpg"]
+
+
+def test_search_filters_before_paging(client, auth_headers, shop, customers):
+    headers = auth_headers(shop.manager.id)
+    first = client.get("/api/v1/clients/", headers=headers, params={"search": "karim", "limit": 3})
+    assert [row["name"] for row in first.json()] == ["Karimov"] * 3
+    rest = client.get("/api/v1/clients/", headers=headers,
+                      params={"search": "karim", "limit": 3, "cursor": first.headers["X-Next-Cursor"]})
+    assert len(rest.json()) == 2
+    assert "X-Next-Cursor" not in rest.headers
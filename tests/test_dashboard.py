@@ -0,0 +1,54 @@
+"""Composite home-screen endpoint."""
+import pytest
+
+from app.api.api_v1.endpoints import currency
+
+
+@pytest.fixture
+def manager(shop, monkeypatch):
+    # No outside HTTP call: serve the currency section from its cache
+    monkeypatch.setitem(currency._cache, "payload", currency.CurrencyRates(
+        rates=[currency.CurrencyRate(code="USD", rate=12650.0, diff=0.0, date="19.10.2026")],
+        fetched_at="2026-10-19T00:00:00+00:00",
+    ))
+    monkeypatch.setitem(currency._cache, "at", currency._now_ts())
+    return shop.manager
+
+
+def test_dashboard_returns_every_section_in_one_request(client, auth_headers, manager, query_counter):
+    with query_counter() as cold:
+        body = client.get("/api/v1/dashboard/", headers=auth_headers(manager.id)).json()
+    assert body["errors"] == {}
+    assert body["me"]["id"] == manager.id
+    assert body["me"]["magazine_name"] == "Shop"
+    assert [p["client_name"] for p in body["active_payments"]] == ["Client"]
+    assert body["has_products"] == {"has_products": True, "count": 1}
+    assert body["summary"]["loans_count"] == 1
+    assert body["currency"]["rates"][0]["code"] == "USD"
+
+    # Warm: report sections and active payments come from the cache
+    with query_counter() as warm:
+        again = client.get("/api/v1/dashboard/", headers=auth_headers(manager.id)).json()
+    assert again["active_payments"] == body["active_payments"]
+    assert warm.count < cold.count
+
+
+def test_sections_subset_and_unknown_section(client, auth_headers, manager):
+    body = client.get("/api/v1/dashboard/?sections=me,has_products", headers=auth_headers(manager.id)).json()
+    assert body["me"] is not None and body["has_products"] is not None
+    assert body["summary"] is None and body["currency"] is None
+    assert client.get("/api/v1/dashboard/?sections=weather", headers=auth_headers(manager.id)).status_code == 400
+
+
+def test_client_and_product_edits_refresh_cached_active_payments(client, auth_headers, shop, manager):
+    headers = auth_headers(manager.id)
+    assert client.get("/api/v1/dashboard/?sections=active_payments", headers=headers).json()["active_payments"]
+
+    assert client.put(f"/api/v1/clients/{shop.customer.id}", headers=headers, json={
+        "name": "Renamed", "phone": "+998901112233", "passport_series": "AA1234567",
+    }).status_code == 200
+    assert client.put(f"/api/v1/products/{shop.product.id}", headers=headers,
+                      json={"name": "Tablet"}).status_code == 200
+
+    payment = client.get("/api/v1/dashboard/?sections=active_payments", headers=headers).json()["active_payments"][0]
+    assert (payment["client_name"], payment["product_name"]) == ("Renamed", "Tablet")
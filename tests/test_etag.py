@@ -0,0 +1,48 @@
+"""Conditional GET: ETags from cheap validators and 304 before the real query."""
+from app.models.transaction import LoanPayment
+from app.models.user import User, UserRole, UserStatus, UserType
+
+
+def test_products_304_until_a_product_changes(db, client, auth_headers, query_counter, shop):
+    headers = auth_headers(shop.manager.id)
+
+    first = client.get("/api/v1/products/", headers=headers)
+    etag = first.headers["ETag"]
+    with query_counter() as stats:
+        cached = client.get("/api/v1/products/", headers={**headers, "If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    # Auth lookup plus the validator, no product query
+    assert not any("FROM products " in sql and "count(" not in sql for sql in stats.statements)
+
+    # Different page, different representation
+    assert client.get("/api/v1/products/?limit=1", headers={**headers, "If-None-Match": etag}).status_code == 200
+
+    shop.product.count = 4
+    db.commit()
+    changed = client.get("/api/v1/products/", headers={**headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert changed.json()[0]["count"] == 4
+
+
+def test_loan_detail_and_payments_follow_payment_changes(db, client, auth_headers, shop):
+    headers = auth_headers(shop.manager.id)
+    loan_id = shop.loan.id
+    for url in (f"/api/v1/loans/{loan_id}", f"/api/v1/loans/{loan_id}/payments"):
+        etag = client.get(url, headers=headers).headers["ETag"]
+        assert client.get(url, headers={**headers, "If-None-Match": etag}).status_code == 304
+
+        payment = db.query(LoanPayment).filter(LoanPayment.loan_id == loan_id).first()
+        payment.notes = f"called {url}"
+        db.commit()
+        assert client.get(url, headers={**headers, "If-None-Match": etag}).status_code == 200
+
+
+def test_no_304_for_loans_outside_the_users_scope(db, client, auth_headers, shop):
+    outsider = User(name="Other", phone="+998000000009", password_hash="x", role=UserRole.MANAGER,
+                    status=UserStatus.ACTIVE, user_type=UserType.GADGETS)
+    db.add(outsider)
+    db.commit()
+    response = client.get(f"/api/v1/loans/{shop.loan.id}", headers={**auth_headers(outsider.id), "If-None-Match": "*"})
+    assert response.status_code == 403
@@ -0,0 +1,70 @@
+"""Sparse fieldsets (?fields= / ?view=) on the loan lists."""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.auto_product import AutoProduct
+from app.models.auto_transaction import AutoLoan
+from app.models.user import User, UserRole, UserStatus, UserType
+
+
+@pytest.fixture
+def ids(db, shop):
+    """The shop with one overdue payment, plus an auto dealer with one car loan to the same client"""
+    shop.loan.loan_start_date = datetime.now() - timedelta(days=40)
+    shop.loan.agreement_images = '["/uploads/a.jpg"]'
+    shop.loan.video_url = "/uploads/v.mp4"
+    shop.payments[0].due_date = datetime.now() - timedelta(days=10)
+    dealer = User(name="Dealer", phone="+998000000002", password_hash="x", role=UserRole.MANAGER,
+                  status=UserStatus.ACTIVE, user_type=UserType.AUTO)
+    db.add(dealer)
+    db.flush()
+    car = AutoProduct(car_name="Cobalt", model="LTZ", color="White", year=2024, purchase_price=10000,
+                      sale_price=12000, count=1, manager_id=dealer.id)
+    db.add(car)
+    db.flush()
+    db.add(AutoLoan(loan_price=12000, initial_payment=2000, remaining_amount=10000, loan_months=10,
+                    yearly_interest_rate=0, monthly_payment=1000, loan_start_date=datetime.now(),
+                    auto_product_id=car.id, client_id=shop.customer.id, seller_id=dealer.id))
+    db.commit()
+    return {"manager": shop.manager.id, "dealer": dealer.id}
+
+
+def test_list_view_returns_only_its_fields(client, auth_headers, ids, query_counter):
+    with query_counter() as stats:
+        rows = client.get("/api/v1/loans/?view=list", headers=auth_headers(ids["manager"])).json()
+    assert list(rows[0]) == ["id", "remaining_amount", "monthly_payment", "loan_start_date", "is_completed",
+                             "product_name", "client_name", "overdue_amount"]
+    assert rows[0]["overdue_amount"] == 600
+    loan_query = next(sql for sql in stats.statements if "FROM loans" in sql and "loan_payments" not in sql)
+    assert "video_url" not in loan_query and "users" not in loan_query.split("WHERE")[0]
+
+
+def test_fields_select_columns_and_skip_joins(client, auth_headers, ids, query_counter):
+    with query_counter() as stats:
+        rows = client.get("/api/v1/loans/?fields=id,monthly_payment,agreement_images",
+                          headers=auth_headers(ids["manager"])).json()
+    assert rows == [{"id": rows[0]["id"], "monthly_payment": 600.0, "agreement_images": ["/uploads/a.jpg"]}]
+    # No overdue amount requested: no payment query, no joined tables
+    assert not any("loan_payments" in sql for sql in stats.statements)
+    assert not any("JOIN" in sql for sql in stats.statements if "FROM loans" in sql)
+
+
+def test_full_view_is_unchanged(client, auth_headers, ids):
+    full = client.get("/api/v1/loans/?view=full", headers=auth_headers(ids["manager"])).json()
+    assert full == client.get("/api/v1/loans/", headers=auth_headers(ids["manager"])).json()
+    assert full[0]["video_url"] == "/uploads/v.mp4" and full[0]["seller_name"] == "Manager"
+
+
+def test_auto_loan_list_view(client, auth_headers, ids):
+    rows = client.get("/api/v1/auto-loans/?view=list", headers=auth_headers(ids["dealer"])).json()
+    assert rows == [{"id": rows[0]["id"], "remaining_amount": 10000.0, "monthly_payment": 1000.0,
+                     "loan_start_date": rows[0]["loan_start_date"], "is_completed": False,
+                     "car_name": "Cobalt", "model": "LTZ", "client_name": "Client"}]
+    full = client.get("/api/v1/auto-loans/", headers=auth_headers(ids["dealer"])).json()
+    assert full[0]["video_url"] is None and full[0]["year"] == 2024
+
+
+@pytest.mark.parametrize("query", ["fields=id,secret", "view=compact", "fields=id&view=list", "fields=,"])
+def test_invalid_projection_is_rejected(client, auth_headers, ids, query):
+    assert client.get(f"/api/v1/loans/?{query}", headers=auth_headers(ids["manager"])).status_code == 400
@@ -0,0 +1,24 @@
+"""List pages built from column rows match the ORM-built representation."""
+from datetime import datetime
+
+from fastapi.encoders import jsonable_encoder
+
+from app.api.api_v1.endpoints.loans import loan_to_response
+from app.api.api_v1.endpoints.sales import sale_to_response
+from app.models.transaction import Sale
+
+
+def test_loan_and_sale_rows_match_orm_representation(db, client, auth_headers, shop):
+    manager, loan = shop.manager, shop.loan
+    loan.loan_start_date = datetime(2026, 1, 5, 10, 30)
+    loan.agreement_images = '["/uploads/a.jpg"]'
+    loan.imei = "351234567890123"
+    sale = Sale(product_id=shop.product.id, sale_price=100, seller_id=manager.id, magazine_id=shop.magazine.id)
+    db.add(sale)
+    db.commit()
+
+    loans = client.get("/api/v1/loans/", headers=auth_headers(manager.id)).json()
+    assert loans == [jsonable_encoder(loan_to_response(loan, 0.0))]
+    assert loans[0]["agreement_images"] == ["/uploads/a.jpg"]
+    sales = client.get("/api/v1/sales/", headers=auth_headers(manager.id)).json()
+    assert sales == [jsonable_encoder(sale_to_response(sale))]
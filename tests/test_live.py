@@ -0,0 +1,72 @@
+"""Live events over WebSocket."""
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+from app.core.config import settings
+from app.core.security import create_access_token
+from app.models.notification import Notification, NotificationType
+from app.models.user import User, UserRole, UserStatus, UserType
+
+
+@pytest.fixture(autouse=True)
+def short_keepalive(monkeypatch):
+    # A missed event shows up as a ping instead of hanging the test
+    monkeypatch.setattr(settings, "LIVE_KEEPALIVE_SECONDS", 2)
+
+
+@pytest.fixture
+def seller(db, shop):
+    """A pending seller of the shop"""
+    user = User(name="Seller", phone="+998000000002", password_hash="x", role=UserRole.SELLER,
+                status=UserStatus.PENDING, user_type=UserType.GADGETS, magazine_id=shop.magazine.id,
+                manager_id=shop.manager.id)
+    db.add(user)
+    db.commit()
+    return user.id
+
+
+def _connect(client, user_id):
+    return client.websocket_connect(f"/api/v1/live/ws?token={create_access_token(user_id)}")
+
+
+def test_sale_is_pushed_to_the_shop(client, auth_headers, shop):
+    manager_id, magazine_id, product_id = shop.manager.id, shop.magazine.id, shop.product.id
+    with _connect(client, manager_id) as websocket:
+        assert websocket.receive_json() == {
+            "type": "ready", "channels": [f"user:{manager_id}", f"magazine:{magazine_id}"]
+        }
+        response = client.post("/api/v1/sales/", headers=auth_headers(manager_id),
+                               json={"product_id": product_id, "sale_price": 100})
+        assert response.status_code == 200
+        event = websocket.receive_json()
+    assert event["type"] == "sale_created"
+    assert event["data"] == {"sale_id": response.json()["id"], "product_id": product_id}
+
+
+def test_approval_and_notification_reach_the_user(db, client, seller):
+    with _connect(client, seller) as websocket:
+        websocket.receive_json()
+        user = db.get(User, seller)
+        user.status = UserStatus.ACTIVE
+        db.commit()
+        assert websocket.receive_json()["type"] == "account_approved"
+
+        notification = Notification(type=NotificationType.loan_approved, title="Hi", body="Approved",
+                                    recipient_user_id=seller)
+        db.add(notification)
+        db.flush()
+        db.rollback()
+        db.add(Notification(type=NotificationType.loan_approved, title="Hi", body="Approved",
+                            recipient_user_id=seller))
+        db.commit()
+        # The rolled back notification was never announced
+        event = websocket.receive_json()
+    assert event["type"] == "notification_created"
+    assert event["data"]["notification_type"] == "loan_approved"
+
+
+def test_invalid_token_is_rejected(client):
+    with pytest.raises(WebSocketDisconnect) as exc:
+        with client.websocket_connect("/api/v1/live/ws?token=nope") as websocket:
+            websocket.receive_json()
+    assert exc.value.code == 1008
@@ -0,0 +1,63 @@
+"""Request instrumentation and the /metrics scrape endpoint."""
+from app.core.config import settings
+import pytest
+
+from app.models.user import User, UserRole, UserStatus
+
+
+@pytest.fixture
+def admin_headers(db, auth_headers):
+    admin = User(name="Admin", phone="+998000000000", password_hash="x",
+                 role=UserRole.ADMIN, status=UserStatus.ACTIVE)
+    db.add(admin)
+    db.commit()
+    return auth_headers(admin.id)
+
+
+def test_requests_are_recorded_by_route_template(client, admin_headers):
+    response = client.get("/api/v1/loans/12345", headers=admin_headers)
+    assert response.headers["X-Request-ID"]
+
+    body = client.get("/metrics", headers=admin_headers).text
+    assert 'http_requests_total{method="GET",route="/api/v1/loans/{loan_id}",status="404"}' in body
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/api/v1/loans/{loan_id}",le="+Inf"}' in body
+    assert 'http_request_db_queries_count{method="GET",route="/api/v1/loans/{loan_id}"}' in body
+    assert "/api/v1/loans/12345" not in body
+    assert "threadpool_size " in body
+    assert "db_pool_checkout_wait_seconds_count " in body
+
+
+def test_route_labels_stay_bounded(client, admin_headers):
+    client.get("/api/v1/files/serve/photos/2024/missing.jpg")
+    client.post("/api/v1/loans/7/payments/7/mark-paid", json={})
+    client.get("/no/such/page/42")
+
+    body = client.get("/metrics", headers=admin_headers).text
+    assert 'route="/api/v1/files/serve/{file_path}"' in body
+    assert 'route="/api/v1/loans/{loan_id}/payments/{payment_id}/mark-paid"' in body
+    assert 'route="unmatched",status="404"' in body
+    assert "missing.jpg" not in body
+    assert "/no/such/page" not in body
+
+
+def test_request_id_is_propagated(client):
+    response = client.get("/api/v1/health/live", headers={"X-Request-ID": "abc123"})
+    assert response.headers["X-Request-ID"] == "abc123"
+
+
+def test_metrics_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "secret")
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer secret"}).status_code == 200
+
+
+def test_metrics_need_an_admin_without_token(db, client, auth_headers, admin_headers):
+    manager = User(name="Manager", phone="+998000000001", password_hash="x",
+                   role=UserRole.MANAGER, status=UserStatus.ACTIVE)
+    db.add(manager)
+    db.commit()
+    assert settings.METRICS_TOKEN == ""
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer "}).status_code == 401
+    assert client.get("/metrics", headers=auth_headers(manager.id)).status_code == 401
+    assert client.get("/metrics", headers=admin_headers).status_code == 200
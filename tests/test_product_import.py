@@ -0,0 +1,102 @@
+"""Bulk product import and stock adjustment."""
+import json
+
+from app.models.product import Product
+from app.models.user import User, UserRole, UserStatus, UserType
+from app.services.search_service import matching_ids
+
+
+def _lines(response):
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_json_import_creates_updates_and_reports_errors(db, client, auth_headers, shop, query_counter):
+    rows = [{"name": "Phone", "model": "X", "purchase_price": 85, "sale_price": 110, "count": 7}]
+    rows += [{"name": f"Case {i}", "model": "M", "price": 10, "count": i} for i in range(200)]
+    rows += [{"name": "Phone", "model": "X", "price": 1}, {"name": "", "model": "Y", "price": 1},
+             {"name": "Cable", "model": "C"}]
+
+    with query_counter() as stats:
+        response = client.post("/api/v1/products/import", headers=auth_headers(shop.manager.id), json={"rows": rows})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    results = _lines(response)
+    assert results[-1] == {"summary": {"updated": 1, "created": 200, "error": 3}}
+    assert [r["row"] for r in results[:-1]] == list(range(1, len(rows) + 1))
+    assert results[201]["error"] == "Duplicate of row 1"
+    # Batched writes: no statement per row
+    assert stats.count < 20
+
+    db.expire_all()
+    phone = db.query(Product).filter(Product.name == "Phone").one()
+    assert (phone.sale_price, phone.purchase_price, phone.count) == (110, 85, 7)
+    assert db.query(Product).filter(Product.manager_id == shop.manager.id).count() == 201
+    found = db.query(Product.name).filter(Product.id.in_(matching_ids("product", "case 42"))).all()
+    assert found == [("Case 42",)]
+
+
+def test_csv_import(db, client, auth_headers, shop):
+    text = "﻿Name,Model,Purchase_Price,Sale_Price,Count\nTablet,T1,200,260,3\nPhone,X,,,\n"
+    response = client.post("/api/v1/products/import/csv", headers=auth_headers(shop.manager.id),
+                           files={"file": ("stock.csv", text.encode("utf-8"), "text/csv")})
+    results = _lines(response)
+    assert [r["status"] for r in results[:-1]] == ["created", "error"]
+    assert db.query(Product).filter(Product.name == "Tablet").one().count == 3
+
+
+def test_sellers_cannot_import(db, client, auth_headers, shop):
+    seller = User(name="Seller", phone="+998000000002", password_hash="x", role=UserRole.SELLER,
+                  status=UserStatus.ACTIVE, user_type=UserType.GADGETS, magazine_id=shop.magazine.id,
+                  manager_id=shop.manager.id)
+    db.add(seller)
+    db.commit()
+    headers = auth_headers(seller.id)
+
+    rows = [{"name": "Phone", "model": "X", "purchase_price": 1, "sale_price": 1, "count": 5}]
+    assert client.post("/api/v1/products/import", headers=headers, json={"rows": rows}).status_code == 403
+    assert client.post("/api/v1/products/import/csv", headers=headers,
+                       files={"file": ("stock.csv", b"name,model,price\nPhone,X,1\n", "text/csv")}).status_code == 403
+    db.expire_all()
+    assert db.get(Product, shop.product.id).sale_price == 100
+    # Stock counts stay open to sellers, as on PUT /products/{id}
+    response = client.post("/api/v1/products/adjust-stock", headers=headers,
+                           json={"items": [{"product_id": shop.product.id, "delta": -1}]})
+    assert [r["status"] for r in _lines(response)[:-1]] == ["updated"]
+
+
+def test_import_refreshes_cached_revenue(client, auth_headers, shop):
+    headers = auth_headers(shop.manager.id)
+    before = client.get("/api/v1/reports/revenue", headers=headers).json()["total_profit"]
+
+    rows = [{"name": "Phone", "model": "X", "purchase_price": 50, "sale_price": 100, "count": 5}]
+    client.post("/api/v1/products/import", headers=headers, json={"rows": rows})
+    assert client.get("/api/v1/reports/revenue", headers=headers).json()["total_profit"] == before + 30
+
+
+def test_adjust_stock_counts_and_deltas(db, client, auth_headers, shop):
+    phone_id = db.query(Product.id).filter(Product.name == "Phone").scalar()
+    response = client.post("/api/v1/products/adjust-stock", headers=auth_headers(shop.manager.id), json={"items": [
+        {"product_id": phone_id, "delta": -2},
+        {"product_id": phone_id, "delta": -10},
+        {"product_id": 999999, "count": 1},
+        {"product_id": phone_id, "count": 1, "delta": 1},
+    ]})
+    assert [r["status"] for r in _lines(response)[:-1]] == ["updated", "error", "error", "error"]
+    db.expire_all()
+    assert db.get(Product, phone_id).count == 3
+
+    client.post("/api/v1/products/adjust-stock", headers=auth_headers(shop.manager.id),
+                json={"items": [{"product_id": phone_id, "count": 12}]})
+    db.expire_all()
+    assert db.get(Product, phone_id).count == 12
+
+
+def test_repeated_deltas_for_one_product_all_apply(db, client, auth_headers, shop, query_counter):
+    items = [{"product_id": shop.product.id, "delta": 3}, {"product_id": shop.product.id, "delta": -1}]
+    with query_counter() as stats:
+        response = client.post("/api/v1/products/adjust-stock", headers=auth_headers(shop.manager.id),
+                               json={"items": items})
+    assert [r["status"] for r in _lines(response)[:-1]] == ["updated", "updated"]
+    # One batched UPDATE, no one-by-one fallback
+    assert sum(sql.startswith("UPDATE products") for sql in stats.statements) == 1
+    db.expire_all()
+    assert db.get(Product, shop.product.id).count == 7
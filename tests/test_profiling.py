@@ -0,0 +1,68 @@
+"""On-demand request profiling and the diagnostics endpoints."""
+import pytest
+
+from app.core import profiling
+from app.core.config import settings
+from app.models.user import User, UserRole, UserStatus
+
+
+@pytest.fixture
+def users(db, shop, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "PROFILE_DIR", str(tmp_path))
+    admin = User(name="Admin", phone="+998000000000", password_hash="x",
+                 role=UserRole.ADMIN, status=UserStatus.ACTIVE)
+    db.add(admin)
+    db.commit()
+    return {"admin": admin.id, "manager": shop.manager.id, "magazine": shop.magazine.id}
+
+
+def test_admin_request_with_profile_header_is_stored(client, auth_headers, users):
+    headers = {**auth_headers(users["admin"]), "X-Profile": "1"}
+    assert client.get("/api/v1/magazines/", headers=headers).status_code == 200
+
+    listed = client.get("/api/v1/diagnostics/profiles", headers=auth_headers(users["admin"])).json()
+    assert len(listed) == 1
+    assert listed[0]["route"] == "/api/v1/magazines/"
+    assert listed[0]["trigger"] == "request"
+
+    data = client.get(f"/api/v1/diagnostics/profiles/{listed[0]['id']}",
+                      headers=auth_headers(users["admin"])).json()
+    assert data["sql"]["count"] >= 1
+    assert data["sql"]["timeline"][0]["statement"]
+
+
+def test_profile_header_from_non_admin_is_ignored(client, auth_headers, users, monkeypatch):
+    started = []
+    monkeypatch.setattr(profiling, "start_profile", lambda *args: started.append(args))
+    client.get("/api/v1/loans/", headers={**auth_headers(users["manager"]), "X-Profile": "1"})
+    client.get("/api/v1/loans/?profile=1")
+    assert started == []
+    assert profiling.list_profiles() == []
+    assert client.get("/api/v1/diagnostics/profiles", headers=auth_headers(users["manager"])).status_code == 403
+
+
+def test_rule_profiles_only_the_targeted_shop(client, auth_headers, users):
+    admin = auth_headers(users["admin"])
+    rule = client.post("/api/v1/diagnostics/profiling/rules", headers=admin, json={
+        "route_prefix": "/api/v1/loans", "magazine_id": users["magazine"], "sample_rate": 1,
+    }).json()
+
+    client.get("/api/v1/loans/", headers=auth_headers(users["manager"]))
+    client.get("/api/v1/magazines/", headers=admin)
+    stored = profiling.list_profiles()
+    assert [p["trigger"] for p in stored] == [f"rule:{rule['id']}"]
+    assert stored[0]["magazine_id"] == users["magazine"]
+
+    assert client.delete(f"/api/v1/diagnostics/profiling/rules/{rule['id']}", headers=admin).status_code == 200
+    assert client.get("/api/v1/diagnostics/profiling/rules", headers=admin).json() == []
+
+
+def test_ring_buffer_keeps_newest(users, monkeypatch):
+    monkeypatch.setattr(settings, "PROFILE_MAX_FILES", 3)
+    ids = []
+    for _ in range(5):
+        profile = profiling.Profile("GET", "/x", "request")
+        ids.append(profile.id)
+        profiling.save_profile(profile.to_dict(200, 0.01, "/x", {}))
+    assert [p["id"] for p in profiling.list_profiles()] == ids[:-4:-1]
+    assert profiling.profile_path("../../etc/passwd") is None
@@ -0,0 +1,95 @@
+"""
+List endpoints must run a fixed number of queries however many rows they
+return: the same request is measured against 10 and 1000 rows and the
+counts have to match. A per-row lazy load shows up as a difference.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import clear_database
+from app.api.api_v1.endpoints import users as users_endpoint
+from app.models.magazine import Magazine, MagazineStatus
+from app.models.product import Product
+from app.models.transaction import Loan, LoanPayment, PaymentStatus, Sale
+from app.models.user import Client, User, UserRole, UserStatus, UserType
+
+SMALL, LARGE = 10, 1000
+
+
+def seed(db, rows: int) -> dict:
+    """One shop with ``rows`` clients, products, sales and loans (each with
+    an overdue, an upcoming and a future payment), plus ``rows`` other shops."""
+    now = datetime.now()
+    admin = User(name="Admin", phone="+998000000000", password_hash="x",
+                 role=UserRole.ADMIN, status=UserStatus.ACTIVE)
+    magazine = Magazine(name="Shop", status=MagazineStatus.ACTIVE)
+    db.add_all([admin, magazine])
+    db.flush()
+    manager = User(name="Manager", phone="+998000000001", password_hash="x", role=UserRole.MANAGER,
+                   status=UserStatus.ACTIVE, user_type=UserType.GADGETS, magazine_id=magazine.id)
+    db.add(manager)
+    db.flush()
+
+    for i in range(rows):
+        other = Magazine(name=f"Other {i}", status=MagazineStatus.PENDING)
+        db.add(other)
+        db.flush()
+        db.add(User(name=f"Owner {i}", phone=f"+99801{i:07d}", password_hash="x", role=UserRole.MANAGER,
+                    status=UserStatus.PENDING, user_type=UserType.GADGETS, magazine_id=other.id))
+
+    # Distinct product, client and seller per row is the worst case for lazy loads
+    for i in range(rows):
+        seller = User(name=f"Seller {i}", phone=f"+99802{i:07d}", password_hash="x", role=UserRole.SELLER,
+                      status=UserStatus.ACTIVE, user_type=UserType.GADGETS,
+                      magazine_id=magazine.id, manager_id=manager.id)
+        product = Product(name=f"Phone {i}", model="X", price=100, purchase_price=80, sale_price=100,
+                          count=5, manager_id=manager.id)
+        client = Client(name=f"Client {i}", phone=f"+99803{i:07d}", passport_series=f"AA{i:07d}",
+                        manager_id=manager.id)
+        db.add_all([seller, product, client])
+        db.flush()
+        db.add(Sale(product_id=product.id, sale_price=100, seller_id=seller.id, magazine_id=magazine.id,
+                    sale_date=now - timedelta(days=1), created_at=now - timedelta(days=1)))
+        loan = Loan(product_id=product.id, client_id=client.id, seller_id=seller.id, magazine_id=magazine.id,
+                    loan_price=300, initial_payment=0, remaining_amount=300, loan_months=3, interest_rate=0,
+                    monthly_payment=100, loan_start_date=now - timedelta(days=40))
+        db.add(loan)
+        db.flush()
+        for due in (now - timedelta(days=10), now + timedelta(days=3), now + timedelta(days=33)):
+            db.add(LoanPayment(loan_id=loan.id, amount=100, due_date=due, status=PaymentStatus.PENDING))
+    db.commit()
+    return {"admin": admin.id, "manager": manager.id}
+
+
+LIST_ENDPOINTS = [
+    ("manager", "/api/v1/loans/?limit={limit}"),
+    ("manager", "/api/v1/loans/active-payments"),
+    ("manager", "/api/v1/loans/payments/overdue"),
+    ("manager", "/api/v1/loans/payments/upcoming?days=7"),
+    ("manager", "/api/v1/sales/?limit={limit}"),
+    ("manager", "/api/v1/reports/export"),
+    ("admin", "/api/v1/users/{manager}/clients?limit={limit}"),
+    ("admin", "/api/v1/magazines/"),
+    ("admin", "/api/v1/magazines/pending"),
+]
+
+
+@pytest.mark.parametrize("who,url", LIST_ENDPOINTS)
+def test_list_endpoint_query_count_is_constant(db, client, auth_headers, query_counter, who, url):
+    counts = {}
+    for rows in (SMALL, LARGE):
+        clear_database()
+        users_endpoint._stats_cache.clear()
+        ids = seed(db, rows)
+
+        path = url.format(limit=rows, manager=ids["manager"])
+        with query_counter() as stats:
+            response = client.get(path, headers=auth_headers(ids[who]))
+        assert response.status_code == 200, response.text
+        assert len(response.json()) >= rows, f"{path} returned {len(response.json())} rows"
+        counts[rows] = stats.count
+
+    assert counts[SMALL] == counts[LARGE], (
+        f"{url}: {counts[SMALL]} queries for {SMALL} rows, {counts[LARGE]} for {LARGE}"
+    )
@@ -0,0 +1,103 @@
+"""Tenant-scoped report cache and its write-driven invalidation."""
+import time
+
+from app.models.auto_product import AutoProduct
+from app.models.auto_transaction import AutoSale
+from app.models.magazine import Magazine, MagazineStatus
+from app.models.product import Product
+from app.models.transaction import Sale
+from app.models.user import User, UserRole, UserStatus, UserType
+from app.services import report_cache
+
+
+def _shop(db, n: int):
+    magazine = Magazine(name=f"Shop {n}", status=MagazineStatus.ACTIVE)
+    db.add(magazine)
+    db.flush()
+    manager = User(name=f"Manager {n}", phone=f"+99800000000{n}", password_hash="x", role=UserRole.MANAGER,
+                   status=UserStatus.ACTIVE, user_type=UserType.GADGETS, magazine_id=magazine.id)
+    db.add(manager)
+    db.flush()
+    product = Product(name="Phone", model="X", price=100, purchase_price=80, sale_price=100,
+                      count=5, manager_id=manager.id)
+    db.add(product)
+    db.commit()
+    return manager, product
+
+
+def _sell(db, manager, product):
+    db.add(Sale(product_id=product.id, sale_price=100, seller_id=manager.id, magazine_id=manager.magazine_id))
+    db.commit()
+
+
+def test_summary_is_cached_until_the_shop_writes(db, client, auth_headers, query_counter):
+    manager, product = _shop(db, 1)
+    other, other_product = _shop(db, 2)
+    _sell(db, manager, product)
+    headers = auth_headers(manager.id)
+
+    assert client.get("/api/v1/reports/summary", headers=headers).json()["sales_count"] == 1
+    with query_counter() as miss:
+        client.get("/api/v1/reports/summary?date_from=2000-01-01", headers=headers)
+    with query_counter() as hit:
+        body = client.get("/api/v1/reports/summary?date_from=2000-01-01", headers=headers).json()
+    assert body["sales_count"] == 1
+    assert hit.count < miss.count
+
+    # Another shop's sale leaves this shop's entry alone
+    _sell(db, other, other_product)
+    with query_counter() as still_hit:
+        client.get("/api/v1/reports/summary?date_from=2000-01-01", headers=headers)
+    assert still_hit.count == hit.count
+
+    _sell(db, manager, product)
+    assert client.get("/api/v1/reports/summary?date_from=2000-01-01", headers=headers).json()["sales_count"] == 2
+
+
+def test_auto_product_edits_refresh_cached_revenue(db, client, auth_headers):
+    seller = User(name="Auto", phone="+998000000009", password_hash="x", role=UserRole.MANAGER,
+                  status=UserStatus.ACTIVE, user_type=UserType.AUTO)
+    db.add(seller)
+    db.flush()
+    car = AutoProduct(car_name="Cobalt", model="LTZ", color="White", year=2024,
+                      purchase_price=10000, sale_price=12000, manager_id=seller.id)
+    db.add(car)
+    db.flush()
+    db.add(AutoSale(auto_product_id=car.id, sale_price=12000, seller_id=seller.id))
+    db.commit()
+    headers = auth_headers(seller.id)
+
+    assert client.get("/api/v1/reports/revenue", headers=headers).json()["direct_sales_profit"] == 2000
+    assert client.put(f"/api/v1/auto-products/{car.id}", headers=headers,
+                      json={"purchase_price": 11000}).status_code == 200
+    assert client.get("/api/v1/reports/revenue", headers=headers).json()["direct_sales_profit"] == 1000
+
+
+def test_memory_backend_lru_and_ttl():
+    backend = report_cache.MemoryBackend(max_entries=2)
+    backend.set("a", 1, ttl=60)
+    backend.set("b", 2, ttl=60)
+    backend.get("a")
+    backend.set("c", 3, ttl=60)
+    assert backend.get("b") is None
+    assert backend.get("a") == 1
+    backend.set("d", 4, ttl=-1)
+    assert backend.get("d") is None
+
+
+def test_sqlite_backend_shares_versions_between_workers(tmp_path):
+    path = str(tmp_path / "cache.db")
+    first, second = report_cache.SQLiteBackend(path, 2), report_cache.SQLiteBackend(path, 2)
+
+    first.set("k1", {"total": 1}, ttl=60)
+    assert second.get("k1") == {"total": 1}
+    first.bump(["magazine:1"])
+    assert second.version("magazine:1") == 1
+    assert second.version("magazine:2") == 0
+
+    time.sleep(0.01)
+    second.set("k2", 2, ttl=60)
+    time.sleep(0.01)
+    second.set("k3", 3, ttl=60)
+    assert first.get("k1") is None
+    assert first.get("k3") == 3
@@ -0,0 +1,88 @@
+"""Coalescing of identical concurrent computations."""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.services.single_flight import SingleFlight
+
+
+def _run_concurrently(n, fn):
+    start = threading.Barrier(n)
+
+    def call(_):
+        start.wait()
+        return fn()
+
+    with ThreadPoolExecutor(n) as pool:
+        return list(pool.map(call, range(n)))
+
+
+def test_concurrent_callers_share_one_computation():
+    flights = SingleFlight()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"total": 42}
+
+    results = _run_concurrently(8, lambda: flights.do("revenue:1", compute, wait_seconds=5))
+    assert len(calls) == 1
+    assert all(value == {"total": 42} for value, _ in results)
+    assert sum(shared for _, shared in results) == 7
+    assert flights.in_flight() == 0
+
+
+def test_different_keys_do_not_coalesce():
+    flights = SingleFlight()
+    calls = []
+
+    def compute(key):
+        calls.append(key)
+        time.sleep(0.05)
+        return key
+
+    counter = iter(range(4))
+    lock = threading.Lock()
+
+    def call():
+        with lock:
+            key = next(counter)
+        return flights.do(key, lambda: compute(key), wait_seconds=5)
+
+    _run_concurrently(4, call)
+    assert sorted(calls) == [0, 1, 2, 3]
+
+
+def test_follower_stops_waiting_after_the_cap():
+    flights = SingleFlight()
+    leader_started = threading.Event()
+
+    def slow():
+        leader_started.set()
+        time.sleep(0.5)
+        return "leader"
+
+    with ThreadPoolExecutor(1) as pool:
+        leader = pool.submit(flights.do, "k", slow, 5)
+        leader_started.wait()
+        value, shared = flights.do("k", lambda: "own", wait_seconds=0.05)
+        assert (value, shared) == ("own", False)
+        assert leader.result() == ("leader", False)
+
+
+def test_leader_error_reaches_followers():
+    flights = SingleFlight()
+
+    def failing():
+        time.sleep(0.1)
+        raise ValueError("boom")
+
+    def call():
+        with pytest.raises(ValueError):
+            flights.do("k", failing, wait_seconds=5)
+        return True
+
+    assert all(_run_concurrently(4, call))
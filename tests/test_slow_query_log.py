@@ -0,0 +1,38 @@
+"""Slow-query log: fingerprints, plans and the rotating file."""
+import json
+
+from sqlalchemy import create_engine, text
+
+from app.core.config import settings
+from app.db import slow_query_log
+
+
+def test_fingerprint_folds_literals_placeholders_and_in_lists():
+    a = slow_query_log.normalize("SELECT * FROM loans WHERE id IN (?, ?, ?) AND status = 'PAID' LIMIT 10")
+    b = slow_query_log.normalize("SELECT *  FROM loans\nWHERE id IN (%(id_1)s, %(id_2)s) AND status = 'LATE' LIMIT 50")
+    assert a == b == "SELECT * FROM loans WHERE id IN (...) AND status = ? LIMIT ?"
+    assert slow_query_log.normalize("SELECT x::text FROM t WHERE y = :y") == "SELECT x::text FROM t WHERE y = ?"
+
+
+def test_slow_statements_are_logged_with_plan(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "SLOW_QUERY_MS", 0)
+    monkeypatch.setattr(settings, "SLOW_QUERY_LOG", str(tmp_path / "slow.log"))
+    monkeypatch.setattr(slow_query_log, "_file_logger", None)
+    slow_query_log.reset()
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'slow.db'}")
+    slow_query_log.install(engine)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)"))
+        for i in range(3):
+            conn.execute(text("SELECT * FROM items WHERE name LIKE :term"), {"term": f"%{i}%"})
+    engine.dispose()
+
+    select = next(a for a in slow_query_log.aggregates() if a["normalized"].startswith("SELECT"))
+    assert select["count"] == 3
+    assert any("SCAN" in line for line in select["plan"])
+
+    lines = [json.loads(line) for line in (tmp_path / "slow.log").read_text().splitlines()]
+    assert {line["fingerprint"] for line in lines} >= {select["fingerprint"]}
+    assert any(line["parameters"] == ["'%0%'"] for line in lines)
+    slow_query_log.reset()
@@ -0,0 +1,104 @@
+"""Delta sync: changes since a watermark, deletion tombstones and scoping."""
+from datetime import datetime, timedelta
+
+from app.models.magazine import Magazine, MagazineStatus
+from app.models.product import Product
+from app.models.sync import SyncDeletion
+from app.models.transaction import Sale
+from app.models.user import Client, User, UserRole, UserStatus, UserType
+from app.services import demo_seed_service, sync_service
+
+
+def _shop(db, n: int):
+    magazine = Magazine(name=f"Shop {n}", status=MagazineStatus.ACTIVE)
+    db.add(magazine)
+    db.flush()
+    manager = User(name=f"Manager {n}", phone=f"+99800000000{n}", password_hash="x", role=UserRole.MANAGER,
+                   status=UserStatus.ACTIVE, user_type=UserType.GADGETS, magazine_id=magazine.id)
+    db.add(manager)
+    db.flush()
+    product = Product(name="Phone", model="X", price=100, purchase_price=80, sale_price=100,
+                      count=5, manager_id=manager.id)
+    db.add_all([product, Client(name=f"Client {n}", phone="+998901112233",
+                                passport_series=f"AA{n:07d}", manager_id=manager.id)])
+    db.flush()
+    sale = Sale(product_id=product.id, sale_price=100, seller_id=manager.id, magazine_id=magazine.id)
+    db.add(sale)
+    db.commit()
+    return manager, product, sale
+
+
+def _age_everything(db):
+    """Move every row's updated_at an hour back, as if written long ago."""
+    old = datetime.utcnow() - timedelta(hours=1)
+    for model in (Client, Product, Sale):
+        db.query(model).update({model.updated_at: old}, synchronize_session=False)
+    db.commit()
+
+
+def test_delta_returns_only_changes_and_deletions_in_scope(db, client, auth_headers):
+    manager, product, sale = _shop(db, 1)
+    _, other_product, other_sale = _shop(db, 2)
+    _age_everything(db)
+    headers = auth_headers(manager.id)
+
+    snapshot = client.get("/api/v1/sync/", headers=headers).json()
+    assert snapshot["full"] is True
+    assert [p["id"] for p in snapshot["changes"]["products"]] == [product.id]
+    assert [s["id"] for s in snapshot["changes"]["sales"]] == [sale.id]
+    assert len(snapshot["changes"]["clients"]) == 1
+
+    delta = client.get("/api/v1/sync/", headers=headers, params={"since": snapshot["watermark"]}).json()
+    assert delta["full"] is False
+    assert all(rows == [] for rows in delta["changes"].values())
+
+    product.count = 4
+    db.delete(sale)
+    db.delete(other_sale)
+    db.commit()
+
+    delta = client.get("/api/v1/sync/", headers=headers, params={"since": snapshot["watermark"]}).json()
+    assert [p["count"] for p in delta["changes"]["products"]] == [4]
+    assert delta["changes"]["sales"] == []
+    assert delta["deleted"]["sales"] == [sale.id]
+    assert delta["deleted"]["products"] == []
+
+
+def test_demo_seed_cleanup_leaves_tombstones(db, client, auth_headers):
+    manager, _, _ = _shop(db, 1)
+    demo_seed_service.seed_for_user(db, manager)
+    headers = auth_headers(manager.id)
+    snapshot = client.get("/api/v1/sync/", headers=headers).json()
+    seeded_products = {p["id"] for p in snapshot["changes"]["products"] if p["name"] != "Phone"}
+    seeded_clients = {c["id"] for c in snapshot["changes"]["clients"] if c["name"] == demo_seed_service.DEMO_CLIENT_NAME}
+    assert len(seeded_products) == 2 and len(seeded_clients) == 1
+
+    assert client.delete("/api/v1/auth/demo-seed", headers=headers).json() == {"removed": 3}
+
+    delta = client.get("/api/v1/sync/", headers=headers, params={"since": snapshot["watermark"]}).json()
+    assert set(delta["deleted"]["products"]) == seeded_products
+    assert set(delta["deleted"]["clients"]) == seeded_clients
+
+
+def test_entities_filter_and_stale_watermark(db, client, auth_headers):
+    manager, _, _ = _shop(db, 1)
+    headers = auth_headers(manager.id)
+
+    body = client.get("/api/v1/sync/", headers=headers, params={"entities": "products"}).json()
+    assert list(body["changes"]) == ["products"]
+    assert client.get("/api/v1/sync/", headers=headers, params={"entities": "users"}).status_code == 400
+
+    # Older than tombstone retention: deletions may be gone, so resync fully
+    stale = (datetime.utcnow() - timedelta(days=365)).isoformat()
+    assert client.get("/api/v1/sync/", headers=headers, params={"since": stale}).json()["full"] is True
+
+
+def test_prune_drops_only_expired_tombstones(db):
+    db.add_all([
+        SyncDeletion(entity="sales", entity_id=1, magazine_id=1,
+                     deleted_at=datetime.utcnow() - timedelta(days=400)),
+        SyncDeletion(entity="sales", entity_id=2, magazine_id=1),
+    ])
+    db.commit()
+    assert sync_service.prune_tombstones(db) == 1
+    assert [t.entity_id for t in db.query(SyncDeletion).all()] == [2]